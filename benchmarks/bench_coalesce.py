@@ -0,0 +1,49 @@
+"""
+Bursts of identical concurrent calls (the market open pattern: many threads asking for
+lista_deb_publicas at once) against the stand-in server of tests/standin.py, with and
+without coalescing. Reports the requests that reached the server and the time per burst.
+
+    python benchmarks/bench_coalesce.py --threads 32 --rajadas 10 --rows 20000
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from debentures_dot_com import Transport
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../tests')))
+
+from standin import StandinServer
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--threads', type=int, default=32, help='Callers of each burst.')
+    ap.add_argument('--rajadas', type=int, default=10, help='Bursts.')
+    ap.add_argument('--rows', type=int, default=20000, help='Rows of the served list.')
+    ap.add_argument('--latency', type=float, default=0.1)
+    args = ap.parse_args()
+
+    with StandinServer(latency=args.latency, rows=args.rows) as servidor:
+        for nome, coalesce in (('sem coalescer', False), ('copy', 'copy')):
+            transport = Transport(pool_maxsize=args.threads, rate_limiter=False, coalesce=coalesce)
+            ed = servidor.clients(transport=transport, errors='raise')[0]
+            antes, tempos = servidor.requests, []
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                for _ in range(args.rajadas):
+                    barreira = threading.Barrier(args.threads)
+                    def chamar(_):
+                        barreira.wait()
+                        return ed.lista_deb_publicas()
+                    inicio = time.perf_counter()
+                    list(executor.map(chamar, range(args.threads)))
+                    tempos.append(time.perf_counter() - inicio)
+            transport.close()
+            print(f'{nome:14s} requisições {servidor.requests - antes:5d}  '
+                  f'rajada média {sum(tempos) / len(tempos):6.3f}s')
+
+
+if __name__ == '__main__':
+    main()
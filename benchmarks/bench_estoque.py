@@ -0,0 +1,63 @@
+"""
+Compares the original line parser of the estoque report with the block parser on a
+synthetic estoque_relatorio covering years of daily blocks.
+
+    python benchmarks/bench_estoque.py --anos 30 --linhas 10
+"""
+import time
+import random
+import argparse
+import pandas as pd
+from datetime import date, timedelta
+from debentures_dot_com.estoques import parse_estoque_data, _parse_estoque_data_text
+
+
+def _valor(rnd) -> str:
+    return f'{rnd.uniform(0, 5e6):,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def build_report(anos:int, linhas:int, seed:int=0) -> str:
+    rnd = random.Random(seed)
+    indexadores = ['DI', 'IPCA', 'IGP-M', 'Prefixado', 'TR', 'TJLP', 'Dólar', 'Outros', 'Sem Indexador', 'SELIC']
+    out = ['Estoque SND Caracteristicas por Indexadores']
+    dia = date(2026, 1, 1) - timedelta(days=365 * anos)
+    for _ in range(365 * anos):
+        out.append(f'Data do Estoque {dia:%d/%m/%Y} - Moeda R$')
+        out.append('Indexadores\tMercado\tTesouraria\tTotal')
+        for nome in indexadores[:linhas]:
+            out.append('\t'.join([nome, _valor(rnd), _valor(rnd), _valor(rnd)]))
+        out.append('Total do dia\t' + '\t'.join(_valor(rnd) for _ in range(3)))
+        dia += timedelta(days=1)
+    return '\r\n'.join(out)
+
+
+def best(func, repeat:int):
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        df = func()
+        tempos.append(time.perf_counter() - inicio)
+    return df, min(tempos)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--anos', type=int, default=30)
+    ap.add_argument('--linhas', type=int, default=10)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    texto = build_report(args.anos, args.linhas)
+    antigo, t_antigo = best(lambda: _parse_estoque_data_text(texto, 'Indexadores'), args.repeat)
+    novo, t_novo = best(lambda: parse_estoque_data(texto, 'Indexadores'), args.repeat)
+    pd.testing.assert_frame_equal(antigo, novo)
+
+    print(f'{365 * args.anos} blocks, {len(novo)} rows, {len(texto) / 2**20:.1f} MiB')
+    print(f'{"parser":<12}{"best (s)":>10}')
+    print(f'{"lines":<12}{t_antigo:>10.3f}')
+    print(f'{"blocks":<12}{t_novo:>10.3f}')
+    print(f'speedup {t_antigo / t_novo:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares the BeautifulSoup and lxml extraction of the public debenture list on a
+synthetic page with thousands of rows.
+
+    python benchmarks/bench_html.py --linhas 5000
+"""
+import time
+import argparse
+import pandas as pd
+from debentures_dot_com.utils import html
+from debentures_dot_com.emissoes import _parse_lista_deb_publicas, _parse_lista_deb_publicas_text
+
+
+def build_page(linhas:int) -> bytes:
+    situacoes = ['Registrado', 'Excluído', 'Vencido Antecipadamente', 'Cancelado']
+    rows = ''.join(
+        f"<tr><td><img src='seta.gif'></td><td><a href='caracteristicas_r.asp?ativo=ABCD{i:05d}'>ABCD{i:05d}</a></td>"
+        f"<td>EMISSORA {i % 997} S.A.</td><td>&nbsp;</td><td>{situacoes[i % 4]}</td><td></td></tr>"
+        for i in range(linhas)
+    )
+    pagina = (
+        "<html><head><title>Debêntures</title></head><body><div id='menu'>" + "<p>menu</p>" * 200 + "</div>"
+        "<table class='Tab10333333'><tr><th></th><th>Ativo</th><th>Emissor</th><th></th><th>Situação</th><th></th></tr>"
+        f"{rows}</table><div id='rodape'>" + "<p>rodapé</p>" * 200 + "</div></body></html>"
+    )
+    return pagina.encode('ISO-8859-1')
+
+
+def best(func, repeat:int):
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        df = func()
+        tempos.append(time.perf_counter() - inicio)
+    return df, min(tempos)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--linhas', type=int, default=5000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+    if html.etree is None:
+        raise SystemExit('lxml is not installed: pip install lxml')
+
+    pagina = build_page(args.linhas)
+    soup, t_soup = best(lambda: _parse_lista_deb_publicas_text(pagina.decode('ISO-8859-1')), args.repeat)
+    rapido, t_rapido = best(lambda: _parse_lista_deb_publicas(pagina, encoding='ISO-8859-1'), args.repeat)
+    pd.testing.assert_frame_equal(soup, rapido)
+
+    print(f'{args.linhas} rows, {len(pagina) / 2**20:.1f} MiB')
+    print(f'{"parser":<14}{"best (s)":>10}')
+    print(f'{"BeautifulSoup":<14}{t_soup:>10.3f}')
+    print(f'{"lxml":<14}{t_rapido:>10.3f}')
+    print(f'speedup {t_soup / t_rapido:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Start-up time of the package, each case in a fresh interpreter: the bare import, the
+first access to a client class and the pandas free records path. Exits with an error when
+the bare import loads a heavy dependency or takes longer than --max-ms, so it can guard CI.
+
+    python benchmarks/bench_import.py --repeat 5 --max-ms 150
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+PESADOS = ('pandas', 'numpy', 'bs4', 'dateutil', 'aiohttp', 'pyarrow', 'polars', 'lxml')
+
+CASOS = {
+    'import debentures_dot_com': 'import debentures_dot_com',
+    'Transport': 'from debentures_dot_com import Transport',
+    'records': 'from debentures_dot_com import records',
+    'EmissoesDebentures': 'from debentures_dot_com import EmissoesDebentures',
+    'AsyncEmissoesDebentures': 'from debentures_dot_com import AsyncEmissoesDebentures',
+}
+
+
+def medir(codigo:str) -> tuple:
+    # Seconds of the statement alone (the interpreter's own start-up is left out) and the heavy modules it loaded
+    script = (f'import sys, time, json\ninicio = time.perf_counter()\n{codigo}\n'
+              f'print(json.dumps([time.perf_counter() - inicio, [m for m in {PESADOS!r} if m in sys.modules]]))')
+    saida = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                           env={**os.environ, 'PYTHONPATH': SRC})
+    return json.loads(saida.stdout)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per case; the best time is kept.')
+    ap.add_argument('--max-ms', type=float, default=None, help='Budget of the bare import, in milliseconds.')
+    args = ap.parse_args()
+
+    falhas = []
+    for nome, codigo in CASOS.items():
+        resultados = [medir(codigo) for _ in range(args.repeat)]
+        tempo = min(t for t, _ in resultados) * 1000
+        pesados = resultados[0][1]
+        print(f'{nome:26s} {tempo:8.1f} ms  {", ".join(pesados) or "-"}')
+        if codigo == 'import debentures_dot_com':
+            if pesados:
+                falhas.append(f'the bare import loads {", ".join(pesados)}')
+            if args.max_ms is not None and tempo > args.max_ms:
+                falhas.append(f'the bare import took {tempo:.1f} ms, over the {args.max_ms:.0f} ms budget')
+    if falhas:
+        raise SystemExit('; '.join(falhas))
+
+
+if __name__ == '__main__':
+    main()
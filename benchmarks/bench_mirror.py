@@ -0,0 +1,53 @@
+"""
+Filter permutations of caracteristicas_debs answered by the stand-in server of
+tests/standin.py (a round trip and a parse each) and by the local CaracteristicasMirror.
+
+    python benchmarks/bench_mirror.py --rows 20000 --latency 0.05
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import itertools
+from debentures_dot_com import CaracteristicasMirror, Transport
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../tests')))
+
+from standin import StandinServer
+
+FILTROS = [dict(zip(('indice', 'venc_ini', 'mnome'), valores)) for valores in itertools.product(
+    ['DI', 'IPCA', None], ['01/01/2030', '01/01/2032', None], ['EMISSORA 1', None])]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--rows', type=int, default=20000)
+    ap.add_argument('--latency', type=float, default=0.05)
+    args = ap.parse_args()
+
+    with StandinServer(latency=args.latency, rows=args.rows) as servidor, tempfile.TemporaryDirectory() as pasta:
+        transport = Transport(rate_limiter=False)
+        ed = servidor.clients(transport=transport, errors='raise')[0]
+        mirror = CaracteristicasMirror(os.path.join(pasta, 'm.sqlite'), transport=transport, errors='raise', fallback=False)
+        mirror.root_url = ed.root_url
+
+        inicio = time.perf_counter()
+        linhas = mirror.sync()
+        print(f'sync {linhas} rows: {time.perf_counter() - inicio:.2f}s')
+        inicio = time.perf_counter()
+        mirror.caracteristicas_debs()
+        print(f'first query (types the export once): {time.perf_counter() - inicio:.3f}s')
+        filtros = [{k: v for k, v in f.items() if v} for f in FILTROS]
+        for nome, consultar in (('site', ed.caracteristicas_debs), ('mirror', mirror.caracteristicas_debs)):
+            inicio = time.perf_counter()
+            for f in filtros:
+                consultar(**f)
+            tempo = time.perf_counter() - inicio
+            print(f'{nome:7s} {len(filtros)} filters: {tempo:7.3f}s  ({tempo / len(filtros) * 1000:8.1f} ms per filter)')
+        mirror.close()
+        transport.close()
+
+
+if __name__ == '__main__':
+    main()
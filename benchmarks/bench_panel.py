@@ -0,0 +1,60 @@
+"""
+Compares per-ticker DataFrame loops with PUPanel for forward fill, returns and the daily
+cross-sectional mean over a synthetic universe, and the memory each layout holds.
+
+    python benchmarks/bench_panel.py --ativos 2000 --dias 1500
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from debentures_dot_com import PUPanel
+
+
+def build_frame(ativos:int, dias:int, falhas:float=0.05, seed:int=0) -> pd.DataFrame:
+    # Long pu_historico_lote layout over business days, with a share of the (ticker, date) rows missing
+    rng = np.random.default_rng(seed)
+    datas = pd.bdate_range('2019-01-02', periods=dias)
+    pu = 1000 * np.cumprod(1 + rng.normal(0.0004, 0.002, (ativos, dias)), axis=1)
+    manter = rng.random((ativos, dias)) >= falhas
+    linhas, colunas = np.nonzero(manter)
+    return pd.DataFrame({'Ativo': np.array([f'ABCD{a:05d}' for a in range(ativos)])[linhas],
+                         'Data do PU': datas[colunas], 'Preço Unitário': pu[linhas, colunas]})
+
+
+def por_ativo(df:pd.DataFrame) -> pd.Series:
+    # What the analyses do today: one DataFrame per ticker reindexed to the common dates
+    eixo = pd.DatetimeIndex(sorted(df['Data do PU'].unique()))
+    retornos = {}
+    for ativo, grupo in df.groupby('Ativo'):
+        serie = grupo.set_index('Data do PU')['Preço Unitário'].reindex(eixo).ffill()
+        retornos[ativo] = serie.pct_change()
+    return pd.DataFrame(retornos).mean(axis=1)
+
+
+def painel(df:pd.DataFrame) -> pd.Series:
+    return PUPanel.from_frame(df).returns().cross_section(['mean'])['mean']
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--ativos', type=int, default=2000)
+    ap.add_argument('--dias', type=int, default=1500)
+    args = ap.parse_args()
+
+    df = build_frame(args.ativos, args.dias)
+    print(f'{len(df):,} rows, {args.ativos} tickers x {args.dias} dates')
+    resultados = {}
+    for nome, func in (('per-ticker loop', por_ativo), ('PUPanel', painel)):
+        inicio = time.perf_counter()
+        resultados[nome] = func(df)
+        print(f'{nome:16s} {time.perf_counter() - inicio:8.2f} s')
+    a, b = resultados.values()
+    print(f'max difference of the daily mean return: {np.nanmax(np.abs(a.to_numpy() - b.to_numpy())):.2e}')
+    longo = df.memory_usage(deep=True).sum() / 2**20
+    matriz = PUPanel.from_frame(df).valores.nbytes / 2**20
+    print(f'long DataFrame {longo:8.1f} MiB, panel matrix {matriz:8.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares the original tab export parser with the bytes-native one on a synthetic
+caracteristicas_debs-like export.
+
+    python benchmarks/bench_parse.py --rows 5000 --cols 60
+"""
+import time
+import random
+import argparse
+import tracemalloc
+import pandas as pd
+from debentures_dot_com.utils.utils import parse_tabular, _parse_tabular_text
+
+
+def build_export(rows:int, cols:int, seed:int=0) -> bytes:
+    # Title, blank line, a second preamble line, the header, the rows and a four line footer
+    rnd = random.Random(seed)
+    valores = ['', 'DI', 'IPCA', 'Sim', 'Não', '1.234,56', '15/03/2031', 'Registrada', '0,000000']
+    lines = ['Características das Debêntures', '', 'Consulta realizada em 01/01/2026',
+             '\t'.join(f'Coluna {i}' for i in range(cols))]
+    for r in range(rows):
+        lines.append('\t'.join([f'ABCD{r:05d}'] + [rnd.choice(valores) for _ in range(cols - 1)]))
+    lines += ['', 'Fonte: debentures.com.br', 'Nota 1', 'Nota 2', 'Nota 3']
+    return '\r\n'.join(lines).encode('ISO-8859-1')
+
+
+def measure(func, repeat:int):
+    tracemalloc.start()
+    df = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return df, min(tempos), peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--rows', type=int, default=5000)
+    ap.add_argument('--cols', type=int, default=60)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    content = build_export(args.rows, args.cols)
+    kwargs = {'skiprows': 2, 'header_line': 1, 'footer': 4}
+    antigo, t_antigo, m_antigo = measure(
+        lambda: _parse_tabular_text(content.decode('ISO-8859-1'), '|', **kwargs), args.repeat)
+    novo, t_novo, m_novo = measure(
+        lambda: parse_tabular(content, encoding='ISO-8859-1', **kwargs), args.repeat)
+    pd.testing.assert_frame_equal(antigo, novo)
+
+    print(f'{args.rows} rows x {args.cols} columns, {len(content) / 2**20:.1f} MiB')
+    print(f'{"parser":<12}{"best (s)":>10}{"peak (MiB)":>12}')
+    print(f'{"text":<12}{t_antigo:>10.3f}{m_antigo / 2**20:>12.1f}')
+    print(f'{"bytes":<12}{t_novo:>10.3f}{m_novo / 2**20:>12.1f}')
+    print(f'speedup {t_antigo / t_novo:.1f}x, peak memory {m_novo / m_antigo:.0%} of the text parser')
+
+
+if __name__ == '__main__':
+    main()
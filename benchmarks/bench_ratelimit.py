@@ -0,0 +1,75 @@
+"""
+Runs pu_historico_lote against a local server that answers 429 (with Retry-After) whenever
+more than --limite requests are in flight, with and without the adaptive RateLimiter.
+
+    python benchmarks/bench_ratelimit.py --ativos 200 --limite 6 --workers 32
+"""
+import time
+import argparse
+import threading
+import http.server
+from debentures_dot_com import EmissoesDebentures, Transport, RateLimiter
+
+CORPO = b'Titulo\r\nSubtitulo\r\nData do PU\tJuros\r\n01/01/2024\t1,0\r\n02/01/2024\t1,0\r\n\r\nFonte\r\n'
+
+
+def servidor(limite:int) -> tuple:
+    estado = {'em_curso': 0, 'ok': 0, '429': 0}
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            with lock:
+                estado['em_curso'] += 1
+                excedeu = estado['em_curso'] > limite
+            try:
+                time.sleep(0.05)
+                if excedeu:
+                    estado['429'] += 1
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                estado['ok'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(CORPO)))
+                self.end_headers()
+                self.wfile.write(CORPO)
+            finally:
+                with lock:
+                    estado['em_curso'] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, estado
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--ativos', type=int, default=200)
+    ap.add_argument('--limite', type=int, default=6)
+    ap.add_argument('--workers', type=int, default=32)
+    args = ap.parse_args()
+
+    for nome, limiter in (('sem limitador', False), ('RateLimiter', RateLimiter())):
+        httpd, estado = servidor(args.limite)
+        ed = EmissoesDebentures(transport=Transport(pool_maxsize=args.workers, backoff_factor=0.1, rate_limiter=limiter))
+        ed.root_url = f'http://127.0.0.1:{httpd.server_address[1]}'
+        inicio = time.perf_counter()
+        _, status = ed.pu_historico_lote([f'ATIV{i:03d}' for i in range(args.ativos)], '20240101', '20240110',
+                                         max_workers=args.workers)
+        tempo = time.perf_counter() - inicio
+        httpd.shutdown()
+        print(f"{nome:14s} {tempo:6.2f}s  sucesso {int(status['Sucesso'].sum()):4d}/{args.ativos}  "
+              f"respostas 429 {estado['429']:5d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Compares the memory held by text and typed pu_historico frames for a synthetic universe
+of tickers, and the time spent typing them.
+
+    python benchmarks/bench_schemas.py --ativos 500 --dias 750
+"""
+import time
+import random
+import argparse
+import pandas as pd
+from datetime import date, timedelta
+from debentures_dot_com.utils.schemas import apply_schema
+
+
+def _br(valor:float, casas:int) -> str:
+    return f'{valor:,.{casas}f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def build_frame(ativos:int, dias:int, seed:int=0) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    linhas = []
+    for a in range(ativos):
+        ativo = f'ABCD{a:05d}'
+        for d in range(dias):
+            juros = rnd.uniform(0, 80)
+            linhas.append([
+                (date(2023, 1, 2) + timedelta(days=d)).strftime('%d/%m/%Y'), ativo, _br(1000, 6), _br(juros, 6), '-',
+                _br(1000 + juros, 6), 'Padrão - SND', rnd.choice(['Reg.', 'Exc.']),
+            ])
+    colunas = ['Data do PU', 'Ativo', 'Valor Nominal', 'Juros', 'Prêmio', 'Preço Unitário', 'Critério de Cálculo', 'Situação']
+    return pd.DataFrame(linhas, columns=colunas, dtype=str)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--ativos', type=int, default=500)
+    ap.add_argument('--dias', type=int, default=750)
+    args = ap.parse_args()
+
+    texto = build_frame(args.ativos, args.dias)
+    inicio = time.perf_counter()
+    tipado = apply_schema(texto, 'pu_historico')
+    tempo = time.perf_counter() - inicio
+
+    m_texto = texto.memory_usage(deep=True).sum()
+    m_tipado = tipado.memory_usage(deep=True).sum()
+    print(f'{len(texto)} rows')
+    print(tipado.dtypes.to_string())
+    print(f'text  {m_texto / 2**20:>8.1f} MiB')
+    print(f'typed {m_tipado / 2**20:>8.1f} MiB ({m_texto / m_tipado:.1f}x smaller), typed in {tempo:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
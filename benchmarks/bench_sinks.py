@@ -0,0 +1,56 @@
+"""
+Compares writing a typed pu_historico frame to CSV and loading it back (re-typing the text)
+with writing it to a partitioned Parquet dataset and reading it back.
+
+    python benchmarks/bench_sinks.py --ativos 500 --dias 750
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+from bench_schemas import build_frame
+from debentures_dot_com.sinks import ParquetSink
+from debentures_dot_com.utils.schemas import apply_schema
+
+
+def _size(path:str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(path) for f in fs)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--ativos', type=int, default=500)
+    ap.add_argument('--dias', type=int, default=750)
+    args = ap.parse_args()
+
+    df = apply_schema(build_frame(args.ativos, args.dias), 'pu_historico')
+    pasta = tempfile.mkdtemp()
+    try:
+        csv = os.path.join(pasta, 'pu.csv')
+        inicio = time.perf_counter()
+        df.to_csv(csv, index=False, sep=';', decimal=',', date_format='%d/%m/%Y')
+        escrita = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        lido = pd.read_csv(csv, sep=';', dtype=str, keep_default_na=False)
+        apply_schema(lido, 'pu_historico')
+        leitura = time.perf_counter() - inicio
+        print(f'csv     write {escrita:6.2f}s  read+type {leitura:6.2f}s  {_size(csv) / 2**20:8.1f} MiB')
+
+        sink = ParquetSink(os.path.join(pasta, 'pu'), partition_by='Ativo')
+        inicio = time.perf_counter()
+        sink.write(df)
+        escrita = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        sink.read()
+        leitura = time.perf_counter() - inicio
+        print(f'parquet write {escrita:6.2f}s  read      {leitura:6.2f}s  {_size(sink.path) / 2**20:8.1f} MiB')
+    finally:
+        shutil.rmtree(pasta)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Offline benchmark of every endpoint against the stand-in server of tests/standin.py.
+
+For each endpoint it reports the parse time of a large synthetic response (--rows), the
+end-to-end latency of one call (download, parse and typing) with the server's --latency,
+the throughput of --requests calls of the recorded response made by --workers threads,
+and the peak memory traced during one end-to-end call. Save a run with --json and pass
+it to --compare on a later run to see the change of every figure.
+
+    python benchmarks/bench_suite.py --rows 50000 --latency 0.02 --json base.json
+    python benchmarks/bench_suite.py --rows 50000 --latency 0.02 --compare base.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from debentures_dot_com import Transport
+from debentures_dot_com.utils.query import fetch_query
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../tests')))
+
+from standin import StandinServer
+
+# endpoint -> (client index, method, args)
+ENDPOINTS = {
+    'lista_deb_publicas': (0, 'lista_deb_publicas', ()),
+    'pu_historico': (0, 'pu_historico', ('ABCD11',)),
+    'caracteristicas_debs': (0, 'caracteristicas_debs', ()),
+    'conversao_permuta': (0, 'conversao_permuta', ()),
+    'estoque_por_ativo': (1, 'estoque_por_ativo', ('ABCD11',)),
+    'estoque_por_periodo': (1, 'estoque_por_periodo', ()),
+    'estoque_relatorio': (1, 'estoque_relatorio', ('Indexadores',)),
+    'agenda_eventos': (2, 'agenda_eventos', ()),
+    'pu_eventos': (2, 'pu_eventos', ()),
+    'preco_negociacao': (3, 'preco_negociacao', ()),
+    'volume_negociacao': (3, 'volume_negociacao', ()),
+    'arquivo_precos_diario': (3, 'arquivo_precos_diario', ('20240315',)),
+}
+
+COLUNAS = [('parse_s', 'parse (s)', '{:.3f}'), ('latencia_s', 'e2e (s)', '{:.3f}'),
+           ('req_s', 'req/s', '{:.1f}'), ('pico_mib', 'peak (MiB)', '{:.1f}')]
+
+
+def _query(client, metodo:str, args:tuple):
+    # The Query an endpoint method would run, captured instead of executed
+    capturadas = []
+    client._run = capturadas.append
+    try:
+        getattr(client, metodo)(*args)
+    finally:
+        del client._run
+    return capturadas[0]
+
+
+def medir(nome:str, grande:StandinServer, pequeno:StandinServer, args) -> dict:
+    indice, metodo, argumentos = ENDPOINTS[nome]
+    transport = Transport(pool_maxsize=args.workers, rate_limiter=None if args.rate_limiter else False)
+    client = grande.clients(transport=transport, errors='raise')[indice]
+    chamar = lambda c: getattr(c, metodo)(*argumentos)
+
+    query = _query(client, metodo, argumentos)
+    content, encoding = fetch_query(query, transport)
+    parse = []
+    for _ in range(args.repeat):
+        inicio = time.perf_counter()
+        query.finish(query.parse(content, encoding))
+        parse.append(time.perf_counter() - inicio)
+
+    latencia = []
+    for _ in range(args.repeat):
+        inicio = time.perf_counter()
+        chamar(client)
+        latencia.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    chamar(client)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    client = pequeno.clients(transport=transport, errors='raise')[indice]
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        inicio = time.perf_counter()
+        list(executor.map(lambda _: chamar(client), range(args.requests)))
+        vazao = args.requests / (time.perf_counter() - inicio)
+    transport.close()
+    return {'parse_s': min(parse), 'latencia_s': statistics.median(latencia), 'req_s': vazao,
+            'pico_mib': pico / 2**20, 'bytes': len(content)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--rows', type=int, default=50000, help='Data rows of the synthetic responses.')
+    ap.add_argument('--latency', type=float, default=0.02, help='Seconds the server waits before answering.')
+    ap.add_argument('--requests', type=int, default=64, help='Calls of the throughput run.')
+    ap.add_argument('--workers', type=int, default=16, help='Threads of the throughput run.')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--endpoints', help='Comma separated endpoints; all by default.')
+    ap.add_argument('--rate-limiter', action='store_true', help='Keeps the shared RateLimiter in the way.')
+    ap.add_argument('--json', help='Writes the results to this file.')
+    ap.add_argument('--compare', help='Results of an earlier run (--json) to compare with.')
+    args = ap.parse_args()
+
+    nomes = args.endpoints.split(',') if args.endpoints else list(ENDPOINTS)
+    base = {}
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)['endpoints']
+
+    resultados = {}
+    with StandinServer(latency=args.latency, rows=args.rows) as grande, StandinServer(latency=args.latency) as pequeno:
+        print(f'{args.rows} rows, latency {args.latency}s, {args.requests} calls on {args.workers} threads')
+        print(f'{"endpoint":<24}{"MiB":>7}' + ''.join(f'{titulo:>{18 if base else 12}}' for _, titulo, _ in COLUNAS))
+        for nome in nomes:
+            r = resultados[nome] = medir(nome, grande, pequeno, args)
+            linha = f'{nome:<24}{r["bytes"] / 2**20:>7.1f}'
+            for chave, _, fmt in COLUNAS:
+                celula = fmt.format(r[chave])
+                if nome in base and base[nome].get(chave):
+                    celula += f' ({r[chave] / base[nome][chave] - 1:+.0%})'
+                linha += f'{celula:>{18 if base else 12}}'
+            print(linha)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': {k: v for k, v in vars(args).items() if k not in ('json', 'compare')},
+                       'endpoints': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,78 @@
 # src/debentures_dot_com/__init__.py
-from .emissoes import EmissoesDebentures
-from .estoques import EstoquesCorporativos
-from .eventos_fin import EventosFinanceiros
-from .mercados import MercadoSecundario
\ No newline at end of file
+# The public classes are loaded on first access (PEP 562), so `import debentures_dot_com` stays
+# cheap: pandas, aiohttp, pyarrow and friends are only imported by the modules that need them.
+from typing import TYPE_CHECKING
+
+_EXPORTS = {
+    'EmissoesDebentures': '.emissoes',
+    'EstoquesCorporativos': '.estoques',
+    'EventosFinanceiros': '.eventos_fin',
+    'MercadoSecundario': '.mercados',
+    'VolumesNegociados': '.volumes',
+    'Transport': '.utils.transport',
+    'ResponseCache': '.utils.cache',
+    'RateLimiter': '.utils.ratelimit',
+    'AsyncTransport': '.utils.async_transport',
+    'AsyncEmissoesDebentures': '.aio',
+    'AsyncEstoquesCorporativos': '.aio',
+    'AsyncEventosFinanceiros': '.aio',
+    'AsyncMercadoSecundario': '.aio',
+    'AsyncVolumesNegociados': '.aio',
+    'SeriesStore': '.store',
+    'ParquetSink': '.sinks',
+    'MetricsCollector': '.metrics',
+    'JsonExporter': '.metrics',
+    'PrometheusExporter': '.metrics',
+    'RequestEvent': '.utils.events',
+    'add_hook': '.utils.events',
+    'remove_hook': '.utils.events',
+    'DebenturesError': '.exceptions',
+    'RequestFailed': '.exceptions',
+    'ConnectionFailed': '.exceptions',
+    'RequestTimeout': '.exceptions',
+    'HTTPStatusError': '.exceptions',
+    'ParseError': '.exceptions',
+    'CaracteristicasMirror': '.mirror',
+    'UniverseCrawl': '.crawl',
+    'DeltaFeed': '.delta',
+    'PUPanel': '.panel',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name:str):
+    modulo = _EXPORTS.get(name)
+    if modulo is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    import importlib
+    valor = getattr(importlib.import_module(modulo, __name__), name)
+    globals()[name] = valor # Later accesses skip __getattr__
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .emissoes import EmissoesDebentures
+    from .estoques import EstoquesCorporativos
+    from .eventos_fin import EventosFinanceiros
+    from .mercados import MercadoSecundario
+    from .volumes import VolumesNegociados
+    from .utils.transport import Transport
+    from .utils.cache import ResponseCache
+    from .utils.ratelimit import RateLimiter
+    from .utils.async_transport import AsyncTransport
+    from .aio import AsyncEmissoesDebentures, AsyncEstoquesCorporativos, AsyncEventosFinanceiros, AsyncMercadoSecundario, \
+        AsyncVolumesNegociados
+    from .store import SeriesStore
+    from .sinks import ParquetSink
+    from .metrics import MetricsCollector, JsonExporter, PrometheusExporter
+    from .utils.events import RequestEvent, add_hook, remove_hook
+    from .exceptions import DebenturesError, RequestFailed, ConnectionFailed, RequestTimeout, HTTPStatusError, ParseError
+    from .mirror import CaracteristicasMirror
+    from .crawl import UniverseCrawl
+    from .delta import DeltaFeed
+    from .panel import PUPanel
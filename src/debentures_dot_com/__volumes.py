@@ -1,9 +0,0 @@
-
-volume/volumeporperiodo_e.asp?op_exc=False&emissao=0&dt_ini=01%2F07%2F2025&dt_fim=23%2F07%2F2025&ICVM=&moeda=1
-volume/volumeporperiodo_e.asp?op_exc=Nada&emissao=2&dt_ini=01%2F07%2F2024&dt_fim=23%2F07%2F2025&ICVM=&moeda=1
-
-/volume/volumeporgarantia-especie_d.asp?pMes_Ini=05&pAno_Ini=2025&pMes_Fim=07&pAno_Fim=2025&moeda=1&pConsol=1&op_exc=Nada&ICVM=%20NULL
-volume/volumeporgarantia-especie_d.asp?pMes_Ini=5&pAno_Ini=2025&pMes_Fim=5&pAno_Fim=2025&pConsol=0&moeda=1&op_exc=Nada&ICVM=%20NULL
-volume/volumeporgarantia-especie_de.asp?pMes_Ini=05&pAno_Ini=2025&pMes_Fim=07&pAno_Fim=2025&moeda=1&pConsol=1&op_exc=Nada&ICVM
-
-https://www.debentures.com.br/exploreosnd/consultaadados/volume/volumeporgarantia-especie_de.asp?pMes_Ini=05&pAno_Ini=2025&pMes_Fim=07&pAno_Fim=2025&moeda=1&pConsol=1&op_exc=Nada&ICVM=%20NULL&ICVM=NULL
\ No newline at end of file
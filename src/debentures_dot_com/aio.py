@@ -0,0 +1,82 @@
+"""
+Asyncio counterparts of the endpoint classes.
+
+Each class keeps the method names and parameters of its blocking sibling; every
+endpoint method returns a coroutine instead of a DataFrame:
+
+    async with AsyncTransport(max_concurrency=64) as transport:
+        ed = AsyncEmissoesDebentures(transport=transport)
+        dfs = await asyncio.gather(*(ed.pu_historico(a) for a in ativos))
+
+The iter_* methods return async generators instead (async for df in ...).
+"""
+from .emissoes import EmissoesDebentures, _consolida_lote
+from .estoques import EstoquesCorporativos
+from .eventos_fin import EventosFinanceiros
+from .mercados import MercadoSecundario
+from .volumes import VolumesNegociados
+from .utils.query import Query
+from .utils.query import _windows_result, _pop_schema
+from .utils.schemas import apply_schema
+from .utils.arrow import column_values
+from .utils.async_transport import AsyncTransport, run_query_async, run_many_async, iter_query_async, get_default_async_transport
+
+
+class _AsyncClient:
+    def __init__(self, transport:AsyncTransport=None, raw:bool=False, output:str=None, errors:str=None):
+        super().__init__(transport=transport if transport is not None else get_default_async_transport(), raw=raw,
+                         output=output, errors=errors)
+
+    async def _run(self, query:Query):
+        if self.errors == 'raise':
+            results = await run_many_async([query], self.transport)
+            self._check(results)
+            return self._output(results[0][0])
+        return self._output(await run_query_async(query, self.transport))
+
+    async def _run_windows(self, queries:list, max_workers:int=None):
+        schema = _pop_schema(queries)
+        results = await run_many_async(queries, self.transport)
+        self._check(results)
+        return self._output(_windows_result(queries, results, schema))
+
+    async def _iter(self, query:Query, chunksize:int=None):
+        async for df in iter_query_async(query, self.transport, chunksize):
+            yield self._output(df)
+
+
+class AsyncEmissoesDebentures(_AsyncClient, EmissoesDebentures):
+
+    async def pu_historico_lote(self, ativos:list=None, dt_inicio:str=None, dt_fim:str=None, max_workers:int=None,
+                                timeout:int=None)->tuple:
+        # max_workers is kept for signature parity; concurrency is bounded by the transport's semaphore
+        if ativos is None:
+            (df, erro), = await run_many_async([self._query_lista_deb_publicas(timeout)], self.transport)
+            if erro is not None:
+                raise erro
+            ativos = column_values(df, 'Ativo')
+        ativos = self._ativos_lote(ativos)
+        queries = [self._query_pu_historico(a, dt_inicio, dt_fim, timeout) for a in ativos]
+        schema = _pop_schema(queries)
+        df, status = _consolida_lote(ativos, await run_many_async(queries, self.transport))
+        return self._output((apply_schema(df, schema) if schema is not None else df, status))
+
+
+class AsyncEstoquesCorporativos(_AsyncClient, EstoquesCorporativos):
+    pass
+
+
+class AsyncEventosFinanceiros(_AsyncClient, EventosFinanceiros):
+    pass
+
+
+class AsyncMercadoSecundario(_AsyncClient, MercadoSecundario):
+
+    async def arquivo_precos_periodo(self, dt_ini:str, dt_fim:str=None, arquivo:str=None, max_workers:int=None,
+                                     timeout:int=None)->tuple:
+        dias, lidos, pendentes, queries = self._plano_precos_periodo(dt_ini, dt_fim, arquivo, timeout)
+        return self._consolida_precos_periodo(dias, lidos, pendentes, await run_many_async(queries, self.transport), arquivo)
+
+
+class AsyncVolumesNegociados(_AsyncClient, VolumesNegociados):
+    pass
@@ -0,0 +1,469 @@
+"""
+Command line batch extraction from a job file.
+
+    debentures-dot-com run jobs.toml
+
+A job file (TOML or YAML) lists endpoint calls. Jobs can fan out over a list of values or
+over a column of another job's result, run after the jobs they depend on, and are retried
+on failure. Every call of the run shares one thread pool, so max_workers bounds the
+requests in flight across all jobs. Each job writes one file (or Parquet dataset) to the
+output directory, and the run writes a summary with the timings of every job.
+
+    [run]
+    output_dir = "saida"
+    max_workers = 8
+    format = "csv"              # or "parquet"
+    retries = 2                 # per job, overridable in each job
+
+    [[jobs]]
+    name = "publicas"
+    endpoint = "lista_deb_publicas"
+
+    [[jobs]]
+    name = "pu"
+    endpoint = "pu_historico"
+    foreach = { ativo = "publicas.Ativo" }     # values of the 'Ativo' column of job 'publicas'
+    params = { dt_inicio = "20240101" }
+
+    [[jobs]]
+    name = "estoques"
+    endpoint = "estoque_relatorio"
+    foreach = { tipo = ["Indexadores", "Tipo", "Forma"] }
+
+    [[jobs]]
+    name = "agenda"
+    endpoint = "agenda_eventos"
+    params = { dt_ini = "@next_month_start", dt_fim = "@next_month_end" }
+
+String values starting with '@' are dates relative to the day of the run: @today, @today+N,
+@today-N (days), @month_start, @month_end, @next_month_start, @next_month_end,
+@prev_month_start, @prev_month_end and @year_start.
+
+    debentures-dot-com sync-caracteristicas --path caracteristicas.sqlite
+
+refreshes the local mirror of the characteristics export (see CaracteristicasMirror).
+
+    debentures-dot-com crawl --path universo
+
+fetches the characteristics, PU history and PU events of every public debenture into one
+file per ticker, resuming where an interrupted run stopped (see UniverseCrawl).
+
+    debentures-dot-com delta --path delta.sqlite --output mudancas.csv
+
+writes what changed in the public list and in its characteristics since the last call (see DeltaFeed).
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+import pandas as pd
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .emissoes import EmissoesDebentures
+from .estoques import EstoquesCorporativos
+from .eventos_fin import EventosFinanceiros
+from .mercados import MercadoSecundario
+from .mirror import CaracteristicasMirror
+from .crawl import UniverseCrawl
+from .delta import DeltaFeed
+from .utils.transport import Transport
+
+_CLASSES = (EmissoesDebentures, EstoquesCorporativos, EventosFinanceiros, MercadoSecundario)
+_FORMATS = ('csv', 'parquet')
+_RELATIVA = re.compile(r'@(today|month_start|month_end|next_month_start|next_month_end|prev_month_start|'
+                       r'prev_month_end|year_start)(?:([+-])(\d+))?')
+
+
+def _inicio_mes(dia:date, meses:int=0) -> date:
+    ano, mes = divmod(dia.month - 1 + meses, 12)
+    return date(dia.year + ano, mes + 1, 1)
+
+
+def resolve_date(value:str, hoje:date=None) -> str:
+    """
+    Resolves a relative date such as '@today-7' or '@next_month_end' to YYYYMMDD.
+    Other values are returned unchanged.
+    """
+    match = _RELATIVA.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        return value
+    hoje = hoje or date.today()
+    nome, sinal, dias = match.groups()
+    dia = {
+        'today': hoje,
+        'month_start': _inicio_mes(hoje),
+        'month_end': _inicio_mes(hoje, 1) - timedelta(days=1),
+        'next_month_start': _inicio_mes(hoje, 1),
+        'next_month_end': _inicio_mes(hoje, 2) - timedelta(days=1),
+        'prev_month_start': _inicio_mes(hoje, -1),
+        'prev_month_end': _inicio_mes(hoje) - timedelta(days=1),
+        'year_start': date(hoje.year, 1, 1),
+    }[nome]
+    if dias:
+        dia += timedelta(days=int(dias) * (1 if sinal == '+' else -1))
+    return dia.strftime('%Y%m%d')
+
+
+def load_jobs(path:str) -> dict:
+    """
+    Reads a TOML (.toml) or YAML (.yaml, .yml) job file.
+    """
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("YAML job files require PyYAML: pip install 'debentures-dot-com[jobs]'")
+        with open(path, encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    try:
+        import tomllib
+    except ImportError: # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ImportError("TOML job files require tomli on Python < 3.11: pip install 'debentures-dot-com[jobs]'")
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def _endpoint(nome:str):
+    # 'metodo' or 'Classe.metodo'; the public method names do not repeat across classes
+    classe, _, metodo = nome.rpartition('.')
+    candidatos = [c for c in _CLASSES if (not classe or c.__name__ == classe)
+                  and not metodo.startswith('_') and callable(getattr(c, metodo, None))]
+    if not candidatos:
+        raise ValueError(f"Unknown endpoint '{nome}'.")
+    return candidatos[0], metodo
+
+
+class Job:
+    """
+    One entry of the job file.
+
+    Args:
+        spec: The job's table: name, endpoint, params, foreach, depends_on, retries,
+            retry_wait, partition_by and date_partition.
+        defaults: The [run] table, for retries and retry_wait.
+    """
+
+    def __init__(self, spec:dict, defaults:dict):
+        self.name = spec.get('name')
+        if not isinstance(self.name, str) or not self.name or '.' in self.name:
+            raise ValueError("Every job needs a 'name' without dots.")
+        if not isinstance(spec.get('endpoint'), str):
+            raise ValueError(f"Job '{self.name}' needs an 'endpoint'.")
+        self.endpoint = spec['endpoint']
+        self.classe, self.metodo = _endpoint(self.endpoint)
+        self.params = {k: resolve_date(v) for k, v in (spec.get('params') or {}).items()}
+        self.foreach = spec.get('foreach') or {}
+        retries = spec.get('retries', defaults.get('retries'))
+        self.retries = retries if isinstance(retries, int) else 0
+        retry_wait = spec.get('retry_wait', defaults.get('retry_wait'))
+        self.retry_wait = retry_wait if isinstance(retry_wait, (int, float)) else 5
+        self.partition_by = spec.get('partition_by')
+        self.date_partition = spec.get('date_partition')
+        self.depends_on = list(spec.get('depends_on') or [])
+        for valores in self.foreach.values():
+            if isinstance(valores, str):
+                origem = valores.partition('.')[0]
+                if origem not in self.depends_on:
+                    self.depends_on.append(origem)
+
+    def tasks(self, resultados:dict) -> list:
+        """
+        The keyword arguments of each call: params plus one combination of the foreach values.
+        """
+        nomes, listas = [], []
+        for param, valores in self.foreach.items():
+            if isinstance(valores, str):
+                origem, _, coluna = valores.partition('.')
+                df = resultados.get(origem)
+                valores = df[coluna].dropna().tolist() if isinstance(df, pd.DataFrame) and coluna in df.columns else []
+            nomes.append(param)
+            listas.append(list(dict.fromkeys(resolve_date(v) for v in valores)))
+        return [{**self.params, **dict(zip(nomes, combinacao))} for combinacao in itertools.product(*listas)]
+
+
+def _order(jobs:list) -> list:
+    por_nome = {}
+    for job in jobs:
+        if job.name in por_nome:
+            raise ValueError(f"Job '{job.name}' is defined twice.")
+        por_nome[job.name] = job
+    ordem, visitando = [], set()
+
+    def visita(job, caminho):
+        if job in ordem:
+            return
+        if job.name in visitando:
+            raise ValueError(f"Jobs depend on each other: {' -> '.join(caminho + [job.name])}")
+        visitando.add(job.name)
+        for dep in job.depends_on:
+            if dep not in por_nome:
+                raise ValueError(f"Job '{job.name}' depends on unknown job '{dep}'.")
+            visita(por_nome[dep], caminho + [job.name])
+        visitando.discard(job.name)
+        ordem.append(job)
+
+    for job in jobs:
+        visita(job, [])
+    return ordem
+
+
+def _call(client, job:Job, kwargs:dict):
+    # Runs one call of a job, retrying with exponential backoff; returns (result, attempts)
+    tentativa = 0
+    while True:
+        tentativa += 1
+        try:
+            return getattr(client, job.metodo)(**kwargs), tentativa
+        except Exception:
+            if tentativa > job.retries:
+                raise
+            time.sleep(job.retry_wait * 2 ** (tentativa - 1))
+
+
+def _combine(job:Job, partes:list):
+    # Fan-out results are stacked with their foreach values as leading columns
+    if not partes:
+        return pd.DataFrame()
+    if len(partes) == 1 and not job.foreach:
+        return partes[0][1]
+    if isinstance(partes[0][1], tuple):
+        return tuple(_combine(job, [(k, r[i]) for k, r in partes]) for i in range(len(partes[0][1])))
+    frames = []
+    for kwargs, df in partes:
+        df = df.copy()
+        for i, param in enumerate(job.foreach):
+            if param not in df.columns:
+                df.insert(i, param, kwargs[param])
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _write(job:Job, resultado, output_dir:str, formato:str) -> list:
+    if isinstance(resultado, tuple):
+        caminhos = []
+        for i, parte in enumerate(resultado):
+            caminhos += _write_frame(parte, os.path.join(output_dir, f'{job.name}_{i}'), job, formato)
+        return caminhos
+    return _write_frame(resultado, os.path.join(output_dir, job.name), job, formato)
+
+
+def _write_frame(df:pd.DataFrame, base:str, job:Job, formato:str) -> list:
+    if formato == 'parquet':
+        from .sinks import ParquetSink
+        ParquetSink(base, partition_by=job.partition_by, date_partition=job.date_partition).write(df)
+        return [base]
+    df.to_csv(base + '.csv', index=False)
+    return [base + '.csv']
+
+
+class Runner:
+    """
+    Runs the jobs of a job file on one thread pool, in dependency order.
+
+    A job starts once every job it depends on has finished with at least one successful
+    call; jobs whose dependencies failed are skipped. Calls raise on failure (errors='raise'),
+    so a failed call is retried instead of counted as an empty answer.
+
+    Args:
+        config: Content of the job file ('run' and 'jobs').
+        output_dir: Overrides run.output_dir.
+        max_workers: Overrides run.max_workers.
+        transport: Transport shared by the clients; sized for max_workers when not given.
+    """
+
+    def __init__(self, config:dict, output_dir:str=None, max_workers:int=None, transport:Transport=None):
+        defaults = config.get('run') or {}
+        self.output_dir = output_dir or defaults.get('output_dir') or '.'
+        max_workers = max_workers or defaults.get('max_workers')
+        self.max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else 8
+        self.format = defaults.get('format') or 'csv'
+        if self.format not in _FORMATS:
+            raise ValueError("Parameter 'format' must be 'csv' or 'parquet'.")
+        self.jobs = _order([Job(spec, defaults) for spec in config.get('jobs') or []])
+        self.transport = transport if transport is not None else Transport(pool_maxsize=self.max_workers)
+        self._clients = {}
+
+    def _client(self, classe):
+        if classe not in self._clients:
+            self._clients[classe] = classe(transport=self.transport, errors='raise')
+        return self._clients[classe]
+
+    def run(self) -> pd.DataFrame:
+        """
+        Runs every job and returns the summary, also written to resumo.csv in the output directory.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        resultados, estado, resumo = {}, {}, []
+        pendentes = list(self.jobs)
+        em_curso = {}  # future -> (job, kwargs)
+        progresso = {}  # job name -> [tasks left, successes, errors, attempts, start]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pendentes or em_curso:
+                for job in list(pendentes):
+                    deps = [estado.get(d) for d in job.depends_on]
+                    if any(e is None for e in deps):
+                        continue
+                    pendentes.remove(job)
+                    if any(e in ('falhou', 'ignorado') for e in deps):
+                        estado[job.name] = 'ignorado'
+                        resumo.append(self._linha(job, 'ignorado', 0, 0, 0, 0, 0.0, [], 'dependency failed'))
+                        continue
+                    tasks = job.tasks(resultados)
+                    progresso[job.name] = [len(tasks), [], [], 0, time.perf_counter()]
+                    if not tasks:
+                        estado[job.name] = 'ok'
+                        resultados[job.name] = pd.DataFrame()
+                        resumo.append(self._linha(job, 'ok', 0, 0, 0, 0, 0.0, [], None))
+                    for kwargs in tasks:
+                        em_curso[executor.submit(_call, self._client(job.classe), job, kwargs)] = (job, kwargs)
+                if not em_curso:
+                    continue
+                prontos, _ = wait(em_curso, return_when=FIRST_COMPLETED)
+                for future in prontos:
+                    job, kwargs = em_curso.pop(future)
+                    p = progresso[job.name]
+                    p[0] -= 1
+                    try:
+                        resultado, tentativas = future.result()
+                        p[1].append((kwargs, resultado))
+                        p[3] += tentativas
+                    except Exception as e:
+                        p[2].append(f'{kwargs}: {type(e).__name__}: {e}')
+                        p[3] += job.retries + 1
+                    if p[0] == 0:
+                        resumo.append(self._finish(job, p, resultados, estado))
+
+        resumo = pd.DataFrame(resumo, columns=['Job', 'Endpoint', 'Status', 'Chamadas', 'Falhas', 'Tentativas',
+                                               'Linhas', 'Segundos', 'Arquivos', 'Erro'])
+        resumo.to_csv(os.path.join(self.output_dir, 'resumo.csv'), index=False)
+        return resumo
+
+    def _finish(self, job:Job, progresso:list, resultados:dict, estado:dict) -> tuple:
+        _, partes, erros, tentativas, inicio = progresso
+        status = 'ok' if not erros else ('parcial' if partes else 'falhou')
+        estado[job.name] = status
+        arquivos, linhas = [], 0
+        if partes:
+            resultado = _combine(job, partes)
+            resultados[job.name] = resultado[0] if isinstance(resultado, tuple) else resultado
+            linhas = sum(len(r) for r in (resultado if isinstance(resultado, tuple) else (resultado,)))
+            try:
+                arquivos = _write(job, resultado, self.output_dir, self.format)
+            except Exception as e:
+                estado[job.name] = status = 'falhou'
+                erros.append(f'write: {type(e).__name__}: {e}')
+        return self._linha(job, status, len(partes) + len(erros), len(erros), tentativas, linhas,
+                           time.perf_counter() - inicio, arquivos, '; '.join(erros) or None)
+
+    def _linha(self, job:Job, status:str, chamadas:int, falhas:int, tentativas:int, linhas:int, segundos:float,
+               arquivos:list, erro:str) -> tuple:
+        return (job.name, job.endpoint, status, chamadas, falhas, tentativas, linhas, round(segundos, 3),
+                ', '.join(arquivos), erro)
+
+
+def main(argv:list=None) -> int:
+    ap = argparse.ArgumentParser(prog='debentures-dot-com', description='Batch extraction from debentures.com.br.')
+    sub = ap.add_subparsers(dest='comando', required=True)
+    run = sub.add_parser('run', help='Runs the jobs of a TOML or YAML job file.')
+    run.add_argument('arquivo', help='Job file (.toml, .yaml or .yml).')
+    run.add_argument('--output-dir', help='Overrides run.output_dir.')
+    run.add_argument('--max-workers', type=int, help='Overrides run.max_workers.')
+    run.add_argument('--only', help='Comma separated job names to run, with the jobs they depend on.')
+    run.add_argument('--dry-run', action='store_true', help='Prints the job order and exits.')
+    espelho = sub.add_parser('sync-caracteristicas', help='Mirrors the characteristics export into a local SQLite file.')
+    espelho.add_argument('--path', help='SQLite file of the mirror (see CaracteristicasMirror).')
+    espelho.add_argument('--tipo', help="tipo of the export, the endpoint's default when not given.")
+    espelho.add_argument('--exec', action='store_true', help='Mirrors the export with exec=True.')
+    crawl = sub.add_parser('crawl', help='Crawls every public debenture, resuming interrupted runs.')
+    crawl.add_argument('--path', required=True, help='Directory of the crawl and its journal.')
+    crawl.add_argument('--endpoints', help='Comma separated endpoints, all of them by default.')
+    crawl.add_argument('--max-workers', type=int, help='Downloads in flight.')
+    crawl.add_argument('--processes', type=int, help='Parser processes, 0 to parse on the download threads.')
+    crawl.add_argument('--format', choices=('csv', 'parquet'), help='Format of the files, csv by default.')
+    crawl.add_argument('--refresh', action='store_true', help='Enumerates lista_deb_publicas again.')
+    delta = sub.add_parser('delta', help='Lists the changes of the public list and characteristics since the last call.')
+    delta.add_argument('--path', help='SQLite file of the feed (see DeltaFeed).')
+    delta.add_argument('--output', help='CSV file of the changes; printed when not given.')
+    args = ap.parse_args(argv)
+    if args.comando == 'sync-caracteristicas':
+        return _sync_caracteristicas(args)
+    if args.comando == 'crawl':
+        return _crawl(args)
+    if args.comando == 'delta':
+        return _delta(args)
+
+    config = load_jobs(args.arquivo)
+    if args.only:
+        config = dict(config, jobs=_select(config.get('jobs') or [], args.only.split(','), config.get('run') or {}))
+    runner = Runner(config, output_dir=args.output_dir, max_workers=args.max_workers)
+    if args.dry_run:
+        for job in runner.jobs:
+            deps = f" after {', '.join(job.depends_on)}" if job.depends_on else ''
+            print(f'{job.name}: {job.classe.__name__}.{job.metodo}{deps}')
+        return 0
+    resumo = runner.run()
+    with pd.option_context('display.max_colwidth', 60, 'display.width', 200):
+        print(resumo.drop(columns=['Arquivos']).to_string(index=False))
+    print(json.dumps({'jobs': len(resumo), 'segundos': round(float(resumo['Segundos'].max() if len(resumo) else 0), 3),
+                      'status': resumo['Status'].value_counts().to_dict()}, ensure_ascii=False))
+    return 0 if resumo['Status'].isin(['ok']).all() else 1
+
+
+def _sync_caracteristicas(args) -> int:
+    mirror = CaracteristicasMirror(args.path)
+    try:
+        linhas = mirror.sync(tipo=args.tipo, exec=args.exec or None)
+        print(f'{linhas} rows mirrored to {mirror.path}')
+        print(mirror.status().to_string(index=False))
+    finally:
+        mirror.close()
+    return 0
+
+
+def _crawl(args) -> int:
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()] if args.endpoints else None
+    with UniverseCrawl(args.path, endpoints=endpoints, max_workers=args.max_workers, processes=args.processes,
+                       format=args.format) as crawl:
+        status = crawl.run(refresh=args.refresh)
+        print(status.to_string(index=False))
+        falhas = crawl.failures()
+        if len(falhas):
+            with pd.option_context('display.max_colwidth', 80, 'display.width', 200):
+                print(falhas.to_string(index=False))
+    return 0 if status['Pendentes'].eq(0).all() and status['Erros'].eq(0).all() else 1
+
+
+def _delta(args) -> int:
+    with DeltaFeed(args.path) as feed:
+        mudancas = feed.sync()
+        pendentes = len(feed.pending())
+    if args.output:
+        mudancas.to_csv(args.output, index=False)
+        print(f'{len(mudancas)} changes written to {args.output}')
+    else:
+        print(mudancas.to_string(index=False))
+    return 0 if not pendentes else 1
+
+
+def _select(specs:list, nomes:list, defaults:dict) -> list:
+    jobs = {s.get('name'): Job(s, defaults) for s in specs}
+    escolhidos, fila = set(), [n.strip() for n in nomes if n.strip()]
+    while fila:
+        nome = fila.pop()
+        if nome not in jobs:
+            raise ValueError(f"Unknown job '{nome}'.")
+        if nome not in escolhidos:
+            escolhidos.add(nome)
+            fila.extend(jobs[nome].depends_on)
+    return [s for s in specs if s.get('name') in escolhidos]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import os
+import time
+import sqlite3
+import multiprocessing
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from .emissoes import EmissoesDebentures
+from .eventos_fin import EventosFinanceiros
+from .utils.arrow import column_values
+from .utils.events import RequestEvent, emit
+from .utils.query import fetch_query, _parse
+from .utils.transport import Transport
+
+# endpoint -> (client class, query builder); every builder takes ativo= and timeout=
+ENDPOINTS = {
+    'lista_caracteristicas': (EmissoesDebentures, '_query_lista_caracteristicas'),
+    'pu_historico': (EmissoesDebentures, '_query_pu_historico'),
+    'pu_eventos': (EventosFinanceiros, '_query_pu_eventos'),
+}
+_FORMATS = ('csv', 'parquet')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ativos (ativo TEXT PRIMARY KEY, adicionado REAL);
+CREATE TABLE IF NOT EXISTS tarefas (
+    endpoint TEXT,
+    ativo TEXT,
+    status TEXT,
+    tentativas INTEGER,
+    linhas INTEGER,
+    arquivo TEXT,
+    erro TEXT,
+    atualizado REAL,
+    PRIMARY KEY (endpoint, ativo)
+);
+"""
+
+
+def _write_frame(df:pd.DataFrame, destino:str, formato:str):
+    # Written aside and renamed, so a killed run never leaves a half written file behind
+    temporario = f'{destino}.tmp'
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        from .utils.arrow import to_arrow
+        pq.write_table(to_arrow(df), temporario)
+    else:
+        df.to_csv(temporario, index=False)
+    os.replace(temporario, destino)
+
+
+def _parse_task(query, content:bytes, encoding:str, destino:str, formato:str) -> int:
+    # Runs in the parser processes: parses and types one response and writes it, returning its rows
+    df = _parse(query, content, encoding)
+    _write_frame(df, destino, formato)
+    return len(df)
+
+
+class UniverseCrawl:
+    """
+    Resumable crawl of lista_caracteristicas, pu_historico and pu_eventos for every ticker
+    of lista_deb_publicas, written to one file per ticker and endpoint.
+
+    Downloads run on a thread pool while the responses are parsed on a process pool, so
+    the network and the parsers work at the same time. Every finished task is committed to
+    a journal (crawl.sqlite, next to the files) as soon as its file is written: a run that
+    is killed or loses the network resumes with the tasks still missing, and failures are
+    recorded with their error instead of being taken for empty results.
+
+    Args:
+        path: Directory of the crawl: the journal and a subdirectory per endpoint.
+        endpoints: Endpoints fetched for each ticker, all of ENDPOINTS by default.
+        transport: Transport of the downloads; sized for max_workers when not given.
+        max_workers: Downloads in flight.
+        processes: Parser processes, 0 to parse on the download threads. Defaults to the
+            number of CPUs, up to 4.
+        retries: Retries of a failed download within a run, with exponential backoff.
+        retry_wait: Seconds before the first retry.
+        format: 'csv' (default) or 'parquet', which keeps the column types.
+        raw: Keeps the text columns of the exports instead of typed ones.
+    """
+
+    def __init__(self, path:str, endpoints:list=None, transport:Transport=None, max_workers:int=None,
+                 processes:int=None, retries:int=None, retry_wait:float=None, format:str=None, raw:bool=False):
+        self.endpoints = list(endpoints) if endpoints else list(ENDPOINTS)
+        desconhecidos = [e for e in self.endpoints if e not in ENDPOINTS]
+        if desconhecidos:
+            raise ValueError(f"Unknown endpoints {', '.join(desconhecidos)}; use {', '.join(ENDPOINTS)}.")
+        self.format = format if isinstance(format, str) else 'csv'
+        if self.format not in _FORMATS:
+            raise ValueError("Parameter 'format' must be 'csv' or 'parquet'.")
+        self.max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else 8
+        self.processes = processes if isinstance(processes, int) and processes >= 0 else min(4, os.cpu_count() or 1)
+        self.retries = retries if isinstance(retries, int) else 2
+        self.retry_wait = retry_wait if isinstance(retry_wait, (int, float)) else 5
+        self.transport = transport if transport is not None else Transport(pool_maxsize=self.max_workers)
+        self.path = path
+        for endpoint in self.endpoints:
+            os.makedirs(os.path.join(path, endpoint), exist_ok=True)
+        self.emissoes = EmissoesDebentures(transport=self.transport, raw=raw, errors='raise')
+        self.eventos = EventosFinanceiros(transport=self.transport, raw=raw, errors='raise')
+        self._conn = sqlite3.connect(os.path.join(path, 'crawl.sqlite'))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def _client(self, endpoint:str):
+        return self.emissoes if ENDPOINTS[endpoint][0] is EmissoesDebentures else self.eventos
+
+    def _query(self, endpoint:str, ativo:str, timeout:int=None):
+        return getattr(self._client(endpoint), ENDPOINTS[endpoint][1])(ativo=ativo, timeout=timeout)
+
+    def _arquivo(self, endpoint:str, ativo:str) -> str:
+        return os.path.join(self.path, endpoint, f'{ativo}.{self.format}')
+
+    def ativos(self) -> list:
+        """
+        Tickers of the crawl, as enumerated by the first run (or the last refresh).
+        """
+        return [r[0] for r in self._conn.execute('SELECT ativo FROM ativos ORDER BY ativo')]
+
+    def refresh(self, timeout:int=None) -> int:
+        """
+        Adds the tickers of lista_deb_publicas that the crawl does not know yet.
+
+        Returns:
+            The number of new tickers.
+        """
+        ativos = [a for a in column_values(self.emissoes.lista_deb_publicas(timeout=timeout), 'Ativo') if a]
+        with self._conn:
+            antes = self._conn.total_changes
+            self._conn.executemany('INSERT OR IGNORE INTO ativos VALUES (?, ?)', [(a, time.time()) for a in ativos])
+            return self._conn.total_changes - antes
+
+    def _pendentes(self, retry_failed:bool) -> list:
+        feitos = {(e, a) for e, a, s in self._conn.execute('SELECT endpoint, ativo, status FROM tarefas')
+                  if s == 'ok' or (s == 'erro' and not retry_failed)}
+        return [(e, a) for a in self.ativos() for e in self.endpoints if (e, a) not in feitos]
+
+    def _registrar(self, endpoint:str, ativo:str, status:str, tentativas:int, linhas:int=None, erro:Exception=None):
+        arquivo = self._arquivo(endpoint, ativo) if status == 'ok' else None
+        texto = None if erro is None else f'{type(erro).__name__}: {erro}'
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO tarefas VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               (endpoint, ativo, status, tentativas, linhas, arquivo, texto, time.time()))
+
+    def _fetch(self, query) -> tuple:
+        # Downloads one response, retrying with exponential backoff; returns (content, encoding, attempts)
+        tentativa = 0
+        while True:
+            tentativa += 1
+            event = RequestEvent(query.endpoint, query.url, query.method)
+            inicio = time.perf_counter()
+            try:
+                content, encoding = fetch_query(query, self.transport, event)
+                return content, encoding, tentativa
+            except Exception as e:
+                event.error = e
+                if tentativa > self.retries:
+                    e.tentativas = tentativa
+                    raise
+            finally:
+                event.total_s = time.perf_counter() - inicio
+                emit(event)
+            time.sleep(self.retry_wait * 2 ** (tentativa - 1))
+
+    def run(self, refresh:bool=False, retry_failed:bool=True, max_tasks:int=None, timeout:int=None) -> pd.DataFrame:
+        """
+        Runs the tasks still missing from the journal.
+
+        Args:
+            refresh: Enumerates lista_deb_publicas again, adding new tickers. The first run always does.
+            retry_failed: Also runs the tasks that failed in earlier runs.
+            max_tasks: Stops after starting this many tasks, for time boxed runs.
+            timeout: Timeout of each request, in seconds.
+
+        Returns:
+            The status of the crawl (see status()).
+        """
+        if refresh or not self.ativos():
+            self.refresh(timeout)
+        fila = deque(self._pendentes(retry_failed)[:max_tasks] if max_tasks else self._pendentes(retry_failed))
+        # Bodies waiting for a parser are held in memory; a few per download thread keeps both pools busy
+        limite = self.max_workers + 2 * max(self.processes, 1)
+        processos = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn')) \
+            if self.processes else nullcontext()
+        buscas, parses = {}, {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as rede, processos as cpu:
+            parsers = cpu if self.processes else rede
+            while fila or buscas or parses:
+                while fila and len(buscas) + len(parses) < limite:
+                    endpoint, ativo = fila.popleft()
+                    query = self._query(endpoint, ativo, timeout)
+                    buscas[rede.submit(self._fetch, query)] = (endpoint, ativo, query)
+                prontos, _ = wait(list(buscas) + list(parses), return_when=FIRST_COMPLETED)
+                for future in prontos:
+                    if future in buscas:
+                        endpoint, ativo, query = buscas.pop(future)
+                        try:
+                            content, encoding, tentativas = future.result()
+                        except Exception as e:
+                            self._registrar(endpoint, ativo, 'erro', getattr(e, 'tentativas', 1), erro=e)
+                            continue
+                        destino = self._arquivo(endpoint, ativo)
+                        tarefa = parsers.submit(_parse_task, query, content, encoding, destino, self.format)
+                        parses[tarefa] = (endpoint, ativo, tentativas)
+                    else:
+                        endpoint, ativo, tentativas = parses.pop(future)
+                        try:
+                            self._registrar(endpoint, ativo, 'ok', tentativas, linhas=future.result())
+                        except Exception as e:
+                            self._registrar(endpoint, ativo, 'erro', tentativas, erro=e)
+        return self.status()
+
+    def status(self) -> pd.DataFrame:
+        """
+        One row per endpoint: Ativos, Ok, Erros, Pendentes and Linhas written.
+        """
+        contagens = {(e, s): (n, l) for e, s, n, l in self._conn.execute(
+            'SELECT endpoint, status, COUNT(*), SUM(linhas) FROM tarefas WHERE ativo IN (SELECT ativo FROM ativos) '
+            'GROUP BY endpoint, status')}
+        total = len(self.ativos())
+        linhas = []
+        for endpoint in self.endpoints:
+            ok, n_linhas = contagens.get((endpoint, 'ok'), (0, 0))
+            erros = contagens.get((endpoint, 'erro'), (0, 0))[0]
+            linhas.append((endpoint, total, ok, erros, total - ok - erros, n_linhas or 0))
+        return pd.DataFrame(linhas, columns=['Endpoint', 'Ativos', 'Ok', 'Erros', 'Pendentes', 'Linhas'])
+
+    def failures(self) -> pd.DataFrame:
+        """
+        The failed tasks, with their attempts and error.
+        """
+        return pd.read_sql_query("SELECT endpoint AS Endpoint, ativo AS Ativo, tentativas AS Tentativas, erro AS Erro "
+                                 "FROM tarefas WHERE status = 'erro' ORDER BY endpoint, ativo", self._conn)
+
+    def load(self, endpoint:str) -> pd.DataFrame:
+        """
+        The crawled results of an endpoint in one DataFrame, with an 'Ativo' column when the
+        export has none. Column types are kept with format='parquet'.
+        """
+        if endpoint not in self.endpoints:
+            raise ValueError(f"Parameter 'endpoint' must be one of {', '.join(self.endpoints)}.")
+        frames = []
+        for ativo, arquivo in self._conn.execute("SELECT ativo, arquivo FROM tarefas WHERE endpoint = ? AND status = 'ok' "
+                                                 "AND linhas > 0 ORDER BY ativo", (endpoint,)):
+            df = pd.read_parquet(arquivo) if self.format == 'parquet' else pd.read_csv(arquivo)
+            if 'Ativo' not in df.columns:
+                df.insert(0, 'Ativo', ativo)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f'UniverseCrawl({self.path!r}, {len(self.ativos())} ativos)'
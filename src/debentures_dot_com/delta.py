@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import pandas as pd
+from .emissoes import EmissoesDebentures
+from .exceptions import ParseError
+from .utils.query import run_many, resolve_errors
+from .utils.transport import Transport, _resolve_transport
+
+FONTES = ('lista_deb_publicas', 'lista_caracteristicas')
+COLUNAS = ['Ativo', 'Fonte', 'Mudança', 'Campo', 'Anterior', 'Atual']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS linhas (
+    fonte TEXT,
+    ativo TEXT,
+    hash TEXT,
+    dados TEXT,
+    visto REAL,
+    PRIMARY KEY (fonte, ativo)
+);
+CREATE TABLE IF NOT EXISTS pendentes (ativo TEXT PRIMARY KEY, erro TEXT);
+CREATE TABLE IF NOT EXISTS syncs (id INTEGER PRIMARY KEY AUTOINCREMENT, momento REAL, ativos INTEGER, mudancas INTEGER);
+CREATE TABLE IF NOT EXISTS mudancas (
+    sync INTEGER,
+    ativo TEXT,
+    fonte TEXT,
+    mudanca TEXT,
+    campo TEXT,
+    anterior TEXT,
+    atual TEXT
+);
+"""
+
+
+def _texto(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    return str(valor).strip()
+
+
+def _hash(dados:dict) -> str:
+    return hashlib.sha1(json.dumps(dados, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _linhas_publicas(df:pd.DataFrame) -> dict:
+    # ticker -> {column: text}; a ticker listed twice keeps its first row
+    linhas = {}
+    for registro in df.to_dict('records'):
+        dados = {str(c): _texto(v) for c, v in registro.items()}
+        ativo = dados.get('Ativo')
+        if ativo and ativo not in linhas:
+            linhas[ativo] = dados
+    return linhas
+
+
+def _campos_caracteristicas(df:pd.DataFrame) -> dict:
+    # lista_caracteristicas answers one (Descricao, Valores) row per field
+    if df.shape[1] < 2:
+        return {}
+    return {str(campo).strip(): _texto(valor) for campo, valor in zip(df.iloc[:, 0], df.iloc[:, 1]) if _texto(campo)}
+
+
+def _diff(fonte:str, anterior:dict, atual:dict) -> list:
+    # Rows of COLUNAS between two {ticker: {field: text}} snapshots of one source
+    mudancas = []
+    for ativo in sorted(atual.keys() - anterior.keys()):
+        mudancas.append((ativo, fonte, 'novo', None, None, None))
+    for ativo in sorted(anterior.keys() - atual.keys()):
+        mudancas.append((ativo, fonte, 'removido', None, None, None))
+    for ativo in sorted(atual.keys() & anterior.keys()):
+        antes, depois = anterior[ativo], atual[ativo]
+        for campo in sorted(antes.keys() | depois.keys()):
+            if antes.get(campo) != depois.get(campo):
+                mudancas.append((ativo, fonte, 'alterado', campo, antes.get(campo), depois.get(campo)))
+    return mudancas
+
+
+class DeltaFeed:
+    """
+    Change feed of the public debenture list and of the characteristics of its tickers.
+
+    lista_deb_publicas and lista_caracteristicas always answer full snapshots. The feed keeps
+    the last snapshot of each ticker in one SQLite file, hashed per ticker, and sync() returns
+    only what changed since the previous sync: new and removed tickers and, for the changed
+    ones, every field with its previous and current value. lista_caracteristicas is then
+    fetched only for the new and changed tickers (all of them on the first sync, which builds
+    the baseline), concurrently on max_workers threads.
+
+    A ticker whose characteristics fail to download stays pending and is fetched again by
+    the next sync, so a failure is never taken for "nothing changed".
+
+    Args:
+        path: SQLite file. Defaults to ~/.cache/debentures_dot_com/delta.sqlite.
+        transport: Transport of the requests.
+        max_workers: lista_caracteristicas requests in flight.
+        errors: 'print' (default) reports the tickers whose characteristics failed, 'raise'
+            raises the first failure once the rest of the sync is saved.
+    """
+
+    def __init__(self, path:str=None, transport:Transport=None, max_workers:int=None, errors:str=None):
+        if not isinstance(path, str):
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'debentures_dot_com', 'delta.sqlite')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.transport = _resolve_transport(transport)
+        self.max_workers = max_workers if isinstance(max_workers, int) else 8
+        self.errors = resolve_errors(errors)
+        # Text columns, so a change of the typing rules is never reported as a change of the data
+        self.emissoes = EmissoesDebentures(transport=self.transport, raw=True, errors='raise')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def _snapshot(self, fonte:str, ativos:set=None) -> dict:
+        linhas = self._conn.execute('SELECT ativo, dados FROM linhas WHERE fonte = ?', (fonte,))
+        return {a: json.loads(d) for a, d in linhas if ativos is None or a in ativos}
+
+    def _hashes(self, fonte:str) -> dict:
+        return dict(self._conn.execute('SELECT ativo, hash FROM linhas WHERE fonte = ?', (fonte,)))
+
+    def sync(self, ativos:list=None, timeout:int=None) -> pd.DataFrame:
+        """
+        Downloads lista_deb_publicas, compares it with the previous snapshot and refreshes
+        the characteristics of the new and changed tickers.
+
+        Args:
+            ativos: Tickers whose characteristics are fetched again even if their row of the
+                public list did not change.
+            timeout: Timeout of each request, in seconds.
+
+        Returns:
+            One row per change, with the columns Ativo, Fonte (lista_deb_publicas or
+            lista_caracteristicas), Mudança ('novo', 'removido' or 'alterado'), Campo,
+            Anterior and Atual; the last three are filled for 'alterado' only.
+
+        Raises:
+            ParseError: The public list came back empty or without an 'Ativo' column (e.g. a
+                maintenance page served with status 200). Nothing is written, so the stored
+                snapshot is kept and the next sync compares against it.
+        """
+        agora = time.time()
+        df = self.emissoes.lista_deb_publicas(timeout=timeout)
+        publicas = _linhas_publicas(df) if 'Ativo' in df.columns else {}
+        if not publicas:
+            # Taking it for a real answer would report every stored ticker as removed
+            raise ParseError('lista_deb_publicas returned no tickers; the sync was skipped.', 'lista_deb_publicas')
+        with self._lock:
+            hashes = self._hashes('lista_deb_publicas')
+            hashes_novos = {a: _hash(d) for a, d in publicas.items()}
+            mudou = {a for a, h in hashes_novos.items() if hashes.get(a) != h}
+            removidos = hashes.keys() - publicas.keys()
+            # Only the rows whose hash moved are decoded to list their fields
+            anterior = self._snapshot('lista_deb_publicas', mudou | removidos)
+            mudancas = _diff('lista_deb_publicas', anterior, {a: publicas[a] for a in mudou})
+            pendentes = [a for a, in self._conn.execute('SELECT ativo FROM pendentes')]
+
+        buscar = sorted((mudou | set(pendentes) | set(ativos or ())) & publicas.keys())
+        caracteristicas, falhas = {}, {}
+        queries = [self.emissoes._query_lista_caracteristicas(a, timeout) for a in buscar]
+        for ativo, (df, erro) in zip(buscar, run_many(queries, self.transport, self.max_workers)):
+            if erro is None:
+                caracteristicas[ativo] = _campos_caracteristicas(df)
+            else:
+                falhas[ativo] = erro
+
+        with self._lock:
+            antigas = self._snapshot('lista_caracteristicas', caracteristicas.keys())
+            # New and removed tickers are reported once, by the public list
+            mudancas += [m for m in _diff('lista_caracteristicas', antigas, caracteristicas) if m[2] == 'alterado']
+            with self._conn:
+                self._conn.executemany('INSERT OR REPLACE INTO linhas VALUES (?, ?, ?, ?, ?)',
+                                       [('lista_deb_publicas', a, hashes_novos[a], json.dumps(publicas[a], ensure_ascii=False), agora)
+                                        for a in mudou])
+                self._conn.executemany('INSERT OR REPLACE INTO linhas VALUES (?, ?, ?, ?, ?)',
+                                       [('lista_caracteristicas', a, _hash(d), json.dumps(d, ensure_ascii=False), agora)
+                                        for a, d in caracteristicas.items()])
+                self._conn.executemany('DELETE FROM linhas WHERE ativo = ?', [(a,) for a in removidos])
+                self._conn.execute('DELETE FROM pendentes')
+                self._conn.executemany('INSERT INTO pendentes VALUES (?, ?)',
+                                       [(a, f'{type(e).__name__}: {e}') for a, e in falhas.items()])
+                sync = self._conn.execute('INSERT INTO syncs (momento, ativos, mudancas) VALUES (?, ?, ?)',
+                                          (agora, len(publicas), len(mudancas))).lastrowid
+                self._conn.executemany('INSERT INTO mudancas VALUES (?, ?, ?, ?, ?, ?, ?)', [(sync, *m) for m in mudancas])
+
+        if falhas:
+            if self.errors == 'raise':
+                raise next(iter(falhas.values()))
+            print(f"lista_caracteristicas failed for {len(falhas)} tickers ({', '.join(sorted(falhas)[:5])}"
+                  f"{', ...' if len(falhas) > 5 else ''}); they are fetched again by the next sync.")
+        return pd.DataFrame(mudancas, columns=COLUNAS)
+
+    def snapshot(self, fonte:str='lista_deb_publicas') -> pd.DataFrame:
+        """
+        The stored snapshot of a source: the public list as of the last sync, or one row per
+        ticker and field of the characteristics.
+        """
+        if fonte not in FONTES:
+            raise ValueError("Parameter 'fonte' must be 'lista_deb_publicas' or 'lista_caracteristicas'.")
+        with self._lock:
+            linhas = sorted(self._snapshot(fonte).items())
+        if fonte == 'lista_deb_publicas':
+            return pd.DataFrame([d for _, d in linhas])
+        return pd.DataFrame([(a, c, v) for a, d in linhas for c, v in d.items()], columns=['Ativo', 'Campo', 'Valor'])
+
+    def pending(self) -> pd.DataFrame:
+        """
+        Tickers whose characteristics failed on the last sync, with the error.
+        """
+        with self._lock:
+            return pd.read_sql_query('SELECT ativo AS Ativo, erro AS Erro FROM pendentes ORDER BY ativo', self._conn)
+
+    def history(self, syncs:int=None) -> pd.DataFrame:
+        """
+        The changes reported by the last syncs (all of them by default), with the time of their sync.
+        """
+        limite = f'WHERE s.id > (SELECT MAX(id) FROM syncs) - {int(syncs)}' if syncs else ''
+        with self._lock:
+            df = pd.read_sql_query('SELECT s.momento AS Momento, m.ativo AS Ativo, m.fonte AS Fonte, m.mudanca AS "Mudança", '
+                                   'm.campo AS Campo, m.anterior AS Anterior, m.atual AS Atual '
+                                   f'FROM mudancas m JOIN syncs s ON s.id = m.sync {limite} ORDER BY m.rowid', self._conn)
+        df['Momento'] = pd.to_datetime(df['Momento'], unit='s')
+        return df
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,118 +1,227 @@
-import requests
 import io
+import inspect
 import pandas as pd
-from bs4 import BeautifulSoup
 from datetime import date
-from .utils.utils import get_response_to_pd, _format_cnpj, _format_date_for_url
+from .utils.utils import parse_tabular, _is_blank, _QUOTED_LINE, _is_past_date
+from .utils.params import Param, ParamSpec
+from .utils.query import Query, QueryClient, resolve_errors, run_many, bytes_parser, decode_body, _apparent_encoding, _pop_schema
+from .utils.schemas import apply_schema
+from .utils.html import find_tables, row_texts
+from .utils.transport import Transport, _resolve_transport
+from .utils.arrow import resolve_output, column_values
 from .__consulta_dados import UrlDebentures
 
-class EmissoesDebentures:
-    def __init__(self)->str:
+def _parse_lista_deb_publicas_text(text:str) -> pd.DataFrame:
+    # BeautifulSoup extraction, used when lxml is not installed
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(text, 'html.parser')
+    table = soup.find('table', class_='Tab10333333')
+    # Check if the table exists
+    if table:
+        df = []
+        # Extract table rows
+        rows = table.find_all('tr')
+        # Loop through rows and extract data
+        for row in rows:
+            cells = row.find_all(['td', 'th'])  # handles both header and data cells
+            cell_texts = [cell.get_text(strip=True) for cell in cells]
+            df.append(cell_texts[1:-1])
+        df = pd.DataFrame(df, columns = ['Ativo', 'Emissor', 'Dump', 'Situacao'])
+        df = df.drop(columns=['Dump'])
+    else:
+        df = pd.DataFrame()
+        print("Table with class 'Tab10333333' not found.")
+    return df
+
+@bytes_parser
+def _parse_lista_deb_publicas(content:bytes, encoding:str=None) -> pd.DataFrame:
+    # With lxml, only the page up to the list table is parsed and its cells are read from lxml's tree
+    encoding = encoding or _apparent_encoding(content)
+    tabelas = find_tables(content, encoding, ['Tab10333333'])
+    if tabelas is None:
+        return _parse_lista_deb_publicas_text(decode_body(content, encoding))
+    if 'Tab10333333' not in tabelas:
+        print("Table with class 'Tab10333333' not found.")
+        return pd.DataFrame()
+    rows = [cells[1:-1] for cells in row_texts(tabelas['Tab10333333'], ('td', 'th'))]
+    df = pd.DataFrame(rows, columns = ['Ativo', 'Emissor', 'Dump', 'Situacao'])
+    return df.drop(columns=['Dump'])
+
+def _parse_lista_caracteristicas_text(text:str) -> pd.DataFrame:
+    df = pd.read_csv(io.StringIO(text), sep='|', encoding='utf-8', names=['raw'], skiprows=2)
+    df = df[1:]['raw'].str.split('\t', expand=True).reset_index(drop=True)
+    df = df.T.reset_index(drop=True)
+    df.columns = ['Descricao', 'Valores']
+    return df
+
+@bytes_parser
+def _parse_lista_caracteristicas(content:bytes, encoding:str=None) -> pd.DataFrame:
+    # The export is a title, a line of descriptions and a line of values: zip the two lines
+    # into columns instead of splitting into a wide frame and transposing it
+    encoding = encoding if isinstance(encoding, str) else 'utf-8'
+    lines = [l for l in content.split(b'\n')[2:] if not _is_blank(l)]
+    if len(lines) != 3 or _QUOTED_LINE.search(content):
+        return _parse_lista_caracteristicas_text(content.decode(encoding, errors='replace'))
+    descricao, valores = (l.rstrip(b'\r').decode(encoding, errors='replace').split('\t') for l in lines[1:])
+    n = max(len(descricao), len(valores))
+    return pd.DataFrame({
+        'Descricao': descricao + [None] * (n - len(descricao)),
+        'Valores': valores + [None] * (n - len(valores)),
+    })
+
+def _post_prazo_medio(df:pd.DataFrame):
+    df_medio = df[:2]
+    df_medio = df_medio.iloc[:, :3]
+    df_medio.columns = ['', 'Tipo Prazo', 'Prazo Medio']
+    df_medio= df_medio.drop(columns='')
+    df_data = df[2:].reset_index(drop=True)
+    df_data.columns = df_data.iloc[0]
+    df_data = df_data[1:].reset_index(drop=True)[:-2]
+    return df_medio, df_data
+
+def _consolida_lote(ativos:list, results:list) -> tuple:
+    frames, status = [], []
+    for ativo, (df, erro) in zip(ativos, results):
+        if erro is None:
+            # The export may carry its own 'Ativo' column; keep a single one, first
+            df = df.drop(columns='Ativo') if 'Ativo' in df.columns else df.copy()
+            df.insert(0, 'Ativo', ativo)
+            frames.append(df)
+            status.append((ativo, True, len(df), None))
+        else:
+            status.append((ativo, False, 0, f'{type(erro).__name__}: {erro}'))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Ativo'])
+    return df, pd.DataFrame(status, columns=['Ativo', 'Sucesso', 'Linhas', 'Erro'])
+
+_LISTA_CARACTERISTICAS = ParamSpec('caracteristicas_e.asp', [Param('Ativo', 'ativo')])
+
+_PU_HISTORICO = ParamSpec('puhistorico_e.asp', [
+    Param('op_exc', kind='const', default='False'),
+    Param('ativo', template='{}++++'),
+    Param('dt_ini', 'dt_inicio', 'date'),
+    Param('dt_fim', kind='date'),
+])
+
+_PRAZO_MEDIO = ParamSpec('prazo-medio_e.asp', [
+    Param('Ativo', 'ativo'),
+    Param('Emissor', 'emissor', 'cnpj'),
+    Param('dataCVM', 'datacvm', default='e'),
+    Param('dt_ini', kind='date'),
+    Param('dt_fim', kind='date'),
+    Param('anoini', kind='year'),
+    Param('anofim', kind='year'),
+    Param('ComRepactuacao', 'repactuacao'),
+    Param('Op_exc', 'exec', default='Nada'),
+])
+
+_CONVERSAO_PERMUTA = ParamSpec('conversoes-permutas_e.asp', [
+    Param('ativo', template='{},%20'),
+    Param('op_exc', 'exec', 'bool', default=False),
+    Param('dt_ini', kind='date'),
+    Param('dt_fim', kind='date'),
+    'classe',
+])
+
+_CARACTERISTICAS_DEBS = ParamSpec('caracteristicas_e.asp', [
+    Param('tip_deb', 'tipo', default='privadas'),
+    Param('op_exc', 'exec', 'bool', default=False),
+    'mnome', 'ativo', Param('IPO', 'ipo'), 'icvm', Param('EscrituraPadronizada', 'escri_padro'),
+    'cvm_ini', 'cvm_fim', 'emis_ini', 'emis_fim', 'venc_ini', 'venc_fim', Param('TPV', 'tpv'), Param('TNV', 'tnv'),
+    'rent_ini', 'rent_fim', 'distrib_ini', 'distrib_fim', 'indice', Param('tipo', 'tipo_'), 'crit_calc', 'dia_ref',
+    'mult_rend', 'limite', 'trat_limite', 'tx_spread', 'prazo', 'premio_novo', 'premio_prazo', 'premio_antigo',
+    Param('Par', 'par'), 'amortizacao', 'mbanco', 'magente', 'instdep', 'coordenador',
+])
+
+class EmissoesDebentures(QueryClient):
+    def __init__(self, transport:Transport=None, raw:bool=False, output:str=None, errors:str=None)->str:
+        self.transport = _resolve_transport(transport)
+        self.raw = raw
+        self.output = resolve_output(output)
+        self.errors = resolve_errors(errors)
         root_url = UrlDebentures().root_url
         self.root_url = f'{root_url}/emissoesdedebentures'
 
-    def lista_deb_publicas(self,timeout:int=None)->pd.DataFrame:
+    def _query_lista_deb_publicas(self, timeout:int=None)->Query:
         url = f'{self.root_url}/caracteristicas_r.asp?tip_deb=publicas&op_exc='
         timeout = timeout if isinstance(timeout,int) else 10
-        r = requests.get(url,timeout=timeout)
-        soup = BeautifulSoup(r.text, 'html.parser')
-        table = soup.find('table', class_='Tab10333333')
-        # Check if the table exists
-        if table:
-            df = []
-            # Extract table rows
-            rows = table.find_all('tr')
-            # Loop through rows and extract data
-            for row in rows:
-                cells = row.find_all(['td', 'th'])  # handles both header and data cells
-                cell_texts = [cell.get_text(strip=True) for cell in cells]
-                df.append(cell_texts[1:-1])
-            df = pd.DataFrame(df, columns = ['Ativo', 'Emissor', 'Dump', 'Situacao'])
-            df = df.drop(columns=['Dump'])
-        else:
-            df = pd.DataFrame()
-            print("Table with class 'Tab10333333' not found.")
-        return df
+        return Query('lista_deb_publicas', url, _parse_lista_deb_publicas, timeout=timeout,
+                     schema=self._schema('lista_deb_publicas'))
+
+    def lista_deb_publicas(self,timeout:int=None)->pd.DataFrame:
+        return self._run(self._query_lista_deb_publicas(timeout))
     
-    def lista_caracteristicas(self, ativo:str,timeout:int=None)->pd.DataFrame:
-        url = f'{self.root_url}/caracteristicas_e.asp?Ativo={ativo}'
+    def _query_lista_caracteristicas(self, ativo:str,timeout:int=None)->Query:
+        url = _LISTA_CARACTERISTICAS.url(self.root_url, locals())
         timeout = timeout if isinstance(timeout,int) else 10
-        r = requests.get(url,timeout=timeout)
-        df = pd.read_csv(io.StringIO(r.text), sep='|', encoding='utf-8', names=['raw'], skiprows=2)
-        df = df[1:]['raw'].str.split('\t', expand=True).reset_index(drop=True)
-        df = df.T.reset_index(drop=True)
-        df.columns = ['Descricao', 'Valores']
-        return df
+        return Query('lista_caracteristicas', url, _parse_lista_caracteristicas, timeout=timeout)
+
+    def lista_caracteristicas(self, ativo:str,timeout:int=None)->pd.DataFrame:
+        return self._run(self._query_lista_caracteristicas(ativo, timeout))
     
     #def _dt_fim_ini_fix(self, date_):
     #    dt_par = parser.parse(date_)
     #    return f'{dt_par.day:02d}%2F{dt_par.month:02d}%2F{dt_par.year}'
     
-    def pu_historico(self, ativo:str, dt_inicio:str=None, dt_fim:str=None,timeout:int=None)->pd.DataFrame:
-        params = []
-        
+    def _query_pu_historico(self, ativo:str, dt_inicio:str=None, dt_fim:str=None,timeout:int=None)->Query:
         if not dt_inicio:
             dt_inicio= '20010101'
         
         if not dt_fim:
             dt_fim = date.today().strftime('%Y%m%d')
         
-        dt_inicio_fmt = _format_date_for_url(dt_inicio)
-        params.append(f'dt_ini={dt_inicio_fmt}')
-        dt_fim_fmt = _format_date_for_url(dt_fim)
-        params.append(f'dt_fim={dt_fim_fmt}')
-        
-        # Add conditional suffix if any date filters exist
-        add_suffix = '++++' if params else ''
-        
-        query_string = '&' + '&'.join(params) if params else ''
-        url = f'{self.root_url}/puhistorico_e.asp?op_exc=False&ativo={ativo}{add_suffix}{query_string}'
-        
-        return get_response_to_pd(url,timeout=timeout)
+        url = _PU_HISTORICO.url(self.root_url, locals())
+        return Query('pu_historico', url, parse_tabular, timeout=timeout, closed=_is_past_date(dt_fim),
+                     schema=self._schema('pu_historico'))
+
+    def pu_historico(self, ativo:str, dt_inicio:str=None, dt_fim:str=None,timeout:int=None)->pd.DataFrame:
+        return self._run(self._query_pu_historico(ativo, dt_inicio, dt_fim, timeout))
+
+    def iter_pu_historico(self, ativo:str, dt_inicio:str=None, dt_fim:str=None,timeout:int=None,chunksize:int=None):
+        """
+        Streaming version of pu_historico: yields the export as DataFrames of at most
+        chunksize rows (50000 by default).
+        """
+        return self._iter(self._query_pu_historico(ativo, dt_inicio, dt_fim, timeout), chunksize)
+
+    def _ativos_lote(self, ativos:list=None, timeout:int=None)->list:
+        if ativos is None:
+            # Raised whatever errors= says, so a failed list is never taken for an empty universe
+            (df, erro), = run_many([self._query_lista_deb_publicas(timeout)], self.transport)
+            if erro is not None:
+                raise erro
+            ativos = column_values(df, 'Ativo')
+        return [a for a in dict.fromkeys(ativos) if isinstance(a, str) and a]
+
+    def pu_historico_lote(self, ativos:list=None, dt_inicio:str=None, dt_fim:str=None, max_workers:int=None,
+                          timeout:int=None)->tuple:
+        """
+        Fetches pu_historico for many tickers concurrently on a bounded thread pool.
+
+        Args:
+            ativos: List of tickers. When None, every ticker of lista_deb_publicas is used.
+            dt_inicio, dt_fim: Same window as pu_historico, applied to every ticker.
+            max_workers: Number of concurrent requests (8 by default).
+
+        Returns:
+            A long-format DataFrame with an 'Ativo' column followed by the PU columns,
+            and a status DataFrame with one row per ticker ('Ativo', 'Sucesso', 'Linhas', 'Erro').
+
+        Raises:
+            DebenturesError: When ativos is None and lista_deb_publicas fails, even with errors='print'.
+        """
+        ativos = self._ativos_lote(ativos, timeout)
+        queries = [self._query_pu_historico(a, dt_inicio, dt_fim, timeout) for a in ativos]
+        schema = _pop_schema(queries)
+        df, status = _consolida_lote(ativos, run_many(queries, self.transport, max_workers))
+        return self._output((apply_schema(df, schema) if schema is not None else df, status))
     
     def prazo_medio(self, ativo:str = None, emissor:str = None, datacvm:str = None, dt_ini:str=None, dt_fim:str=None, anoini:str=None, anofim:str=None, repactuacao:str = None, exec:str = None,timeout:int=None)->list:
-        ativo = ativo if isinstance(ativo, str) else ''
-        emissor = _format_cnpj(emissor) if emissor else ''
-        datacvm = datacvm if isinstance(datacvm, str) else 'e'
-        dt_ini = _format_date_for_url(dt_ini)
-        dt_fim = _format_date_for_url(dt_fim)
-        repactuacao = repactuacao if isinstance(repactuacao, str) else ''
-        exec = exec if isinstance(exec, str) else 'Nada'
-        if isinstance(anoini, int):
-            anoini = str(anoini)
-        elif not isinstance(anoini, str):
-            anoini = ''
-
-        if isinstance(anofim, int):
-            anofim = str(anofim)
-        elif not isinstance(anofim, str):
-            anofim = ''
-        url = (
-            f'{self.root_url}/prazo-medio_e.asp?'
-            f'Ativo={ativo}&Emissor={emissor}&dataCVM={datacvm}&dt_ini={dt_ini}'
-            f'&dt_fim={dt_fim}&anoini={anoini}&anofim={anofim}&ComRepactuacao={repactuacao}&Op_exc={exec}'
-        )
-        df = get_response_to_pd(url,timeout)
-        df_medio = df[:2]
-        df_medio = df_medio.iloc[:, :3]
-        df_medio.columns = ['', 'Tipo Prazo', 'Prazo Medio']
-        df_medio= df_medio.drop(columns='')
-        df_data = df[2:].reset_index(drop=True)
-        df_data.columns = df_data.iloc[0]
-        df_data = df_data[1:].reset_index(drop=True)[:-2]
-        return df_medio, df_data
+        url = _PRAZO_MEDIO.url(self.root_url, locals())
+        return self._run(Query('prazo_medio', url, parse_tabular, timeout=timeout, post=_post_prazo_medio))
 
     def conversao_permuta(self, ativo:str=None, exec:bool=None, dt_ini:str=None, dt_fim:str=None, classe:str=None,timeout:int=None)->pd.DataFrame:
-        ativo = ativo if isinstance(ativo, str) else ''
-        dt_ini = _format_date_for_url(dt_ini)
-        dt_fim = _format_date_for_url(dt_fim)
-        classe = classe if isinstance(classe, str) else ''
-        exec = exec if isinstance(exec, bool) else False
-        url = (
-            f'{self.root_url}/conversoes-permutas_e.asp?'
-            f'ativo={ativo},%20&op_exc={exec}&dt_ini={dt_ini}&dt_fim={dt_fim}&classe={classe}'
-        )
-        return get_response_to_pd(url,timeout=timeout)
+        url = _CONVERSAO_PERMUTA.url(self.root_url, locals())
+        return self._run(Query('conversao_permuta', url, parse_tabular, timeout=timeout))
     
     def caracteristicas_debs(self, tipo:str=None,exec:bool=None,mnome:str=None,ativo:str=None,
                              ipo:str=None,icvm:str=None,escri_padro:str=None,cvm_ini:str=None,cvm_fim:str=None,
@@ -122,54 +231,22 @@ class EmissoesDebentures:
                              limite:str=None,trat_limite:str=None,tx_spread:str=None,prazo:str=None,premio_novo:str=None,
                              premio_prazo:str=None,premio_antigo:str=None,par:str=None,amortizacao:str=None,mbanco:str=None,
                              magente:str=None,instdep:str=None,coordenador:str=None)->pd.DataFrame:
-        tipo = tipo if isinstance(tipo, str) else 'privadas'
-        exec = exec if isinstance(exec, bool) else False
-        mnome = mnome if isinstance(mnome, str) else ''
-        ativo = ativo if isinstance(ativo, str) else ''
-        ipo = ipo if isinstance(ipo, str) else ''
-        icvm = icvm if isinstance(icvm, str) else ''
-        escri_padro = escri_padro if isinstance(escri_padro, str) else ''
-        cvm_ini = cvm_ini if isinstance(cvm_ini, str) else ''
-        cvm_fim = cvm_fim if isinstance(cvm_fim, str) else ''
-        emis_ini = emis_ini if isinstance(emis_ini, str) else ''
-        emis_fim = emis_fim if isinstance(emis_fim, str) else ''
-        venc_ini = venc_ini if isinstance(venc_ini, str) else ''
-        venc_fim = venc_fim if isinstance(venc_fim, str) else ''
-        tpv = tpv if isinstance(tpv, str) else ''
-        tnv = tnv if isinstance(tnv, str) else ''
-        rent_ini = rent_ini if isinstance(rent_ini, str) else ''
-        rent_fim = rent_fim if isinstance(rent_fim, str) else ''
-        distrib_ini = distrib_ini if isinstance(distrib_ini, str) else ''
-        distrib_fim = distrib_fim if isinstance(distrib_fim, str) else ''
-        indice = indice if isinstance(indice, str) else ''
-        tipo_ = tipo_ if isinstance(tipo_, str) else ''
-        crit_calc = crit_calc if isinstance(crit_calc, str) else ''
-        dia_ref = dia_ref if isinstance(dia_ref, str) else ''
-        mult_rend = mult_rend if isinstance(mult_rend, str) else ''
-        limite = limite if isinstance(limite, str) else ''
-        trat_limite = trat_limite if isinstance(trat_limite, str) else ''
-        tx_spread = tx_spread if isinstance(tx_spread, str) else ''
-        prazo = prazo if isinstance(prazo, str) else ''
-        premio_novo = premio_novo if isinstance(premio_novo, str) else ''
-        premio_prazo = premio_prazo if isinstance(premio_prazo, str) else ''
-        premio_antigo = premio_antigo if isinstance(premio_antigo, str) else ''
-        par = par if isinstance(par, str) else ''
-        amortizacao = amortizacao if isinstance(amortizacao, str) else ''
-        mbanco = mbanco if isinstance(mbanco, str) else ''
-        magente = magente if isinstance(magente, str) else ''
-        instdep = instdep if isinstance(instdep, str) else ''
-        coordenador = coordenador if isinstance(coordenador, str) else ''
-
-        url = (
-            f'{self.root_url}/caracteristicas_e.asp?tip_deb={tipo}&'
-            f'op_exc={exec}&mnome={mnome}&ativo={ativo}&IPO={ipo}&icvm={icvm}&EscrituraPadronizada={escri_padro}&'
-            f'cvm_ini={cvm_ini}&cvm_fim={cvm_fim}&emis_ini={emis_ini}&emis_fim={emis_fim}&venc_ini={venc_ini}&venc_fim={venc_fim}&TPV={tpv}&'
-            f'TNV={tnv}&rent_ini={rent_ini}&rent_fim={rent_fim}&distrib_ini={distrib_ini}&distrib_fim={distrib_fim}&indice={indice}&'
-            f'tipo={tipo_}&crit_calc={crit_calc}&dia_ref={dia_ref}&mult_rend={mult_rend}&limite={limite}&trat_limite={trat_limite}&'
-            f'tx_spread={tx_spread}&prazo={prazo}&premio_novo={premio_novo}&premio_prazo={premio_prazo}&premio_antigo={premio_antigo}&Par={par}&'
-            f'amortizacao={amortizacao}&mbanco={mbanco}&magente={magente}&instdep={instdep}&coordenador={coordenador}'
-        )
-        df = get_response_to_pd(url)
-        df.columns = df.iloc[0]
-        df = df[1:].reset_index(drop=True)[:-2]
-        return df
+        return self._run(self._query_caracteristicas_debs(locals()))
+
+    def _query_caracteristicas_debs(self, args:dict)->Query:
+        url = _CARACTERISTICAS_DEBS.url(self.root_url, args)
+        # The export carries an extra title line above the header and two extra footer lines
+        return Query('caracteristicas_debs', url, parse_tabular, {'header_line': 1, 'footer': 4},
+                     schema=self._schema('caracteristicas_debs'))
+
+    def iter_caracteristicas_debs(self, chunksize:int=None, **filtros):
+        """
+        Streaming version of caracteristicas_debs: yields the export as DataFrames of at most
+        chunksize rows (50000 by default).
+
+        Args:
+            chunksize: Rows per chunk.
+            **filtros: The filters of caracteristicas_debs, by name.
+        """
+        args = inspect.signature(self.caracteristicas_debs).bind(**filtros).arguments
+        return self._iter(self._query_caracteristicas_debs(args), chunksize)
@@ -1,21 +1,18 @@
+import io
 import re
+import csv
+import numpy as np
 import pandas as pd
-import requests
-from dateutil import parser
-from .utils.utils import get_response_to_pd, _format_cnpj, _format_date_for_url,simple_response_to_pd,get_soup_response_to_pd
+from functools import partial
+from .utils.utils import parse_tabular, split_window, _is_past_date
+from .utils.params import Param, ParamSpec
+from .utils.transport import Transport, _resolve_transport
+from .utils.arrow import resolve_output
+from .utils.query import Query, QueryClient, resolve_errors, run_query, decode_body
 from .__consulta_dados import UrlDebentures
 
-def parse_estoque_data(data_string: str, tipo: str) -> pd.DataFrame:
-    """
-    Parses the given string content into a pandas DataFrame,
-    now also extracting the 'Moeda' type.
-
-    Args:
-        data_string: A string containing the stock data with multiple date blocks.
-
-    Returns:
-        A pandas DataFrame with the extracted stock information.
-    """
+def _parse_estoque_data_text(data_string: str, tipo: str) -> pd.DataFrame:
+    # Original line by line parser, kept as the fallback for reports the block parser does not cover
     lines = data_string.strip().split('\n')
     parsed_data = []
     current_date = None
@@ -72,106 +69,289 @@ def parse_estoque_data(data_string: str, tipo: str) -> pd.DataFrame:
                 df[col] = pd.to_numeric(df[col], errors='coerce')
     return df
 
-def get_estoque_to_pd(url:str, tipo: str, timeout:int=None)-> pd.DataFrame:
-    timeout = timeout if isinstance(timeout, int) else 10
+_DATA_MOEDA = re.compile(r'Data do Estoque (\d{2}/\d{2}/\d{4}) - Moeda (R\$|US\$)')
+# A cell that the line parser cleans ('.' removed, ',' -> '.') into a plain float literal
+_NUMERO = r'-?[0-9]+(?:\.[0-9]+)*(?:,[0-9]+)?'
+_TEXTO = r'[^\t\n\s](?:[^\t\n]*[^\t\n\s])?'
+
+def _to_float(value: str):
     try:
-        response = requests.get(url, timeout=timeout)
-        response.encoding = 'ISO-8859-1'  
-        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
-        return parse_estoque_data(response.text, tipo)
-    except requests.exceptions.ConnectionError as e:
-        print(f"Connection Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.Timeout as e:
-        print(f"Timeout Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error for {url}: {e}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"An unexpected error occurred for {url}: {e}")
+        return float(value)
+    except ValueError:
+        return value
+
+def _colunas_estoque(dados: list, headers: list, tipo: str) -> dict:
+    # Cell by cell conversion with the exact rules of the line parser, for rows outside the regular layout
+    partes = pd.Series(dados, dtype=object).str.split('\t', expand=True)
+    colunas = {}
+    for i, header in enumerate(headers):
+        valores = partes[i].str.strip()
+        if header != tipo:
+            valores = valores.str.replace('.', '', regex=False).str.replace(',', '.', regex=False).to_numpy(dtype=object)
+            try:
+                valores = valores.astype(float)
+            except ValueError:
+                valores = np.array([_to_float(v) for v in valores], dtype=object)
+        else:
+            valores = valores.to_numpy(dtype=object)
+        colunas[header] = valores
+    return colunas
+
+def parse_estoque_data(data_string: str, tipo: str) -> pd.DataFrame:
+    """
+    Parses the given string content into a pandas DataFrame,
+    now also extracting the 'Moeda' type.
+
+    The 'Data do Estoque ... - Moeda ...' blocks are located in one pass and the data rows
+    of all blocks are parsed together by pandas' C engine (decimal ',' and thousands '.'),
+    then tagged with their block's date and currency by broadcasting. Reports with
+    irregular rows (empty cells, several different headers) use the original line parser.
+
+    Args:
+        data_string: A string containing the stock data with multiple date blocks.
+
+    Returns:
+        A pandas DataFrame with the extracted stock information.
+    """
+    datas, moedas, dados, bloco = [], [], [], []
+    header_line = None
+    for line in data_string.strip().split('\n'):
+        line = line.strip()
+        if line.startswith('Estoque SND Caracter'):
+            continue
+        match = _DATA_MOEDA.match(line) if line.startswith('Data do Estoque') else None
+        if match:
+            datas.append(match.group(1))
+            moedas.append(match.group(2))
+        elif not datas:
+            continue
+        elif line.startswith(tipo):
+            if header_line is not None and line != header_line:
+                return _parse_estoque_data_text(data_string, tipo)
+            header_line = line
+        elif line and not line.startswith('Total do dia'):
+            if header_line is None:
+                return _parse_estoque_data_text(data_string, tipo)
+            dados.append(line)
+            bloco.append(len(datas) - 1)
+    if not dados:
         return pd.DataFrame()
 
-def _consulta_relatorio(url:str, tipo_relatorio:str, dt_ini:str=None, dt_fim:str=None, moeda:int=None,opcao:int=None,exec:str=None,timeout:int=None)->pd.DataFrame:
-    dt_ini = _format_date_for_url(dt_ini, '%d/%m/%Y') if dt_ini else '02/03/1992'
-    dt_fim = _format_date_for_url(dt_fim,'%d/%m/%Y') if dt_fim else '31/12/2029'
-    if moeda is not None and moeda not in [1, 2]:
-        raise ValueError("Parameter 'moeda' must be 1 or 2.")
-    moeda = moeda if isinstance(moeda, int) else 1
-    exec = exec if isinstance(exec, str) else 'on'
-    opcao = opcao if isinstance(opcao, int) else 100
-    url = (
-        f'{url}/estoquepor_re.asp?op_rel={tipo_relatorio}'
-        f'&Dt_ini={dt_ini}&Dt_fim={dt_fim}&op_exc={exec}&op_subInd=&Opcao={opcao}&Moeda={moeda}'
-    )
-    return get_estoque_to_pd(url, tipo_relatorio, 1000)
-
-class EstoquesCorporativos:
+    headers = [h.strip() for h in header_line.split('\t') if h.strip()]
+    texto = '\n'.join(dados)
+    # Empty cells are dropped by the line parser, shifting the row; leave those reports to it
+    if len(set(headers)) != len(headers) or {'Data do Estoque', 'Moeda'} & set(headers) \
+            or re.search(r'\t[^\S\n]*\t', texto):
+        return _parse_estoque_data_text(data_string, tipo)
+
+    linha = '\t'.join(_TEXTO if h == tipo else _NUMERO for h in headers)
+    if re.fullmatch(f'{linha}(?:\n{linha})*', texto):
+        df = pd.read_csv(
+            io.StringIO(texto), sep='\t', header=None, names=headers, decimal=',', thousands='.',
+            dtype={h: (object if h == tipo else float) for h in headers}, na_filter=False,
+            quoting=csv.QUOTE_NONE, float_precision='round_trip', engine='c',
+        )
+        colunas = {h: df[h].to_numpy() for h in headers}
+    else:
+        # Rows with another number of cells are skipped by the line parser
+        manter = [i for i, d in enumerate(dados) if d.count('\t') == len(headers) - 1]
+        if not manter:
+            return pd.DataFrame()
+        dados, bloco = [dados[i] for i in manter], [bloco[i] for i in manter]
+        colunas = _colunas_estoque(dados, headers, tipo)
+
+    bloco = np.asarray(bloco)
+    df = pd.DataFrame({
+        'Data do Estoque': pd.to_datetime(pd.Series(datas), format='%d/%m/%Y').to_numpy()[bloco],
+        'Moeda': np.asarray(moedas, dtype=object)[bloco],
+        **colunas,
+    })
+    for col in ['Mercado', 'Tesouraria', 'Total']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+class EstoqueChunks:
+    """
+    Splits a streamed estoque report into pieces of whole 'Data do Estoque' blocks holding
+    at least chunksize data rows, for iter_query. Each piece after the first repeats the
+    last header line seen under its first date, so it parses on its own.
+
+    Args:
+        chunksize: Minimum data rows per piece (the last one may hold fewer).
+        tipo: Report type, which opens its header lines.
+    """
+
+    def __init__(self, chunksize:int, tipo:str, **kwargs):
+        self.chunksize = chunksize
+        self.tipo = tipo
+        self._tipo = tipo.encode('utf-8')
+        self._linhas, self._dados = [], 0
+        self._header = None
+        self._datas = False
+
+    def feed(self, line:bytes) -> list:
+        texto, pieces = line.strip(), []
+        if texto.startswith(b'Data do Estoque'):
+            if self._dados >= self.chunksize:
+                pieces.append(b''.join(self._linhas))
+                self._linhas, self._dados = [line], 0
+                if self._header is not None:
+                    self._linhas.append(self._header)
+                return pieces
+            self._datas = True
+        elif self._datas and texto.startswith(self._tipo):
+            self._header = line
+        elif self._datas and texto and not texto.startswith(b'Total do dia'):
+            self._dados += 1
+        self._linhas.append(line)
+        return pieces
+
+    def close(self) -> list:
+        piece, self._linhas = b''.join(self._linhas), []
+        return [piece] if self._dados else []
+
+    def parse(self, piece:bytes, encoding:str=None) -> pd.DataFrame:
+        return parse_estoque_data(decode_body(piece, encoding), self.tipo)
+
+parse_estoque_data.chunks = EstoqueChunks
+
+def get_estoque_to_pd(url:str, tipo: str, timeout:int=None, transport:Transport=None, endpoint:str=None, closed:bool=False)-> pd.DataFrame:
+    timeout = timeout if isinstance(timeout, int) else 10
+    query = Query(endpoint, url, parse_estoque_data, {'tipo': tipo}, timeout=timeout, closed=closed, encoding='ISO-8859-1')
+    return run_query(query, transport)
+
+_MOEDA = Param('moeda', kind='choice', default=1, choices=(1, 2))
+
+_ESTOQUE_POR_ATIVO = ParamSpec('estoqueporativo_e.asp', [
+    'ativo',
+    Param('dt_ini', kind='date', default='02/03/1992', fmt='%d/%m/%Y'),
+    Param('dt_fim', kind='date', default='31/12/2029', fmt='%d/%m/%Y'),
+    _MOEDA,
+    Param('Op_exc', 'exec', default='Nada'),
+])
+
+_ESTOQUE_POR_PERIODO = ParamSpec('estoqueporperiodo_e.asp', [
+    Param('dt_ini', kind='date', default='02/03/1992'),
+    Param('dt_fim', kind='date', default='31/12/2029'),
+    _MOEDA,
+])
+
+_ESTOQUE_A_VENCER = ParamSpec('estoqueavencer_e.asp', [
+    Param('dt_ini', kind='date', default='02/03/1992'),
+    Param('dt_fim', kind='date', default='31/12/2029'),
+    _MOEDA,
+    Param('rVen', 'repactuacao', 'choice', default=1, choices=(1, 2)),
+])
+
+_ESTOQUE_RELATORIO = ParamSpec('estoquepor_re.asp', [
+    Param('op_rel', 'tipo_relatorio'),
+    Param('Dt_ini', 'dt_ini', 'date', default='02/03/1992', fmt='%d/%m/%Y'),
+    Param('Dt_fim', 'dt_fim', 'date', default='31/12/2029', fmt='%d/%m/%Y'),
+    Param('op_exc', 'exec', default='on'),
+    Param('op_subInd', kind='const'),
+    Param('Opcao', 'opcao', 'int', default=100),
+    Param('Moeda', 'moeda', 'choice', default=1, choices=(1, 2)),
+])
+
+def _valida_tipo_relatorio(tipo:str):
+    if tipo not in ['Indexadores', 'Tipo', 'Forma', 'Classe','Garantia','InstrucaoNormativa']:
+        raise ValueError("Parameter 'tipo' must be 'Indexadores', 'Tipo', 'Forma', 'Classe', 'Garantia' or 'InstrucaoNormativa'")
+
+def _query_relatorio(url:str, tipo_relatorio:str, dt_ini:str=None, dt_fim:str=None, moeda:int=None,opcao:int=None,exec:str=None,timeout:int=None)->Query:
+    closed = _is_past_date(dt_fim)
+    url = _ESTOQUE_RELATORIO.url(url, locals())
+    timeout = timeout if isinstance(timeout, int) else 1000
+    return Query('estoque_relatorio', url, parse_estoque_data, {'tipo': tipo_relatorio}, timeout=timeout,
+                 closed=closed, encoding='ISO-8859-1')
+
+def _consulta_relatorio(url:str, tipo_relatorio:str, dt_ini:str=None, dt_fim:str=None, moeda:int=None,opcao:int=None,exec:str=None,timeout:int=None,transport:Transport=None)->pd.DataFrame:
+    return run_query(_query_relatorio(url, tipo_relatorio, dt_ini, dt_fim, moeda, opcao, exec, timeout), transport)
+
+def _post_estoque_por_ativo(df:pd.DataFrame, simb_moeda:str) -> pd.DataFrame:
+    #df = df.iloc[2:]
+    df.columns = ['Data', 'Qtd Mercado', f'Volume Mercado ({simb_moeda} Mil)','Qtd Tesouraria', 
+                  f'Volume Tesouraria ({simb_moeda} Mil)','Qtd Total', 
+                  f'Volume Total ({simb_moeda} Mil)', 'Dump']
+    df = df.drop(columns=['Dump'])
+    return df
+
+def _post_drop_last_column(df:pd.DataFrame) -> pd.DataFrame:
+    return df.iloc[:,:-1]
+
+class EstoquesCorporativos(QueryClient):
     """
         Consult the open data page on debentures.com, 
         specifically the tab 'estoque' (https://www.debentures.com.br/exploreosnd/consultaadados/estoque/) 
         to extract the information via Python.
+
+        estoque_por_periodo and estoque_relatorio accept:
+        chunk: Splits the date range into 'month', 'quarter' or 'year' windows fetched concurrently.
+        max_workers: Number of windows fetched at the same time when chunking.
+        estoque_a_vencer cannot be chunked: it is totalled per maturity year over the whole range,
+        so windows would each answer a partial total of the same years.
+
+        raw=True keeps the text columns of the exports instead of typed ones.
+        output='arrow' or 'polars' returns pyarrow.Table or polars.DataFrame results instead of pandas ones.
+
+        iter_estoque_relatorio streams the report and yields it in DataFrame chunks.
     """
 
-    def __init__(self)->str:
+    def __init__(self, transport:Transport=None, raw:bool=False, output:str=None, errors:str=None)->str:
+        self.transport = _resolve_transport(transport)
+        self.raw = raw
+        self.output = resolve_output(output)
+        self.errors = resolve_errors(errors)
         root_url = UrlDebentures().root_url
         self.root_url = f'{root_url}/estoque'
 
+    def _query_estoque_por_ativo(self, ativo:str=None, dt_ini:str=None, dt_fim:str=None, exec:str=None,moeda:int=None,timeout:int=None)->Query:
+        url = _ESTOQUE_POR_ATIVO.url(self.root_url, locals())
+        closed = _is_past_date(dt_fim)
+        simb_moeda = 'USD' if moeda == 2 else 'R$'
+        return Query('estoque_por_ativo', url, parse_tabular, {'skiprows': 4}, timeout=timeout,
+                     closed=closed, post=partial(_post_estoque_por_ativo, simb_moeda=simb_moeda),
+                     schema=self._schema('estoque_por_ativo'))
+
     def estoque_por_ativo(self, ativo:str=None, dt_ini:str=None, dt_fim:str=None, exec:str=None,moeda:int=None,timeout:int=None)->pd.DataFrame:
-        ativo = ativo if isinstance(ativo, str) else ''
-        exec = exec if isinstance(exec, str) else 'Nada'
-        if moeda is not None and moeda not in [1, 2]:
-            raise ValueError("Parameter 'moeda' must be 1 or 2.")
-        moeda = moeda if isinstance(moeda, int) else 1
-        dt_ini = _format_date_for_url(dt_ini, '%d/%m/%Y') if dt_ini else '02/03/1992'
-        dt_fim = _format_date_for_url(dt_fim, '%d/%m/%Y') if dt_fim else '31/12/2029'
-        url = (
-            f'{self.root_url}/estoqueporativo_e.asp?'
-            f'ativo={ativo}&dt_ini={dt_ini}&dt_fim={dt_fim}&moeda={moeda}&Op_exc={exec}'
-        )
-        if moeda == 1:
-            simb_moeda= 'R$'
-        else:
-            simb_moeda= 'USD'
-        df = get_response_to_pd(url,skiprows=4,timeout=timeout)
-        #df = df.iloc[2:]
-        df.columns = ['Data', 'Qtd Mercado', f'Volume Mercado ({simb_moeda} Mil)','Qtd Tesouraria', 
-                      f'Volume Tesouraria ({simb_moeda} Mil)','Qtd Total', 
-                      f'Volume Total ({simb_moeda} Mil)', 'Dump']
-        df = df.drop(columns=['Dump'])
-        return df
+        return self._run(self._query_estoque_por_ativo(ativo, dt_ini, dt_fim, exec, moeda, timeout))
     
-    def estoque_por_periodo(self, dt_ini:str=None, dt_fim:str=None, moeda:int=None,timeout:int=None)->pd.DataFrame:
-        if moeda is not None and moeda not in [1, 2]:
-            raise ValueError("Parameter 'moeda' must be 1 or 2.")
-        moeda = moeda if isinstance(moeda, int) else 1
-        dt_ini = _format_date_for_url(dt_ini) if dt_ini else '02/03/1992'
-        dt_fim = _format_date_for_url(dt_fim) if dt_fim else '31/12/2029'
-        url = (
-            f'{self.root_url}/estoqueporperiodo_e.asp?'
-            f'dt_ini={dt_ini}&dt_fim={dt_fim}&moeda={moeda}'
-        )
-        df = get_response_to_pd(url,timeout=timeout)
-        return df.iloc[:,:-1]
+    def _query_estoque_por_periodo(self, dt_ini:str=None, dt_fim:str=None, moeda:int=None,timeout:int=None)->Query:
+        url = _ESTOQUE_POR_PERIODO.url(self.root_url, locals())
+        closed = _is_past_date(dt_fim)
+        return Query('estoque_por_periodo', url, parse_tabular, timeout=timeout, closed=closed,
+                     post=_post_drop_last_column)
+
+    def estoque_por_periodo(self, dt_ini:str=None, dt_fim:str=None, moeda:int=None,timeout:int=None,
+                            chunk:str=None,max_workers:int=None)->pd.DataFrame:
+        if chunk:
+            janelas = split_window(dt_ini or '19920302', dt_fim or '20291231', chunk)
+            return self._run_windows([self._query_estoque_por_periodo(a, b, moeda, timeout) for a, b in janelas], max_workers)
+        return self._run(self._query_estoque_por_periodo(dt_ini, dt_fim, moeda, timeout))
     
+    def _query_estoque_a_vencer(self, dt_ini:str=None, dt_fim:str=None, moeda:int=None,repactuacao:int=None,timeout:int=None)->Query:
+        url = _ESTOQUE_A_VENCER.url(self.root_url, locals())
+        closed = _is_past_date(dt_fim)
+        return Query('estoque_a_vencer', url, parse_tabular, {'skiprows': 4}, timeout=timeout,
+                     closed=closed, post=_post_drop_last_column)
+
     def estoque_a_vencer(self, dt_ini:str=None, dt_fim:str=None, moeda:int=None,repactuacao:int=None,timeout:int=None)->pd.DataFrame:
-        dt_ini = _format_date_for_url(dt_ini) if dt_ini else '02/03/1992'
-        dt_fim = _format_date_for_url(dt_fim) if dt_fim else '31/12/2029'
-        if moeda is not None and moeda not in [1, 2]:
-            raise ValueError("Parameter 'moeda' must be 1 or 2.")
-        moeda = moeda if isinstance(moeda, int) else 1
-        if repactuacao is not None and repactuacao not in [1, 2]:
-            raise ValueError("Parameter 'moeda' must be 1 or 2.")
-        repactuacao = repactuacao if isinstance(repactuacao, int) else 1
-        url = (
-            f'{self.root_url}/estoqueavencer_e.asp?'
-            f'dt_ini={dt_ini}&dt_fim={dt_fim}&moeda={moeda}&rVen={repactuacao}'
-        )
-        df = get_response_to_pd(url,skiprows=4,timeout=timeout)
-        return df.iloc[:,:-1]
+        return self._run(self._query_estoque_a_vencer(dt_ini, dt_fim, moeda, repactuacao, timeout))
     
-    def estoque_relatorio(self, tipo:str, dt_ini:str=None, dt_fim:str=None, moeda:int=None,opcao:int=None,exec:str=None,timeout:int=None)->pd.DataFrame:
-        if tipo not in ['Indexadores', 'Tipo', 'Forma', 'Classe','Garantia','InstrucaoNormativa']:
-            raise ValueError("Parameter 'tipo' must be 'Indexadores', 'Tipo', 'Forma', 'Classe', 'Garantia' or 'InstrucaoNormativa'")
-        return _consulta_relatorio(self.root_url, tipo, dt_ini, dt_fim, moeda,opcao,exec,timeout)
+    def estoque_relatorio(self, tipo:str, dt_ini:str=None, dt_fim:str=None, moeda:int=None,opcao:int=None,exec:str=None,timeout:int=None,
+                          chunk:str=None,max_workers:int=None)->pd.DataFrame:
+        _valida_tipo_relatorio(tipo)
+        if chunk:
+            janelas = split_window(dt_ini or '19920302', dt_fim or '20291231', chunk)
+            return self._run_windows([_query_relatorio(self.root_url, tipo, a, b, moeda,opcao,exec,timeout) for a, b in janelas], max_workers)
+        return self._run(_query_relatorio(self.root_url, tipo, dt_ini, dt_fim, moeda,opcao,exec,timeout))
+
+    def iter_estoque_relatorio(self, tipo:str, dt_ini:str=None, dt_fim:str=None, moeda:int=None,opcao:int=None,exec:str=None,timeout:int=None,
+                               chunksize:int=None):
+        """
+        Streaming version of estoque_relatorio: yields the report as DataFrames of whole
+        dates holding at least chunksize rows (50000 by default).
+        """
+        _valida_tipo_relatorio(tipo)
+        return self._iter(_query_relatorio(self.root_url, tipo, dt_ini, dt_fim, moeda,opcao,exec,timeout), chunksize)
 
@@ -1,37 +1,84 @@
-from .utils.utils import get_response_to_pd, _format_cnpj, _format_date_for_url
+from .utils.utils import parse_tabular, split_window, _is_past_date
+from .utils.params import Param, ParamSpec
+from .utils.transport import Transport, _resolve_transport
+from .utils.arrow import resolve_output
+from .utils.query import Query, QueryClient, resolve_errors
 from .__consulta_dados import UrlDebentures
 
-class EventosFinanceiros:
-    def __init__(self)->str:
+_AGENDA_EVENTOS = ParamSpec('agenda_e.asp', [
+    Param('emissor', kind='cnpj'),
+    'ativo',
+    'evento',
+    Param('dt_ini', kind='date'),
+    Param('dt_fim', kind='date'),
+    Param('dt_pgto_ini', kind='date'),
+    Param('dt_pgto_fim', kind='date'),
+])
+
+_PU_EVENTOS = ParamSpec('pudeeventos_e.asp', [
+    Param('op_exc', 'exec', default='Nada'),
+    'ativo',
+    'evento',
+    Param('dt_ini', kind='date'),
+    Param('dt_fim', kind='date'),
+    Param('emissor', kind='cnpj'),
+])
+
+class EventosFinanceiros(QueryClient):
+    """
+        agenda_eventos and pu_eventos accept:
+        chunk: Splits the date range into 'month', 'quarter' or 'year' windows fetched concurrently.
+        max_workers: Number of windows fetched at the same time when chunking.
+        Chunked queries need both 'dt_ini' and 'dt_fim'.
+
+        raw=True keeps the text columns of the exports instead of typed ones.
+        output='arrow' or 'polars' returns pyarrow.Table or polars.DataFrame results instead of pandas ones.
+
+        iter_agenda_eventos streams the export and yields it in DataFrame chunks.
+    """
+
+    def __init__(self, transport:Transport=None, raw:bool=False, output:str=None, errors:str=None)->str:
+        self.transport = _resolve_transport(transport)
+        self.raw = raw
+        self.output = resolve_output(output)
+        self.errors = resolve_errors(errors)
         root_url = UrlDebentures().root_url
         self.root_url = f'{root_url}/eventosfinanceiros'
 
-    def agenda_eventos(self, ativo:str = None, emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None, dt_pgto_ini:str=None, dt_pgto_fim:str=None,timeout:int=None)->list:
-        ativo = ativo if isinstance(ativo, str) else ''
-        emissor = _format_cnpj(emissor) if emissor else ''
-        evento = evento if isinstance(evento, str) else ''
-        dt_ini = _format_date_for_url(dt_ini)
-        dt_fim = _format_date_for_url(dt_fim)
-        dt_pgto_ini = _format_date_for_url(dt_pgto_ini)
-        dt_pgto_fim = _format_date_for_url(dt_pgto_fim)
-        url = (
-            f'{self.root_url}/agenda_e.asp?'
-            f'emissor={emissor}&ativo={ativo}&evento={evento}&dt_ini={dt_ini}&dt_fim={dt_fim}'
-            f'&dt_pgto_ini={dt_pgto_ini}&dt_pgto_fim={dt_pgto_fim}'
-        )
-        df = get_response_to_pd(url,timeout=timeout)
-        return df
+    def _query_agenda_eventos(self, ativo:str = None, emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None, dt_pgto_ini:str=None, dt_pgto_fim:str=None,timeout:int=None)->Query:
+        url = _AGENDA_EVENTOS.url(self.root_url, locals())
+        closed = _is_past_date(dt_fim) and (not dt_pgto_fim or _is_past_date(dt_pgto_fim))
+        return Query('agenda_eventos', url, parse_tabular, timeout=timeout, closed=closed,
+                     schema=self._schema('agenda_eventos'))
+
+    def agenda_eventos(self, ativo:str = None, emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None, dt_pgto_ini:str=None, dt_pgto_fim:str=None,timeout:int=None,
+                       chunk:str=None,max_workers:int=None)->list:
+        if chunk:
+            return self._run_windows([
+                self._query_agenda_eventos(ativo, emissor, evento, a, b, dt_pgto_ini, dt_pgto_fim, timeout)
+                for a, b in split_window(dt_ini, dt_fim, chunk)
+            ], max_workers)
+        return self._run(self._query_agenda_eventos(ativo, emissor, evento, dt_ini, dt_fim, dt_pgto_ini, dt_pgto_fim, timeout))
+
+    def iter_agenda_eventos(self, ativo:str = None, emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None, dt_pgto_ini:str=None, dt_pgto_fim:str=None,timeout:int=None,
+                            chunksize:int=None):
+        """
+        Streaming version of agenda_eventos: yields the export as DataFrames of at most
+        chunksize rows (50000 by default).
+        """
+        return self._iter(self._query_agenda_eventos(ativo, emissor, evento, dt_ini, dt_fim, dt_pgto_ini, dt_pgto_fim, timeout), chunksize)
     
-    def pu_eventos(self, ativo:str = None, exec:str = None,emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None,timeout:int=None)->list:
-        ativo = ativo if isinstance(ativo, str) else ''
-        emissor = _format_cnpj(emissor) if emissor else ''
-        exec = exec if isinstance(exec, str) else 'Nada'
-        evento = evento if isinstance(evento, str) else ''
-        dt_ini = _format_date_for_url(dt_ini)
-        dt_fim = _format_date_for_url(dt_fim)
-        url = (
-            f'{self.root_url}/pudeeventos_e.asp?'
-            f'op_exc={exec}&ativo={ativo}&evento={evento}&dt_ini={dt_ini}&dt_fim={dt_fim}&emissor={emissor}'
-        )
-        df = get_response_to_pd(url,timeout=timeout)
-        return df
\ No newline at end of file
+    def _query_pu_eventos(self, ativo:str = None, exec:str = None,emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None,timeout:int=None)->Query:
+        url = _PU_EVENTOS.url(self.root_url, locals())
+        closed = _is_past_date(dt_fim)
+        return Query('pu_eventos', url, parse_tabular, timeout=timeout, closed=closed,
+                     schema=self._schema('pu_eventos'))
+
+    def pu_eventos(self, ativo:str = None, exec:str = None,emissor:str = None, evento:str = None, dt_ini:str=None, dt_fim:str=None,timeout:int=None,
+                   chunk:str=None,max_workers:int=None)->list:
+        if chunk:
+            return self._run_windows([
+                self._query_pu_eventos(ativo, exec, emissor, evento, a, b, timeout)
+                for a, b in split_window(dt_ini, dt_fim, chunk)
+            ], max_workers)
+        return self._run(self._query_pu_eventos(ativo, exec, emissor, evento, dt_ini, dt_fim, timeout))
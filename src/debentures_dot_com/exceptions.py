@@ -0,0 +1,76 @@
+"""
+Exceptions raised by the endpoint methods (with errors='raise', by the iter_* methods and
+in the Erro column of the lote results).
+
+Every exception carries the endpoint and URL of the failed request. The network ones also
+derive from the matching requests exception, so code catching requests.exceptions.HTTPError
+or ConnectionError keeps working.
+"""
+import requests
+
+
+class DebenturesError(Exception):
+    """
+    Base of the errors of a request to debentures.com.br or ANBIMA.
+
+    Args:
+        message: Description of the failure.
+        endpoint: Name of the endpoint method.
+        url: URL of the request.
+    """
+
+    def __init__(self, message:str, endpoint:str=None, url:str=None, **kwargs):
+        super().__init__(message, **kwargs)
+        self.endpoint = endpoint
+        self.url = url
+
+
+class RequestFailed(DebenturesError, requests.exceptions.RequestException):
+    """
+    The request did not get an answer: connection refused or reset, DNS failure, timeout.
+    """
+
+
+class ConnectionFailed(RequestFailed, requests.exceptions.ConnectionError):
+    pass
+
+
+class RequestTimeout(RequestFailed, requests.exceptions.Timeout):
+    pass
+
+
+class HTTPStatusError(DebenturesError, requests.exceptions.HTTPError):
+    """
+    The server answered with an error status (4xx or 5xx), kept in `status`.
+    """
+
+    def __init__(self, message:str, endpoint:str=None, url:str=None, status:int=None, **kwargs):
+        super().__init__(message, endpoint, url, **kwargs)
+        self.status = status
+
+
+class ParseError(DebenturesError, ValueError):
+    """
+    The answer arrived but could not be turned into a DataFrame (unexpected layout or encoding).
+    """
+
+
+def wrap_error(error:Exception, endpoint:str=None, url:str=None) -> DebenturesError:
+    """
+    The DebenturesError for a requests exception raised while fetching a request, or None
+    for other exceptions. DebenturesErrors are returned as they are.
+    """
+    if isinstance(error, DebenturesError):
+        return error
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+        return HTTPStatusError(str(error), endpoint, url, status=status, response=response)
+    # ConnectTimeout is both a ConnectionError and a Timeout; report it as a timeout
+    if isinstance(error, requests.exceptions.Timeout):
+        return RequestTimeout(str(error), endpoint, url)
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return ConnectionFailed(str(error), endpoint, url)
+    if isinstance(error, requests.exceptions.RequestException):
+        return RequestFailed(str(error), endpoint, url)
+    return None
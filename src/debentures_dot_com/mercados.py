@@ -1,12 +1,54 @@
-import requests
 import io
-from dateutil import parser
+import os
 import pandas as pd
-from .utils.utils import get_response_to_pd, _format_cnpj, _format_date_for_url,simple_response_to_pd,get_soup_response_to_pd
+from datetime import date
+from .utils.utils import parse_tabular, parse_simple, parse_anbima_precos, parse_soup_table, split_window, _format_date_for_url, _is_past_date, _parse_date
+from .utils.params import Param, ParamSpec
+from .utils.transport import Transport, _resolve_transport
+from .utils.arrow import resolve_output
+from .utils.query import Query, QueryClient, resolve_errors, run_many, bytes_parser, decode_body
+from .utils.schemas import apply_schema
+from .utils.calendario import dias_uteis
+from .exceptions import ParseError
 from .__consulta_dados import UrlDebentures
 
-class MercadoSecundario:
-    def __init__(self)->str:
+# ANBIMA publishes the daily files in Latin-1
+_ANBIMA_ENCODING = 'ISO-8859-1'
+
+def _nome_arquivo_precos(dia:date) -> str:
+    return f'db{dia:%y%m%d}.txt'
+
+@bytes_parser
+def _parse_arquivo_precos(content:bytes, encoding:str=None) -> tuple:
+    # The raw bytes travel with the frame, so the caller that owns the archive can keep the file
+    return parse_anbima_precos(decode_body(content, encoding)), content
+
+def _arquiva_precos(destino:str, content:bytes):
+    temporario = f'{destino}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(content)
+    os.replace(temporario, destino)
+
+_PRECO_NEGOCIACAO = ParamSpec('precosdenegociacao_e.asp', [
+    Param('op_exc', 'exec', default='Nada'),
+    Param('emissor', kind='cnpj'),
+    'ativo',
+    Param('dt_ini', kind='date', default='19900302', fmt='%Y%m%d'),
+    Param('dt_fim', kind='date', default='20291231', fmt='%Y%m%d'),
+])
+
+# Form fields of the volumes page, sent as the body of a GET request (not the query string), as the original code did
+_VOLUME_NEGOCIACAO = ParamSpec('volumesnegociados_r.asp', [
+    Param('dt_ini', kind='date', default='02/03/1992', fmt='%d/%m/%Y'),
+    Param('dt_fim', kind='date', default='31/12/2029', fmt='%d/%m/%Y'),
+])
+
+class MercadoSecundario(QueryClient):
+    def __init__(self, transport:Transport=None, raw:bool=False, output:str=None, errors:str=None)->str:
+        self.transport = _resolve_transport(transport)
+        self.raw = raw
+        self.output = resolve_output(output)
+        self.errors = resolve_errors(errors)
         root_url = UrlDebentures().root_url
         self.root_url = f'https://www.anbima.com.br/informacoes/merc-sec-debentures/'
         self.root_url_ = f'{root_url}/mercadosecundario'
@@ -14,7 +56,83 @@ class MercadoSecundario:
     def arquivo_precos_diario(self, data:str)->pd.DataFrame:
         data_ = _format_date_for_url(data, '%y%m%d')
         url = f'{self.root_url}/arqs/db{data_}.txt'
-        return simple_response_to_pd(url, '@')
+        if self.raw:
+            return self._run(Query('arquivo_precos_diario', url, parse_simple, {'sep': '@'}, closed=_is_past_date(data)))
+        return self._run(Query('arquivo_precos_diario', url, parse_anbima_precos, closed=_is_past_date(data),
+                               schema='arquivo_precos_diario'))
+
+    def _query_arquivo_precos(self, dia:date, timeout:int=None)->Query:
+        nome = _nome_arquivo_precos(dia)
+        return Query('arquivo_precos_diario', f'{self.root_url}/arqs/{nome}', _parse_arquivo_precos,
+                     timeout=timeout, closed=dia < date.today(), encoding=_ANBIMA_ENCODING)
+
+    def _plano_precos_periodo(self, dt_ini:str, dt_fim:str=None, arquivo:str=None, timeout:int=None)->tuple:
+        inicio = _parse_date(dt_ini)
+        fim = _parse_date(dt_fim) if dt_fim else date.today()
+        if inicio is None or fim is None:
+            raise ValueError("Parameters 'dt_ini' and 'dt_fim' must be valid dates.")
+        dias = dias_uteis(inicio, min(fim, date.today()))
+        if arquivo:
+            os.makedirs(arquivo, exist_ok=True)
+        lidos, pendentes = {}, []
+        for dia in dias:
+            caminho = os.path.join(arquivo, _nome_arquivo_precos(dia)) if arquivo else None
+            if caminho and os.path.exists(caminho):
+                with open(caminho, 'rb') as f:
+                    lidos[dia] = parse_anbima_precos(decode_body(f.read(), _ANBIMA_ENCODING))
+            else:
+                pendentes.append(dia)
+        return dias, lidos, pendentes, [self._query_arquivo_precos(d, timeout) for d in pendentes]
+
+    def _consolida_precos_periodo(self, dias:list, lidos:dict, pendentes:list, results:list, arquivo:str=None)->tuple:
+        baixados = dict(zip(pendentes, results))
+        frames, status = [], []
+        for dia in dias:
+            if dia in lidos:
+                df, erro, origem = lidos[dia], None, 'arquivo'
+            else:
+                (resultado, erro), origem = baixados[dia], 'download'
+            if erro is None and origem == 'download':
+                df, content = resultado
+                # A page served with 200 that is not a price file (e.g. an HTML error page) fails the day
+                if df.shape[1] <= 1:
+                    erro = ParseError(f'{_nome_arquivo_precos(dia)} is not a price table.', 'arquivo_precos_diario')
+                elif arquivo:
+                    _arquiva_precos(os.path.join(arquivo, _nome_arquivo_precos(dia)), content)
+            if erro is not None:
+                status.append((dia, False, origem, 0, f'{type(erro).__name__}: {erro}'))
+                continue
+            df = df.copy()
+            df.insert(0, 'Data', dia.strftime('%d/%m/%Y'))
+            frames.append(df)
+            status.append((dia, True, origem, len(df), None))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Data'])
+        if not self.raw:
+            df = apply_schema(df, 'arquivo_precos_diario')
+        return self._output((df, pd.DataFrame(status, columns=['Data', 'Sucesso', 'Origem', 'Linhas', 'Erro'])))
+
+    def arquivo_precos_periodo(self, dt_ini:str, dt_fim:str=None, arquivo:str=None, max_workers:int=None,
+                               timeout:int=None)->tuple:
+        """
+        Backfills the ANBIMA daily price files of a date range into one frame.
+
+        Only Brazilian business days are requested (offline calendar of national holidays),
+        files already held in the local archive are read from disk, and the others are
+        downloaded concurrently and added to the archive.
+
+        Args:
+            dt_ini, dt_fim: Date range; dt_fim defaults to today.
+            arquivo: Directory of the local archive of raw db{yymmdd}.txt files. None keeps no archive.
+            max_workers: Number of concurrent downloads (8 by default).
+
+        Returns:
+            A DataFrame with a 'Data' column followed by the file's columns, and a status
+            DataFrame with one row per business day ('Data', 'Sucesso', 'Origem', 'Linhas', 'Erro'),
+            where 'Origem' is 'arquivo' or 'download'. A download that is not a price file
+            (e.g. an error page served with status 200) is a failed day, left out of both.
+        """
+        dias, lidos, pendentes, queries = self._plano_precos_periodo(dt_ini, dt_fim, arquivo, timeout)
+        return self._consolida_precos_periodo(dias, lidos, pendentes, run_many(queries, self.transport, max_workers), arquivo)
 
     #def vencidos_antecipadamente_diario(self, data:str)->pd.DataFrame:
     #    data_ = _format_date_for_url(data, '%d%b%Y')
@@ -34,31 +152,44 @@ class MercadoSecundario:
     #    df = get_response_to_pd(url)
     #    return df
     
-    def preco_negociacao(self, ativo:str = None, exec:str = None,emissor:str = None, dt_ini:str=None, dt_fim:str=None)->list:
-        ativo = ativo if isinstance(ativo, str) else ''
-        emissor = _format_cnpj(emissor) if emissor else ''
-        exec = exec if isinstance(exec, str) else 'Nada'
-        dt_ini = _format_date_for_url(dt_ini, '%Y%m%d') if dt_ini else '19900302'
-        dt_fim = _format_date_for_url(dt_fim, '%Y%m%d') if dt_fim else '20291231'
-        url = (
-            f'{self.root_url_}/precosdenegociacao_e.asp?'
-            f'op_exc={exec}&emissor={emissor}&ativo={ativo}&dt_ini={dt_ini}&dt_fim={dt_fim}'
-        )
-        df = get_response_to_pd(url)
-        return df
+    def _query_preco_negociacao(self, ativo:str = None, exec:str = None,emissor:str = None, dt_ini:str=None, dt_fim:str=None,
+                                timeout:int=None)->Query:
+        url = _PRECO_NEGOCIACAO.url(self.root_url_, locals())
+        closed = _is_past_date(dt_fim)
+        return Query('preco_negociacao', url, parse_tabular, timeout=timeout, closed=closed,
+                     schema=self._schema('preco_negociacao'))
 
-    def volume_negociacao(self, dt_ini:str=None, dt_fim:str=None)->list:
-        dt_ini = _format_date_for_url(dt_ini, '%d/%m/%Y') if dt_ini else '02/03/1992'
-        dt_fim = _format_date_for_url(dt_fim, '%d/%m/%Y') if dt_fim else '31/12/2029'
+    def preco_negociacao(self, ativo:str = None, exec:str = None,emissor:str = None, dt_ini:str=None, dt_fim:str=None,
+                         chunk:str=None,max_workers:int=None,timeout:int=None)->list:
+        """
+        Args:
+            chunk: Splits the date range into 'month', 'quarter' or 'year' windows fetched concurrently.
+            max_workers: Number of windows fetched at the same time when chunking.
+        """
+        if chunk:
+            janelas = split_window(dt_ini or '19900302', dt_fim or '20291231', chunk)
+            return self._run_windows([self._query_preco_negociacao(ativo, exec, emissor, a, b, timeout) for a, b in janelas],
+                                     max_workers)
+        return self._run(self._query_preco_negociacao(ativo, exec, emissor, dt_ini, dt_fim, timeout))
 
-        url = f'{self.root_url_}/volumesnegociados_r.asp'
+    def iter_preco_negociacao(self, ativo:str = None, exec:str = None,emissor:str = None, dt_ini:str=None, dt_fim:str=None,
+                              chunksize:int=None):
+        """
+        Streaming version of preco_negociacao: yields the export as DataFrames of at most
+        chunksize rows (50000 by default).
+        """
+        return self._iter(self._query_preco_negociacao(ativo, exec, emissor, dt_ini, dt_fim), chunksize)
+
+    def volume_negociacao(self, dt_ini:str=None, dt_fim:str=None)->list:
+        closed = _is_past_date(dt_fim)
+        url = f'{self.root_url_}/{_VOLUME_NEGOCIACAO.path}'
+        data = _VOLUME_NEGOCIACAO.values(locals())
 
         headers = {
             "Host": "www.debentures.com.br",
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:140.0) Gecko/20100101 Firefox/140.0",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate, br, zstd",
             "Content-Type": "application/x-www-form-urlencoded",
             "Origin": "https://www.debentures.com.br",
             "Connection": "keep-alive",
@@ -72,10 +203,6 @@ class MercadoSecundario:
             "Priority": "u=0, i",
         }
 
-        data = {
-            "dt_ini": f"{dt_ini}",
-            "dt_fim": f"{dt_fim}", 
-        }
-
-        df = get_soup_response_to_pd(url, header_class='Ver10666666_cab', table_class='Tab10333333', headers=headers, data=data)
-        return df
+        return self._run(Query('volume_negociacao', url, parse_soup_table,
+                               {'header_class': 'Ver10666666_cab', 'table_class': 'Tab10333333'},
+                               headers=headers, data=data, closed=closed))
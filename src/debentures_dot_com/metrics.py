@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+from .utils.events import RequestEvent, add_hook, remove_hook
+
+# Timings summarised per endpoint, with their column prefix in the summary
+_TEMPOS = (('total_s', 'Total'), ('connect_s', 'Conexão'), ('download_s', 'Download'), ('parse_s', 'Parse'))
+_PERCENTIS = (50, 90, 99)
+
+
+class _Endpoint:
+    __slots__ = ('requisicoes', 'erros', 'cache', 'coalescidas', 'bytes', 'linhas', 'retries', 'status', 'amostras')
+
+    def __init__(self, max_samples:int):
+        self.requisicoes = 0
+        self.erros = 0
+        self.cache = 0
+        self.coalescidas = 0
+        self.bytes = 0
+        self.linhas = 0
+        self.retries = 0
+        self.status = {}
+        self.amostras = deque(maxlen=max_samples)
+
+
+class MetricsCollector:
+    """
+    Aggregates the RequestEvents of every request into per-endpoint metrics: counts, errors,
+    cache hits, coalesced requests, bytes, rows, retries and the p50/p90/p99/max of each timing.
+
+    The collector is a hook itself (see add_hook); install() registers it for the whole process
+    and the collector can also be used as a context manager. Counts are kept for every event,
+    while the percentiles come from the last max_samples requests of each endpoint.
+
+    Args:
+        max_samples: Timings kept per endpoint for the percentiles.
+        exporters: Exporters called by export() with the metrics (see JsonExporter, PrometheusExporter).
+    """
+
+    def __init__(self, max_samples:int=None, exporters:list=None):
+        self.max_samples = max_samples if isinstance(max_samples, int) else 10000
+        self.exporters = list(exporters) if exporters else []
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+
+    def __call__(self, event:RequestEvent):
+        with self._lock:
+            e = self._endpoints.get(event.endpoint)
+            if e is None:
+                e = self._endpoints[event.endpoint] = _Endpoint(self.max_samples)
+            e.requisicoes += 1
+            e.erros += not event.ok
+            e.cache += event.cache == 'hit'
+            e.coalescidas += event.coalesced
+            e.bytes += event.bytes or 0
+            e.linhas += event.rows or 0
+            e.retries += event.retries or 0
+            if event.status is not None:
+                e.status[event.status] = e.status.get(event.status, 0) + 1
+            e.amostras.append(tuple(getattr(event, campo) for campo, _ in _TEMPOS))
+
+    def install(self) -> 'MetricsCollector':
+        add_hook(self)
+        return self
+
+    def uninstall(self):
+        remove_hook(self)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.inicio = time.time()
+
+    def metrics(self) -> dict:
+        """
+        The metrics as plain data: {endpoint: {'requisicoes', 'erros', 'cache_hits', 'coalescidas', 'bytes',
+        'linhas', 'retries', 'status', 'total_s': {'p50', 'p90', 'p99', 'max', 'soma'}, 'connect_s': ..., ...}}.
+        """
+        with self._lock:
+            copia = {nome: (e.requisicoes, e.erros, e.cache, e.coalescidas, e.bytes, e.linhas, e.retries,
+                            dict(e.status), np.array(e.amostras, dtype=float).reshape(-1, len(_TEMPOS)))
+                     for nome, e in self._endpoints.items()}
+        resultado = {}
+        for nome, valores in sorted(copia.items()):
+            requisicoes, erros, cache, coalescidas, nbytes, linhas, retries, status, amostras = valores
+            m = {'requisicoes': requisicoes, 'erros': erros, 'cache_hits': cache, 'coalescidas': coalescidas,
+                 'bytes': nbytes, 'linhas': linhas, 'retries': retries, 'status': status}
+            for i, (campo, _) in enumerate(_TEMPOS):
+                coluna = amostras[:, i]
+                if len(coluna):
+                    p = np.percentile(coluna, _PERCENTIS)
+                    m[campo] = {**{f'p{q}': float(v) for q, v in zip(_PERCENTIS, p)},
+                                'max': float(coluna.max()), 'soma': float(coluna.sum())}
+                else:
+                    m[campo] = {**{f'p{q}': None for q in _PERCENTIS}, 'max': None, 'soma': 0.0}
+            resultado[nome] = m
+        return resultado
+
+    def summary(self) -> pd.DataFrame:
+        """
+        One row per endpoint: Requisições, Erros, Cache Hits, Coalescidas, Retries, Bytes, Linhas and
+        the percentiles of each timing in seconds (e.g. 'Total p50', 'Parse p99', 'Download max').
+        """
+        linhas = []
+        for nome, m in self.metrics().items():
+            linha = {'Endpoint': nome, 'Requisições': m['requisicoes'], 'Erros': m['erros'], 'Cache Hits': m['cache_hits'],
+                     'Coalescidas': m['coalescidas'], 'Retries': m['retries'], 'Bytes': m['bytes'], 'Linhas': m['linhas']}
+            for campo, titulo in _TEMPOS:
+                for chave in [f'p{q}' for q in _PERCENTIS] + ['max']:
+                    linha[f'{titulo} {chave}'] = m[campo][chave]
+            linhas.append(linha)
+        colunas = ['Endpoint', 'Requisições', 'Erros', 'Cache Hits', 'Coalescidas', 'Retries', 'Bytes', 'Linhas']
+        colunas += [f'{titulo} {chave}' for _, titulo in _TEMPOS for chave in [f'p{q}' for q in _PERCENTIS] + ['max']]
+        return pd.DataFrame(linhas, columns=colunas)
+
+    def export(self):
+        """
+        Hands the current metrics to every exporter.
+        """
+        metrics = self.metrics()
+        for exporter in self.exporters:
+            exporter.export(metrics)
+
+    def __repr__(self):
+        return f'MetricsCollector({len(self._endpoints)} endpoints)'
+
+
+class Exporter:
+    """
+    Base of the exporters of a MetricsCollector: export() receives the dict of MetricsCollector.metrics().
+    """
+
+    def export(self, metrics:dict):
+        raise NotImplementedError
+
+
+def _write_atomic(path:str, text:str):
+    # Readers (a scraper, a dashboard) never see a half written file
+    temporario = f'{path}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporario, path)
+
+
+class JsonExporter(Exporter):
+    """
+    Writes the metrics to a JSON file, replaced on every export.
+
+    Args:
+        path: Path of the JSON file.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+
+    def export(self, metrics:dict):
+        _write_atomic(self.path, json.dumps({'gerado_em': time.time(), 'endpoints': metrics}, indent=2, default=str))
+
+
+class PrometheusExporter(Exporter):
+    """
+    Writes the metrics in the Prometheus text format, for the textfile collector of node_exporter.
+
+    Args:
+        path: Path of the .prom file.
+        prefix: Prefix of the metric names.
+    """
+
+    def __init__(self, path:str, prefix:str=None):
+        self.path = path
+        self.prefix = prefix if isinstance(prefix, str) else 'debentures'
+
+    def render(self, metrics:dict) -> str:
+        p = self.prefix
+        contadores = [('requests_total', 'requisicoes', 'Requests made.'), ('errors_total', 'erros', 'Failed requests.'),
+                      ('cache_hits_total', 'cache_hits', 'Requests answered by the cache.'),
+                      ('coalesced_total', 'coalescidas', 'Requests that joined an identical one in flight.'),
+                      ('retries_total', 'retries', 'Retries made by the transport.'),
+                      ('bytes_total', 'bytes', 'Bytes of the response bodies.'), ('rows_total', 'linhas', 'Rows parsed.')]
+        linhas = []
+        for nome, chave, ajuda in contadores:
+            linhas += [f'# HELP {p}_{nome} {ajuda}', f'# TYPE {p}_{nome} counter']
+            linhas += [f'{p}_{nome}{{endpoint="{e}"}} {m[chave]}' for e, m in metrics.items()]
+        for campo, _ in _TEMPOS:
+            nome = f'{p}_{campo.replace("_s", "")}_seconds'
+            linhas += [f'# HELP {nome} Seconds per request ({campo}).', f'# TYPE {nome} summary']
+            for e, m in metrics.items():
+                for q in _PERCENTIS:
+                    valor = m[campo][f'p{q}']
+                    if valor is not None:
+                        linhas.append(f'{nome}{{endpoint="{e}",quantile="{q / 100}"}} {valor}')
+                linhas.append(f'{nome}_sum{{endpoint="{e}"}} {m[campo]["soma"]}')
+                linhas.append(f'{nome}_count{{endpoint="{e}"}} {m["requisicoes"]}')
+        return '\n'.join(linhas) + '\n'
+
+    def export(self, metrics:dict):
+        _write_atomic(self.path, self.render(metrics))
@@ -0,0 +1,330 @@
+import os
+import re
+import json
+import time
+import inspect
+import sqlite3
+import threading
+import pandas as pd
+from .emissoes import EmissoesDebentures
+from .utils.arrow import resolve_output, convert_result
+from .utils.query import resolve_errors
+from .utils.schemas import apply_schema, normalize_name
+from .utils.transport import Transport, _resolve_transport
+from .utils.dates import _cnpj_digits, _parse_date
+
+# campo -> (pattern of the export column, how it is stored in its indexed _f_ column):
+# 'data' as ISO dates, 'texto' normalized (see normalize_name), 'codigo' upper-cased, 'cnpj' as 14 digits
+_CAMPOS = {
+    'ativo': (r'^codigo do ativo$', 'codigo'),
+    'emissor': (r'^(empresa|emissor)$', 'texto'),
+    'cnpj': (r'^cnpj', 'cnpj'),
+    'registro_cvm': (r'^data (de|do) registro (na )?cvm', 'data'),
+    'emissao': (r'^data de emissao$', 'data'),
+    'vencimento': (r'^data de vencimento$', 'data'),
+    'rentabilidade': (r'^data do inicio da rentabilidade', 'data'),
+    'distribuicao': (r'^data do inicio da distribuicao', 'data'),
+    'indice': (r'^indice$', 'texto'),
+    'tipo': (r'^tipo$', 'texto'),
+    'criterio': (r'^criterio de calculo', 'texto'),
+    'mandatario': (r'^banco mandatario', 'texto'),
+    'agente': (r'^agente fiduciario', 'texto'),
+    'depositaria': (r'^instituicao depositaria', 'texto'),
+    'coordenador': (r'^coordenador lider', 'texto'),
+}
+
+# filter of caracteristicas_debs -> (campo, comparison) answered from the mirror
+_FILTROS = {
+    'ativo': ('ativo', 'prefixo'),
+    'mnome': ('emissor', 'contem'),
+    'cvm_ini': ('registro_cvm', '>='), 'cvm_fim': ('registro_cvm', '<='),
+    'emis_ini': ('emissao', '>='), 'emis_fim': ('emissao', '<='),
+    'venc_ini': ('vencimento', '>='), 'venc_fim': ('vencimento', '<='),
+    'rent_ini': ('rentabilidade', '>='), 'rent_fim': ('rentabilidade', '<='),
+    'distrib_ini': ('distribuicao', '>='), 'distrib_fim': ('distribuicao', '<='),
+    'indice': ('indice', '='),
+    'tipo_': ('tipo', '='),
+    'crit_calc': ('criterio', '='),
+    'mbanco': ('mandatario', 'contem'),
+    'magente': ('agente', 'contem'),
+    'instdep': ('depositaria', 'contem'),
+    'coordenador': ('coordenador', 'contem'),
+}
+
+# Filters that select the mirrored export itself rather than rows of it
+_SNAPSHOT = ('tipo', 'exec')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snap TEXT PRIMARY KEY,
+    tipo TEXT,
+    exec INTEGER,
+    colunas TEXT,
+    campos TEXT,
+    linhas INTEGER,
+    sincronizado REAL
+)
+"""
+
+_FILTER_NAMES = [p for p in inspect.signature(EmissoesDebentures.caracteristicas_debs).parameters if p != 'self']
+
+
+def _snap(tipo:str=None, exec:bool=None) -> str:
+    tipo = tipo if isinstance(tipo, str) else 'privadas'
+    return f"{tipo}|{int(exec) if isinstance(exec, bool) else 0}"
+
+
+def _coluna(i:int) -> str:
+    return f'c{i}'
+
+
+def _valor_campo(valor, kind:str):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    valor = str(valor).strip()
+    if kind == 'data':
+        data = _parse_date(valor) if valor else None
+        return data.isoformat() if data else None
+    if kind == 'cnpj':
+        return _cnpj_digits(valor) or None
+    if kind == 'codigo':
+        return valor.upper() or None
+    return normalize_name(valor) or None
+
+
+class CaracteristicasMirror:
+    """
+    Local mirror of the characteristics export (EmissoesDebentures.caracteristicas_debs),
+    kept in one SQLite file and indexed by ticker, issuer CNPJ and the columns behind the
+    common filters, so that filter permutations are answered locally instead of by the site.
+    The indexes select the rows, which are taken from the typed export kept in memory after
+    the first query.
+
+    sync() downloads the whole export of a tipo/exec pair and replaces its snapshot in one
+    transaction. caracteristicas_debs() takes the filters of the endpoint: when every filter
+    given maps to a column of the mirrored export (ticker prefix, issuer name, the date ranges,
+    índice, tipo, critério de cálculo and the agents), the rows are selected locally; other
+    filters, or an export never synced, are sent to the site unless fallback=False.
+
+    Dates are compared as dates and texts are matched without case or accents; the site may
+    be looser or stricter on some of them, so results can differ at the edges.
+
+    Args:
+        path: SQLite file. Defaults to ~/.cache/debentures_dot_com/caracteristicas.sqlite.
+        transport: Transport used by sync and by the fallback to the site.
+        raw: Keeps the text columns of the export instead of typing them.
+        output: 'pandas' (default), 'arrow' or 'polars'.
+        errors: Error handling of the fallback to the site, 'print' (default) or 'raise'.
+        fallback: Sends the filters the mirror cannot answer to the site; with False they raise LookupError.
+    """
+
+    def __init__(self, path:str=None, transport:Transport=None, raw:bool=False, output:str=None,
+                 errors:str=None, fallback:bool=True):
+        if not isinstance(path, str):
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'debentures_dot_com', 'caracteristicas.sqlite')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.transport = _resolve_transport(transport)
+        self.raw = raw
+        self.output = resolve_output(output)
+        self.errors = resolve_errors(errors)
+        self.fallback = fallback
+        self.root_url = EmissoesDebentures(transport=self.transport).root_url
+        self._lock = threading.Lock()
+        self._snapshots = None
+        self._frames = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(_SCHEMA)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS caracteristicas (_snap TEXT, _pos INTEGER, '
+                               + ', '.join(f'_f_{c} TEXT' for c in _CAMPOS) + ')')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ix_snap ON caracteristicas (_snap, _pos)')
+            for campo in _CAMPOS:
+                # Dates and exact matches use the index; 'contem' filters scan the snapshot
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS ix_{campo} ON caracteristicas (_snap, _f_{campo})')
+
+    def _client(self, raw:bool, output:str, errors:str) -> EmissoesDebentures:
+        cliente = EmissoesDebentures(transport=self.transport, raw=raw, output=output, errors=errors)
+        cliente.root_url = self.root_url
+        return cliente
+
+    def _colunas_tabela(self) -> list:
+        return [r[1] for r in self._conn.execute('PRAGMA table_info(caracteristicas)')]
+
+    def sync(self, tipo:str=None, exec:bool=None, timeout:int=None) -> int:
+        """
+        Downloads the whole characteristics export of a tipo/exec pair (the endpoint's defaults
+        when not given) and replaces its snapshot. Returns the number of rows stored.
+        """
+        cliente = self._client(True, 'pandas', 'raise')
+        query = cliente._query_caracteristicas_debs({'tipo': tipo, 'exec': exec})
+        if timeout is not None:
+            query.timeout = timeout
+        df = cliente._run(query)
+        nomes = [str(c) for c in df.columns]
+        normalizados = [normalize_name(c) for c in nomes]
+        campos = {}
+        for campo, (padrao, _) in _CAMPOS.items():
+            posicao = next((i for i, n in enumerate(normalizados) if re.search(padrao, n)), None)
+            if posicao is not None:
+                campos[campo] = posicao
+
+        linhas = []
+        for pos, row in enumerate(df.itertuples(index=False, name=None)):
+            textos = [None if (not isinstance(v, str) and pd.isna(v)) else str(v) for v in row]
+            filtros = [_valor_campo(textos[campos[c]], kind) if c in campos else None for c, (_, kind) in _CAMPOS.items()]
+            linhas.append((pos, *filtros, *textos))
+
+        snap = _snap(tipo, exec)
+        with self._lock, self._conn:
+            existentes = self._colunas_tabela()
+            for i in range(len(nomes)):
+                if _coluna(i) not in existentes:
+                    self._conn.execute(f'ALTER TABLE caracteristicas ADD COLUMN {_coluna(i)} TEXT')
+            colunas = ['_pos', *(f'_f_{c}' for c in _CAMPOS), *(_coluna(i) for i in range(len(nomes)))]
+            self._conn.execute('DELETE FROM caracteristicas WHERE _snap = ?', (snap,))
+            self._conn.executemany(
+                f"INSERT INTO caracteristicas (_snap, {', '.join(colunas)}) VALUES (?, {', '.join('?' * len(colunas))})",
+                [(snap, *linha) for linha in linhas])
+            self._conn.execute('ANALYZE caracteristicas')
+            self._conn.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (snap, *snap.split('|'), json.dumps(nomes), json.dumps(campos), len(linhas), time.time()))
+            self._snapshots = None
+            self._frames = {}
+        return len(linhas)
+
+    def snapshots(self) -> dict:
+        """
+        The synced exports: {'tipo|exec': {'colunas', 'campos', 'linhas', 'sincronizado'}}.
+        """
+        with self._lock:
+            if self._snapshots is None:
+                self._snapshots = {
+                    snap: {'colunas': json.loads(colunas), 'campos': json.loads(campos), 'linhas': linhas,
+                           'sincronizado': sincronizado}
+                    for snap, colunas, campos, linhas, sincronizado in self._conn.execute(
+                        'SELECT snap, colunas, campos, linhas, sincronizado FROM snapshots')
+                }
+            return self._snapshots
+
+    def status(self) -> pd.DataFrame:
+        """
+        One row per synced export ('Tipo', 'Exec', 'Linhas', 'Sincronizado').
+        """
+        linhas = [(*snap.split('|'), s['linhas'], pd.Timestamp(s['sincronizado'], unit='s'))
+                  for snap, s in self.snapshots().items()]
+        df = pd.DataFrame(linhas, columns=['Tipo', 'Exec', 'Linhas', 'Sincronizado'])
+        df['Exec'] = df['Exec'].astype(int).astype(bool)
+        return df
+
+    def _plano(self, filtros:dict):
+        # (snapshot, where clauses, params) when the mirror can answer the filters, None otherwise
+        snapshot = self.snapshots().get(_snap(filtros.get('tipo'), filtros.get('exec')))
+        if snapshot is None:
+            return None
+        clausulas, params = [], []
+        for nome, valor in filtros.items():
+            if nome in _SNAPSHOT or valor is None or valor == '':
+                continue
+            if nome not in _FILTROS:
+                return None
+            campo, comparacao = _FILTROS[nome]
+            if campo not in snapshot['campos']:
+                return None
+            kind = _CAMPOS[campo][1]
+            valor = _valor_campo(valor, kind)
+            if valor is None:
+                return None
+            coluna = f'_f_{campo}'
+            if comparacao == 'prefixo':
+                # A range instead of LIKE, so the index is used
+                clausulas.append(f'{coluna} >= ? AND {coluna} < ?')
+                params.extend([valor, valor + '\uffff'])
+            elif comparacao == 'contem':
+                # Normalized texts only hold [a-z0-9 ], so LIKE needs no escaping
+                clausulas.append(f'{coluna} LIKE ?')
+                params.append(f'%{valor}%')
+            else:
+                clausulas.append(f'{coluna} {comparacao} ?')
+                params.append(valor)
+        return snapshot, clausulas, params
+
+    def can_answer(self, **filtros) -> bool:
+        """
+        True when caracteristicas_debs(**filtros) would be answered from the mirror.
+        """
+        return self._plano(self._bind(filtros)) is not None
+
+    def _bind(self, filtros:dict) -> dict:
+        desconhecidos = set(filtros) - set(_FILTER_NAMES)
+        if desconhecidos:
+            raise TypeError(f"Unknown filters: {', '.join(sorted(desconhecidos))}")
+        return filtros
+
+    def caracteristicas_debs(self, **filtros):
+        """
+        Drop-in for EmissoesDebentures.caracteristicas_debs, answered from the mirror when it can
+        (see can_answer) and by the site otherwise.
+
+        Args:
+            **filtros: The filters of caracteristicas_debs, by name.
+        """
+        filtros = self._bind(filtros)
+        plano = self._plano(filtros)
+        if plano is None:
+            if not self.fallback:
+                raise LookupError('The mirror cannot answer these filters; sync the export or use fallback=True.')
+            return self._client(self.raw, self.output, self.errors).caracteristicas_debs(**filtros)
+        _, clausulas, params = plano
+        return self._select(_snap(filtros.get('tipo'), filtros.get('exec')), clausulas, params)
+
+    def load(self, ativos=None, cnpj=None, tipo:str=None, exec:bool=None):
+        """
+        Rows of the mirrored export by ticker(s) and/or issuer CNPJ(s), through the key indexes.
+        """
+        snap = _snap(tipo, exec)
+        snapshot = self.snapshots().get(snap)
+        if snapshot is None:
+            raise LookupError(f"Export '{snap}' was not synced.")
+        clausulas, params = [], []
+        for campo, valores in (('ativo', ativos), ('cnpj', cnpj)):
+            if valores is None:
+                continue
+            if campo not in snapshot['campos']:
+                raise LookupError(f"The mirrored export has no '{campo}' column.")
+            valores = [valores] if isinstance(valores, str) else list(valores)
+            valores = [_valor_campo(v, _CAMPOS[campo][1]) for v in valores]
+            clausulas.append(f"_f_{campo} IN ({', '.join('?' * len(valores))})")
+            params.extend(valores)
+        return self._select(snap, clausulas, params)
+
+    def _frame(self, snap:str) -> pd.DataFrame:
+        # The whole snapshot, typed once and kept in memory until the next sync
+        chave = (snap, self.raw)
+        with self._lock:
+            df = self._frames.get(chave)
+            if df is None:
+                nomes = json.loads(self._conn.execute('SELECT colunas FROM snapshots WHERE snap = ?', (snap,)).fetchone()[0])
+                linhas = self._conn.execute(
+                    f"SELECT {', '.join(_coluna(i) for i in range(len(nomes)))} FROM caracteristicas "
+                    'WHERE _snap = ? ORDER BY _pos', (snap,)).fetchall()
+                df = pd.DataFrame(linhas, columns=nomes)
+                df = self._frames[chave] = df if self.raw else apply_schema(df, 'caracteristicas_debs')
+        return df
+
+    def _select(self, snap:str, clausulas:list, params:list):
+        # The indexes pick the row positions; the rows come from the typed snapshot
+        df = self._frame(snap)
+        if clausulas:
+            where = ''.join(f' AND {c}' for c in clausulas)
+            with self._lock:
+                posicoes = [p for p, in self._conn.execute(
+                    f'SELECT _pos FROM caracteristicas WHERE _snap = ?{where} ORDER BY _pos', [snap, *params])]
+            df = df.take(posicoes).reset_index(drop=True)
+        else:
+            df = df.copy()
+        return convert_result(df, self.output)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
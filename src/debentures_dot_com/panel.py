@@ -0,0 +1,306 @@
+import os
+import json
+import warnings
+import numpy as np
+import pandas as pd
+from .utils.dates import _parse_date
+from .utils.schemas import _as_numbers
+from .utils.calendario import feriados as _feriados
+
+_VALORES = 'valores.npy'
+_EIXOS = 'eixos.json'
+_STATS = ('count', 'mean', 'std', 'min', 'median', 'max')
+
+
+def _datas(valores) -> np.ndarray:
+    serie = pd.Series(valores)
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return np.asarray(serie.values, dtype='datetime64[D]')
+    # Text dates of raw frames are written day first (15/03/2024); other layouts go through _parse_date
+    datas = pd.to_datetime(serie, format='%d/%m/%Y', errors='coerce')
+    resto = datas.isna() & serie.notna()
+    if resto.any():
+        datas[resto] = pd.to_datetime(serie[resto].map(lambda v: _parse_date(str(v))), errors='coerce')
+    return np.asarray(datas.values, dtype='datetime64[D]')
+
+
+def _numeros(valores:pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(valores):
+        return valores
+    # Text values of raw frames are written the Brazilian way (1.000,412345)
+    numeros = _as_numbers(valores)
+    if numeros is None:
+        raise ValueError(f'Column {valores.name!r} has values that are not numbers.')
+    return numeros
+
+
+def _dia(data) -> np.datetime64:
+    if not isinstance(data, str):
+        return np.datetime64(pd.Timestamp(data).date(), 'D')
+    dia = _parse_date(data)
+    if dia is None:
+        raise ValueError(f'Invalid date {data!r}.')
+    return np.datetime64(dia, 'D')
+
+
+def _nanstat(nome:str, valores:np.ndarray) -> np.ndarray:
+    # Columns with no value give NaN without the 'Mean of empty slice' warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if nome == 'count':
+            return (~np.isnan(valores)).sum(axis=0)
+        return {'mean': np.nanmean, 'std': lambda v, axis: np.nanstd(v, axis=axis, ddof=1), 'min': np.nanmin,
+                'median': np.nanmedian, 'max': np.nanmax}[nome](valores, axis=0)
+
+
+class PUPanel:
+    """
+    Dense ticker x date matrix of one PU column, built from many pu_historico results.
+
+    Every ticker shares one sorted date axis, so returns, forward fills and cross-sectional
+    statistics run as NumPy operations over the whole universe instead of per-ticker loops.
+    Dates a ticker has no value for are NaN. Values are float32 by default, half the memory
+    of the float64 DataFrames; with path=, the matrix is a memory-mapped .npy file in that
+    directory, reopened later with PUPanel.open() without reading it into memory.
+
+    Args:
+        ativos: Tickers, one per row.
+        datas: Dates, one per column, as datetime64[D] in increasing order.
+        valores: Matrix of shape (len(ativos), len(datas)).
+        coluna: Name of the PU column the values come from.
+    """
+
+    __slots__ = ('ativos', 'datas', 'valores', 'coluna', '_posicoes')
+
+    def __init__(self, ativos, datas, valores:np.ndarray, coluna:str='Preço Unitário'):
+        self.ativos = np.asarray(ativos, dtype=str)
+        self.datas = np.asarray(datas, dtype='datetime64[D]')
+        if valores.shape != (len(self.ativos), len(self.datas)):
+            raise ValueError(f'Values of shape {valores.shape} do not match {len(self.ativos)} tickers x {len(self.datas)} dates.')
+        self.valores = valores
+        self.coluna = coluna
+        self._posicoes = None
+
+    @classmethod
+    def from_frame(cls, df:pd.DataFrame, coluna:str=None, dtype:str=None, business_days:bool=True,
+                   holidays:list=None, path:str=None) -> 'PUPanel':
+        """
+        Builds the panel from a long DataFrame with an 'Ativo' and a 'Data do PU' column, such
+        as the first result of EmissoesDebentures.pu_historico_lote. Raw frames, with dates
+        and values as text (15/03/2024, 1.000,412345), are parsed here.
+
+        Args:
+            coluna: PU column of the values, 'Preço Unitário' by default.
+            dtype: 'float32' (default) or 'float64'.
+            business_days: Keeps only the business days of the date axis (weekdays outside holidays).
+            holidays: Dates left out of the business days; the national holidays (see
+                utils.calendario) by default, and an empty list keeps every weekday.
+            path: Directory of a memory-mapped panel; the matrix is kept in memory when not given.
+
+        Raises:
+            ValueError: A value of the PU column is not a number.
+        """
+        coluna = coluna if isinstance(coluna, str) else 'Preço Unitário'
+        dtype = np.dtype(dtype if isinstance(dtype, str) else 'float32')
+        faltando = [c for c in ('Ativo', 'Data do PU', coluna) if c not in df.columns]
+        if faltando:
+            raise KeyError(f"Missing columns {', '.join(faltando)}.")
+        datas = _datas(df['Data do PU'])
+        valores = _numeros(df[coluna]).to_numpy(dtype=dtype, na_value=np.nan)
+        validos = ~np.isnat(datas)
+        if business_days:
+            if holidays is None:
+                anos = np.unique(datas[validos].astype('datetime64[Y]').astype(int) + 1970)
+                feriados = sorted(np.datetime64(d, 'D') for ano in anos for d in _feriados(int(ano)))
+            else:
+                feriados = [_dia(d) for d in holidays]
+            validos &= np.is_busday(np.where(validos, datas, np.datetime64('2000-01-03')), holidays=feriados)
+        codigos_ativo, ativos = pd.factorize(df['Ativo'].astype(str)[validos], sort=True)
+        eixo, codigos_data = np.unique(datas[validos], return_inverse=True)
+        painel = cls._alocar(list(ativos), eixo, dtype, coluna, path)
+        # Repeated (ticker, date) pairs keep their last row, as the assignment goes in order
+        painel.valores[codigos_ativo, codigos_data.ravel()] = valores[validos]
+        painel.flush()
+        return painel
+
+    @classmethod
+    def _alocar(cls, ativos:list, datas:np.ndarray, dtype, coluna:str, path:str=None) -> 'PUPanel':
+        forma = (len(ativos), len(datas))
+        if path is None:
+            return cls(ativos, datas, np.full(forma, np.nan, dtype=dtype), coluna)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, _EIXOS), 'w', encoding='utf-8') as f:
+            json.dump({'ativos': list(ativos), 'datas': [str(d) for d in datas], 'coluna': coluna}, f, ensure_ascii=False)
+        valores = np.lib.format.open_memmap(os.path.join(path, _VALORES), mode='w+', dtype=dtype, shape=forma)
+        valores[:] = np.nan
+        return cls(ativos, datas, valores, coluna)
+
+    @classmethod
+    def open(cls, path:str, mode:str='r') -> 'PUPanel':
+        """
+        Opens a panel written with path=, memory-mapping its matrix.
+
+        Args:
+            mode: 'r' (default) read only, 'r+' to change the values in place, 'c' copy on write.
+        """
+        with open(os.path.join(path, _EIXOS), encoding='utf-8') as f:
+            eixos = json.load(f)
+        valores = np.load(os.path.join(path, _VALORES), mmap_mode=mode)
+        return cls(eixos['ativos'], np.array(eixos['datas'], dtype='datetime64[D]'), valores, eixos['coluna'])
+
+    def save(self, path:str) -> 'PUPanel':
+        """
+        Writes the panel to a directory and returns it reopened from there, memory-mapped.
+        """
+        painel = self._alocar(list(self.ativos), self.datas, self.valores.dtype, self.coluna, path)
+        painel.valores[:] = self.valores
+        painel.flush()
+        return painel
+
+    def flush(self):
+        if isinstance(self.valores, np.memmap):
+            self.valores.flush()
+
+    @property
+    def shape(self) -> tuple:
+        return self.valores.shape
+
+    def __len__(self):
+        return len(self.ativos)
+
+    def __repr__(self):
+        periodo = f', {self.datas[0]} a {self.datas[-1]}' if len(self.datas) else ''
+        return f'PUPanel({len(self.ativos)} ativos x {len(self.datas)} datas{periodo}, {self.valores.dtype})'
+
+    def _com(self, valores:np.ndarray, coluna:str=None) -> 'PUPanel':
+        return PUPanel(self.ativos, self.datas, valores, coluna or self.coluna)
+
+    def _linhas(self, ativos) -> np.ndarray:
+        if self._posicoes is None:
+            self._posicoes = pd.Index(self.ativos)
+        return self._posicoes.get_indexer(np.asarray(ativos, dtype=str))
+
+    def sel(self, ativos:list=None, dt_ini:str=None, dt_fim:str=None) -> 'PUPanel':
+        """
+        The panel of some tickers and/or of a date range (inclusive). Date ranges alone are
+        views of the matrix, without copies.
+        """
+        inicio = np.searchsorted(self.datas, _dia(dt_ini), 'left') if dt_ini is not None else 0
+        fim = np.searchsorted(self.datas, _dia(dt_fim), 'right') if dt_fim is not None else len(self.datas)
+        linhas = slice(None)
+        if ativos is not None:
+            linhas = self._linhas(ativos)
+            if (linhas < 0).any():
+                raise KeyError(f"Unknown tickers {', '.join(np.asarray(ativos, dtype=str)[linhas < 0])}.")
+        ativos_sel = self.ativos[linhas]
+        return PUPanel(ativos_sel, self.datas[inicio:fim], self.valores[linhas, inicio:fim], self.coluna)
+
+    def ffill(self, limit:int=None) -> 'PUPanel':
+        """
+        Forward fills the missing dates of every ticker with its last value.
+
+        Args:
+            limit: Fills at most this many dates after a value.
+        """
+        validos = ~np.isnan(self.valores)
+        colunas = np.arange(self.valores.shape[1])
+        # Position of the last value at or before each date, -1 before the first one
+        ultimo = np.maximum.accumulate(np.where(validos, colunas, -1), axis=1)
+        preenchido = np.take_along_axis(self.valores, np.maximum(ultimo, 0), axis=1)
+        manter = ultimo >= 0
+        if limit is not None:
+            manter &= colunas - ultimo <= limit
+        return self._com(np.where(manter, preenchido, np.nan).astype(self.valores.dtype, copy=False))
+
+    def returns(self, periods:int=1, log:bool=False, fill:bool=True) -> 'PUPanel':
+        """
+        Returns of the PU over `periods` dates of the axis.
+
+        Args:
+            log: Log returns instead of simple ones.
+            fill: Forward fills first, so a missing date does not break the returns around it.
+        """
+        valores = (self.ffill() if fill else self).valores
+        retornos = np.full(valores.shape, np.nan, dtype=valores.dtype)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            razao = valores[:, periods:] / valores[:, :-periods]
+            retornos[:, periods:] = np.log(razao) if log else razao - 1
+        return self._com(retornos, f'Retorno {self.coluna}')
+
+    def cross_section(self, stats:tuple=None) -> pd.DataFrame:
+        """
+        Statistics across the tickers of every date, ignoring missing values.
+
+        Args:
+            stats: Any of 'count', 'mean', 'std', 'min', 'median' and 'max' (all by default).
+        """
+        stats = tuple(stats) if stats else _STATS
+        desconhecidas = [s for s in stats if s not in _STATS]
+        if desconhecidas:
+            raise ValueError(f"Unknown stats {', '.join(desconhecidas)}; use {', '.join(_STATS)}.")
+        valores = np.asarray(self.valores, dtype='float64')
+        return pd.DataFrame({s: _nanstat(s, valores) for s in stats},
+                            index=pd.DatetimeIndex(self.datas, name='Data do PU'))
+
+    def event_mask(self, eventos:pd.DataFrame, data:str=None) -> np.ndarray:
+        """
+        Boolean matrix of the panel's shape, True on the dates with an event of the ticker.
+
+        Args:
+            eventos: DataFrame with an 'Ativo' column and a date column, e.g. from agenda_eventos.
+            data: Date column of the events, 'Data do Evento' by default.
+        """
+        linhas, colunas = self._posicoes_eventos(eventos, data)
+        exatas = (linhas >= 0) & (colunas >= 0)
+        mascara = np.zeros(self.shape, dtype=bool)
+        mascara[linhas[exatas], colunas[exatas]] = True
+        return mascara
+
+    def _posicoes_eventos(self, eventos:pd.DataFrame, data:str=None) -> tuple:
+        # (row, column) of every event; -1 for tickers outside the panel or dates off the axis
+        datas = _datas(eventos[data if isinstance(data, str) else 'Data do Evento'])
+        linhas = self._linhas(eventos['Ativo'].astype(str))
+        colunas = np.searchsorted(self.datas, datas)
+        dentro = colunas < len(self.datas)
+        dentro[dentro] = self.datas[colunas[dentro]] == datas[dentro]
+        return linhas, np.where(dentro, colunas, -1)
+
+    def join_events(self, eventos:pd.DataFrame, data:str=None, fill:bool=True) -> pd.DataFrame:
+        """
+        The events with the PU of their ticker on the event date and on the date before it.
+
+        Args:
+            eventos: DataFrame with an 'Ativo' column and a date column, e.g. from agenda_eventos.
+            data: Date column of the events, 'Data do Evento' by default.
+            fill: Takes the last PU at or before each date when the date itself has none.
+
+        Returns:
+            A copy of eventos with the columns 'PU' and 'PU Anterior' added.
+        """
+        coluna_data = data if isinstance(data, str) else 'Data do Evento'
+        datas = _datas(eventos[coluna_data])
+        linhas = self._linhas(eventos['Ativo'].astype(str))
+        valores = (self.ffill() if fill else self).valores
+        # Column of the event date (or of the last date before it) and of the date before that
+        colunas = np.searchsorted(self.datas, datas, 'right') - 1
+        if not fill:
+            colunas = np.where((colunas >= 0) & (self.datas[np.maximum(colunas, 0)] == datas), colunas, -1)
+        saida = eventos.copy()
+        for nome, posicoes in (('PU', colunas), ('PU Anterior', np.where(colunas >= 0, colunas - 1, -1))):
+            validas = (linhas >= 0) & (posicoes >= 0) & ~np.isnat(datas)
+            pu = np.full(len(eventos), np.nan)
+            pu[validas] = valores[linhas[validas], posicoes[validas]]
+            saida[nome] = pu
+        return saida
+
+    def to_frame(self, long:bool=False) -> pd.DataFrame:
+        """
+        The panel as a DataFrame: dates by tickers, or with long=True the 'Ativo', 'Data do PU'
+        and value columns of the non missing cells.
+        """
+        if not long:
+            return pd.DataFrame(self.valores.T, index=pd.DatetimeIndex(self.datas, name='Data do PU'),
+                                columns=pd.Index(self.ativos, name='Ativo'))
+        linhas, colunas = np.nonzero(~np.isnan(self.valores))
+        return pd.DataFrame({'Ativo': self.ativos[linhas], 'Data do PU': self.datas[colunas].astype('datetime64[ns]'),
+                             self.coluna: self.valores[linhas, colunas]})
@@ -0,0 +1,130 @@
+"""
+pandas free access to the ANBIMA daily debenture price files, for scripts and services
+whose start-up time matters more than a typed DataFrame.
+
+Nothing here imports pandas or BeautifulSoup: the file goes through the same Transport
+(cache, rate limiter, retries) and RequestEvent hooks as the clients and is split with
+the standard library. Values are kept as the text of the file.
+"""
+import time
+import requests
+from .utils.dates import _format_date_for_url, _is_past_date
+from .utils.transport import Transport, _resolve_transport
+from .utils.events import RequestEvent, emit
+from .exceptions import ParseError, wrap_error
+
+ANBIMA_URL = 'https://www.anbima.com.br/informacoes/merc-sec-debentures'
+OUTPUTS = ('records', 'columns', 'arrow')
+
+_ENCODING = 'ISO-8859-1'
+
+
+def _header(campos:list) -> list:
+    # Column names as pandas reads them: blanks named 'Unnamed: i', repeats suffixed '.1', '.2'...
+    nomes, vistos = [], {}
+    for i, campo in enumerate(campos):
+        nome = campo if campo else f'Unnamed: {i}'
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f'{nome}.{vistos[nome]}'
+        vistos.setdefault(nome, 0)
+        nomes.append(nome.strip())
+    return nomes
+
+
+def parse_anbima_records(text:str, sep:str=None, skiprows:int=None) -> tuple:
+    """
+    Splits an ANBIMA daily price file into the columns and rows of parse_anbima_precos, without pandas.
+
+    Returns:
+        (columns, rows): the header names and a list of rows, each a list of strings, with
+        the fields missing at the end of short lines left empty.
+
+    Raises:
+        ValueError: For a line with more fields than the header.
+    """
+    sep = sep if isinstance(sep, str) else '@'
+    skiprows = skiprows if isinstance(skiprows, int) else 2
+    # Lines end in '\n' or '\r\n' only, as pandas reads them; blank lines are skipped after skiprows
+    linhas = [l.rstrip('\r') for l in text.split('\n')[skiprows:]]
+    linhas = [l for l in linhas if l]
+    if not linhas:
+        return [], []
+    colunas = _header(linhas[0].split(sep))
+    n = len(colunas)
+    rows = []
+    for linha in linhas[1:]:
+        campos = linha.split(sep)
+        if len(campos) > n:
+            raise ValueError(f'Expected {n} fields, saw {len(campos)}: {linha[:80]!r}')
+        # Section titles between the rows only fill the first field
+        if n > 1 and not any(c.strip() for c in campos[1:]):
+            continue
+        rows.append(campos + [''] * (n - len(campos)))
+    return colunas, rows
+
+
+def _output(colunas:list, rows:list, output:str):
+    if output == 'records':
+        return [dict(zip(colunas, r)) for r in rows]
+    valores = {c: [r[i] for r in rows] for i, c in enumerate(colunas)}
+    if output == 'columns':
+        return valores
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Arrow output requires pyarrow: pip install 'debentures-dot-com[parquet]'") from None
+    return pa.table({c: pa.array(v, type=pa.string()) for c, v in valores.items()})
+
+
+def arquivo_precos_diario(data:str, output:str=None, transport:Transport=None, timeout:int=None,
+                          root_url:str=None):
+    """
+    ANBIMA daily debenture price file of a day (MercadoSecundario.arquivo_precos_diario), as
+    plain Python or Arrow data instead of a DataFrame.
+
+    Args:
+        data: Day of the file, in the formats accepted by the clients (e.g. '20240315', '15/03/2024').
+        output: 'records' (default) for a list of dicts, 'columns' for a dict of lists, or
+            'arrow' for a pyarrow.Table of strings.
+        transport: Transport used for the request; the shared default transport when omitted.
+        timeout: Timeout of the request, in seconds.
+        root_url: Base URL of the files, ANBIMA_URL by default.
+
+    Raises:
+        DebenturesError: HTTPStatusError when there is no file for the day (weekends, holidays),
+            ConnectionFailed, RequestTimeout or ParseError.
+    """
+    output = output if isinstance(output, str) else 'records'
+    if output not in OUTPUTS:
+        raise ValueError("Parameter 'output' must be 'records', 'columns' or 'arrow'.")
+    dia = _format_date_for_url(data, '%y%m%d')
+    if not dia:
+        raise ValueError("Parameter 'data' must be a valid date.")
+    url = f'{root_url or ANBIMA_URL}/arqs/db{dia}.txt'
+    endpoint = 'arquivo_precos_diario'
+    event = RequestEvent(endpoint, url)
+    inicio = time.perf_counter()
+    try:
+        try:
+            response = _resolve_transport(transport).request('GET', url, timeout=timeout, endpoint=endpoint,
+                                                             closed=_is_past_date(data), event=event)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise wrap_error(e, endpoint, url) from e
+        event.bytes = len(response.content)
+        parse = time.perf_counter()
+        try:
+            colunas, rows = parse_anbima_records(response.content.decode(_ENCODING))
+        except Exception as e:
+            raise ParseError(f'{type(e).__name__}: {e}', endpoint, url) from e
+        finally:
+            event.parse_s = time.perf_counter() - parse
+        event.rows = len(rows)
+        return _output(colunas, rows, output)
+    except Exception as e:
+        event.error = e
+        raise
+    finally:
+        event.total_s = time.perf_counter() - inicio
+        emit(event)
@@ -0,0 +1,157 @@
+import uuid
+import threading
+import pandas as pd
+from .utils.arrow import to_arrow, _require, _pyarrow
+from .utils.schemas import normalize_name
+
+pa = _pyarrow()
+if pa is not None:
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+# date_partition -> partition columns derived from the date column
+_DATE_PARTITIONS = {'year': ['ano'], 'month': ['ano', 'mes'], 'day': ['ano', 'mes', 'dia']}
+_DATE_PARTS = {'ano': 'year', 'mes': 'month', 'dia': 'day'}
+
+
+def _is_polars(result) -> bool:
+    # Checked by module, so writing pandas or Arrow results never imports polars
+    return type(result).__module__.split('.')[0] == 'polars'
+
+
+def _as_table(result):
+    if isinstance(result, pd.DataFrame):
+        return to_arrow(result)
+    if isinstance(result, pa.Table):
+        return result
+    if _is_polars(result):
+        return result.to_arrow()
+    raise TypeError('ParquetSink writes DataFrames, pyarrow Tables or polars DataFrames, or an iterable of them.')
+
+
+def _date_field(table, date_column:str=None) -> str:
+    if date_column is not None:
+        if date_column not in table.column_names:
+            raise ValueError(f"Column '{date_column}' not found.")
+        return date_column
+    for field in table.schema:
+        if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+            return field.name
+    for name in table.column_names:
+        if normalize_name(name).startswith('data'):
+            return name
+    raise ValueError("No date column found; pass 'date_column'.")
+
+
+def _dates(column):
+    if pa.types.is_timestamp(column.type) or pa.types.is_date(column.type):
+        return column
+    # Text dates of raw results, as exported (dd/mm/yyyy)
+    texto = pc.utf8_trim_whitespace(column.cast(pa.string()))
+    return pc.strptime(texto, format='%d/%m/%Y', unit='s', error_is_null=True)
+
+
+class ParquetSink:
+    """
+    Writes endpoint results to a Parquet dataset: a directory of files, partitioned
+    hive-style (column=value/) so that readers can skip the partitions they do not need.
+
+    Column types are kept (timestamp, double, dictionary, string). Every write adds new
+    files to the dataset, so the chunks of the iter_* methods can be written as they
+    arrive; chunks whose types differ from the first write are cast to its schema.
+
+    Args:
+        path: Directory of the dataset.
+        partition_by: Column, or list of columns, used as partitions (e.g. 'Ativo').
+        date_partition: 'year', 'month' or 'day': also partitions by the 'ano', 'mes' and
+            'dia' of the date column.
+        date_column: Date column used by date_partition. Defaults to the first typed date
+            column, or the first column whose name starts with 'Data'.
+        compression: Parquet compression codec, 'zstd' by default.
+    """
+
+    def __init__(self, path:str, partition_by=None, date_partition:str=None, date_column:str=None,
+                 compression:str=None):
+        _require('arrow')
+        if date_partition is not None and date_partition not in _DATE_PARTITIONS:
+            raise ValueError("Parameter 'date_partition' must be 'year', 'month' or 'day'.")
+        self.path = path
+        self.partition_by = [partition_by] if isinstance(partition_by, str) else list(partition_by or [])
+        self.date_partition = date_partition
+        self.date_column = date_column
+        self.compression = compression if isinstance(compression, str) else 'zstd'
+        self.schema = None
+        self._lock = threading.Lock()
+
+    def _prepare(self, table):
+        if self.date_partition is not None:
+            datas = _dates(table[_date_field(table, self.date_column)])
+            for nome in _DATE_PARTITIONS[self.date_partition]:
+                table = table.append_column(nome, getattr(pc, _DATE_PARTS[nome])(datas).cast(pa.int32()))
+        for nome in self.partition_by:
+            if nome not in table.column_names:
+                raise ValueError(f"Partition column '{nome}' not found.")
+            if pa.types.is_dictionary(table.schema.field(nome).type):
+                # Partition values are written as text in the directory names
+                i = table.column_names.index(nome)
+                table = table.set_column(i, nome, table[nome].cast(pa.string()))
+        return table
+
+    def _partitions(self) -> list:
+        return self.partition_by + _DATE_PARTITIONS.get(self.date_partition, [])
+
+    def write(self, result) -> int:
+        """
+        Writes a result, or every chunk of an iterable of results (e.g. an iter_* method).
+
+        Returns:
+            The number of rows written.
+        """
+        if isinstance(result, tuple):
+            raise TypeError('Write the DataFrame of a (DataFrame, status) result, not the tuple.')
+        if isinstance(result, (pd.DataFrame, pa.Table)) or _is_polars(result):
+            return self._write(_as_table(result))
+        return sum(self._write(_as_table(chunk)) for chunk in result)
+
+    def _write(self, table) -> int:
+        if table.num_rows == 0:
+            return 0
+        table = self._prepare(table)
+        with self._lock:
+            if self.schema is None:
+                self.schema = table.schema
+            elif not table.schema.equals(self.schema):
+                try:
+                    table = table.select(self.schema.names).cast(self.schema)
+                except (KeyError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(f'Columns do not match the schema of the dataset: {e}') from e
+            ds.write_dataset(
+                table, self.path, format='parquet', partitioning=self._partitions() or None,
+                partitioning_flavor='hive' if self._partitions() else None,
+                basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                existing_data_behavior='overwrite_or_ignore',
+                file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression),
+            )
+        return table.num_rows
+
+    def dataset(self):
+        """
+        The written files as a pyarrow.dataset.Dataset, with the partition columns.
+        """
+        return ds.dataset(self.path, format='parquet', partitioning='hive' if self._partitions() else None)
+
+    def read(self, filter=None) -> pd.DataFrame:
+        """
+        Reads the dataset back into pandas, optionally with a pyarrow filter expression
+        (e.g. pyarrow.dataset.field('ano') == 2024), which only opens the matching partitions.
+        """
+        return self.dataset().to_table(filter=filter).to_pandas()
+
+
+def write_parquet(result, path:str, partition_by=None, date_partition:str=None, date_column:str=None,
+                  compression:str=None) -> int:
+    """
+    Writes an endpoint result (or the chunks of an iter_* method) to a Parquet dataset.
+    See ParquetSink for the arguments. Returns the number of rows written.
+    """
+    return ParquetSink(path, partition_by, date_partition, date_column, compression).write(result)
@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+from datetime import date
+from .emissoes import EmissoesDebentures
+from .estoques import EstoquesCorporativos
+from .mercados import MercadoSecundario
+from .utils.query import run_many
+from .utils.schemas import apply_schema
+from .utils.transport import Transport, _resolve_transport
+
+# serie -> (client class, query builder, start date kwarg, end date kwarg, first date of the full history)
+_SERIES = {
+    'pu_historico': (EmissoesDebentures, '_query_pu_historico', 'dt_inicio', 'dt_fim', date(2001, 1, 1)),
+    'estoque_por_ativo': (EstoquesCorporativos, '_query_estoque_por_ativo', 'dt_ini', 'dt_fim', date(1992, 3, 2)),
+    'preco_negociacao': (MercadoSecundario, '_query_preco_negociacao', 'dt_ini', 'dt_fim', date(1990, 3, 2)),
+}
+
+
+def _quote(name:str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _date_column(df:pd.DataFrame):
+    for col in df.columns:
+        if isinstance(col, str) and col.strip().lower().startswith('data'):
+            return col
+    return df.columns[0] if len(df.columns) else None
+
+
+class SeriesStore:
+    """
+    Incremental local store for the per-ticker series pu_historico, estoque_por_ativo
+    and preco_negociacao, kept in one SQLite file with a table per series.
+
+    The store remembers the last date held for each ticker, so a sync only requests
+    dt_ini = last_date instead of the full history. The rows stored from that date on are
+    replaced by the ones fetched, so a day that was still open on the previous sync is
+    completed, and identical rows (two equal trades of a day) are all kept.
+
+    Args:
+        path: SQLite file. Defaults to ~/.cache/debentures_dot_com/series.sqlite.
+        transport: Transport used by the underlying endpoint classes.
+    """
+
+    def __init__(self, path:str=None, transport:Transport=None):
+        if not isinstance(path, str):
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'debentures_dot_com', 'series.sqlite')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.transport = _resolve_transport(transport)
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    def _client(self, serie:str):
+        if serie not in _SERIES:
+            raise ValueError(f"Parameter 'serie' must be one of {', '.join(_SERIES)}")
+        if serie not in self._clients:
+            # Rows are stored as the exported text and typed by load()
+            self._clients[serie] = _SERIES[serie][0](transport=self.transport, raw=True)
+        return self._clients[serie]
+
+    def _table_exists(self, serie:str) -> bool:
+        row = self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (serie,)).fetchone()
+        return row is not None
+
+    def _columns(self, serie:str) -> list:
+        return [r[1] for r in self._conn.execute(f'PRAGMA table_info({_quote(serie)})')]
+
+    def last_date(self, serie:str, ativo:str):
+        """
+        Returns the last date held for a ticker, or None when the store has no rows for it.
+        """
+        self._client(serie)
+        with self._lock:
+            if not self._table_exists(serie):
+                return None
+            row = self._conn.execute(f'SELECT MAX(_data) FROM {_quote(serie)} WHERE _ativo = ?', (ativo,)).fetchone()
+        return date.fromisoformat(row[0]) if row and row[0] else None
+
+    def sync(self, serie:str, ativos, max_workers:int=None, timeout:int=None) -> pd.DataFrame:
+        """
+        Brings the stored series of one or more tickers up to today.
+
+        Args:
+            serie: 'pu_historico', 'estoque_por_ativo' or 'preco_negociacao'.
+            ativos: A ticker or a list of tickers.
+            max_workers: Number of concurrent downloads.
+
+        Returns:
+            A status DataFrame with one row per ticker ('Ativo', 'Sucesso', 'Linhas', 'Erro'),
+            where 'Linhas' is the number of new rows stored.
+        """
+        client = self._client(serie)
+        _, builder, ini_kw, fim_kw, inicio = _SERIES[serie]
+        ativos = [ativos] if isinstance(ativos, str) else list(dict.fromkeys(ativos))
+        hoje = date.today()
+
+        pendentes, queries, status = [], [], []
+        for ativo in ativos:
+            # The last stored day is requested again, as it may have been synced before it closed
+            dt_ini = self.last_date(serie, ativo) or inicio
+            pendentes.append((ativo, dt_ini))
+            queries.append(getattr(client, builder)(ativo=ativo, timeout=timeout, **{
+                ini_kw: dt_ini.strftime('%Y%m%d'), fim_kw: hoje.strftime('%Y%m%d'),
+            }))
+
+        for (ativo, dt_ini), (df, erro) in zip(pendentes, run_many(queries, self.transport, max_workers)):
+            if erro is None:
+                status.append((ativo, True, self._append(serie, ativo, df, dt_ini), None))
+            else:
+                status.append((ativo, False, 0, f'{type(erro).__name__}: {erro}'))
+        return pd.DataFrame(status, columns=['Ativo', 'Sucesso', 'Linhas', 'Erro'])
+
+    def _append(self, serie:str, ativo:str, df:pd.DataFrame, dt_ini:date) -> int:
+        # Replaces the stored rows of the ticker from dt_ini on; returns the net number of new rows
+        col_data = _date_column(df)
+        if col_data is None or df.empty:
+            return 0
+        datas = pd.to_datetime(df[col_data], format='%d/%m/%Y', errors='coerce')
+        manter = datas.notna() & (datas >= pd.Timestamp(dt_ini))
+        df, datas = df[manter], datas[manter]
+        if df.empty:
+            return 0
+        colunas = [str(c) for c in df.columns]
+        linhas = [tuple(None if pd.isna(v) else str(v) for v in row) for row in df.itertuples(index=False, name=None)]
+        registros = [(ativo, d, *row) for d, row in zip(datas.dt.strftime('%Y-%m-%d'), linhas)]
+
+        with self._lock, self._conn:
+            if not self._table_exists(serie):
+                cols = ', '.join(f'{_quote(c)} TEXT' for c in colunas)
+                self._conn.execute(f'CREATE TABLE {_quote(serie)} (_ativo TEXT, _data TEXT, {cols})')
+                self._conn.execute(f'CREATE INDEX {_quote("ix_" + serie)} ON {_quote(serie)} (_ativo, _data)')
+            else:
+                existentes = set(self._columns(serie))
+                for c in colunas:
+                    if c not in existentes:
+                        self._conn.execute(f'ALTER TABLE {_quote(serie)} ADD COLUMN {_quote(c)} TEXT')
+            removidas = self._conn.execute(f'DELETE FROM {_quote(serie)} WHERE _ativo = ? AND _data >= ?',
+                                           (ativo, dt_ini.isoformat())).rowcount
+            nomes = ', '.join(_quote(c) for c in ['_ativo', '_data', *colunas])
+            marcas = ', '.join('?' * (len(colunas) + 2))
+            self._conn.executemany(f'INSERT INTO {_quote(serie)} ({nomes}) VALUES ({marcas})', registros)
+            return len(registros) - removidas
+
+    def load(self, serie:str, ativos=None, dt_ini:str=None, dt_fim:str=None, raw:bool=False) -> pd.DataFrame:
+        """
+        Reads a stored series back, optionally filtered by tickers and an ISO date window (YYYY-MM-DD).
+        The result has an 'Ativo' column followed by the columns returned by the endpoint,
+        typed by the endpoint's schema unless raw=True.
+        """
+        self._client(serie)
+        with self._lock:
+            if not self._table_exists(serie):
+                return pd.DataFrame()
+            filtros, params = [], []
+            if ativos is not None:
+                ativos = [ativos] if isinstance(ativos, str) else list(ativos)
+                filtros.append(f"_ativo IN ({', '.join('?' * len(ativos))})")
+                params.extend(ativos)
+            if dt_ini:
+                filtros.append('_data >= ?')
+                params.append(dt_ini)
+            if dt_fim:
+                filtros.append('_data <= ?')
+                params.append(dt_fim)
+            where = f" WHERE {' AND '.join(filtros)}" if filtros else ''
+            df = pd.read_sql_query(f'SELECT * FROM {_quote(serie)}{where} ORDER BY _ativo, _data, rowid', self._conn, params=params)
+        df = df.drop(columns=[c for c in ('_data', 'Ativo') if c in df.columns])
+        df = df.rename(columns={'_ativo': 'Ativo'})
+        return df if raw else apply_schema(df, serie)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
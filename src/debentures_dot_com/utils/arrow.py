@@ -0,0 +1,119 @@
+"""
+Conversion of endpoint results to Arrow tables and polars frames.
+
+Typed columns keep their types: datetime64 becomes timestamp, float64 stays double,
+category becomes a dictionary of strings and text becomes string.
+"""
+import importlib
+from functools import lru_cache
+import pandas as pd
+
+OUTPUTS = ('pandas', 'arrow', 'polars')
+
+
+@lru_cache(maxsize=None)
+def _optional(module:str):
+    # pyarrow and polars are imported on first use, not with the package; None when not installed
+    try:
+        return importlib.import_module(module)
+    except ImportError: # Optional dependencies, see the 'parquet' and 'polars' extras
+        return None
+
+
+def _pyarrow():
+    return _optional('pyarrow')
+
+
+def _polars():
+    return _optional('polars')
+
+
+def _require(output:str):
+    if output in ('arrow', 'polars') and _pyarrow() is None:
+        raise ImportError("Arrow output requires pyarrow: pip install 'debentures-dot-com[parquet]'")
+    if output == 'polars' and _polars() is None:
+        raise ImportError("Polars output requires polars: pip install 'debentures-dot-com[polars]'")
+
+
+def resolve_output(output:str=None) -> str:
+    """
+    Validates the output format of a client, 'pandas' by default.
+    """
+    output = output if isinstance(output, str) else 'pandas'
+    if output not in OUTPUTS:
+        raise ValueError("Parameter 'output' must be 'pandas', 'arrow' or 'polars'.")
+    _require(output)
+    return output
+
+
+def _column_names(columns) -> list:
+    # Arrow needs unique string names; the exports may carry unnamed (NaN) or repeated labels
+    names, vistos = [], set()
+    for i, col in enumerate(columns):
+        name = col if isinstance(col, str) and col else f'coluna_{i}'
+        base, n = name, 1
+        while name in vistos:
+            n += 1
+            name = f'{base}_{n}'
+        vistos.add(name)
+        names.append(name)
+    return names
+
+
+def _array(s:pd.Series):
+    pa = _pyarrow()
+    try:
+        array = pa.array(s, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columns mixing numbers and labels (cells the parsers could not convert) are kept as text
+        array = pa.array(s.astype(object).where(s.notna(), None).map(lambda v: v if v is None else str(v)),
+                         type=pa.string())
+    if pa.types.is_dictionary(array.type):
+        # Same index width for every chunk, so chunks of one endpoint share a schema
+        valores = pa.string() if pa.types.is_large_string(array.type.value_type) else array.type.value_type
+        array = array.cast(pa.dictionary(pa.int32(), valores))
+    elif pa.types.is_large_string(array.type):
+        array = array.cast(pa.string())
+    return array
+
+
+def to_arrow(df:pd.DataFrame):
+    """
+    Converts an endpoint DataFrame to a pyarrow.Table, keeping its column types.
+    """
+    _require('arrow')
+    names = _column_names(df.columns)
+    return _pyarrow().table([_array(df.iloc[:, i]) for i in range(df.shape[1])], names=names)
+
+
+def to_polars(df:pd.DataFrame):
+    """
+    Converts an endpoint DataFrame to a polars.DataFrame, through Arrow.
+    """
+    _require('polars')
+    return _polars().from_arrow(to_arrow(df))
+
+
+def convert_result(result, output:str):
+    """
+    Converts the DataFrames of an endpoint result (a DataFrame or a tuple of them) to the output format.
+    """
+    if output == 'pandas':
+        return result
+    if isinstance(result, tuple):
+        return tuple(convert_result(r, output) for r in result)
+    if not isinstance(result, pd.DataFrame):
+        return result
+    return to_arrow(result) if output == 'arrow' else to_polars(result)
+
+
+def column_values(result, name:str) -> list:
+    """
+    Values of a column of a pandas, Arrow or polars result, or [] when it has no such column.
+    """
+    # Arrow tables name their columns column_names; a result of that type means pyarrow is already loaded
+    columns = result.column_names if hasattr(result, 'column_names') else list(result.columns)
+    if name not in columns:
+        return []
+    values = result[name]
+    return values.to_pylist() if hasattr(values, 'to_pylist') else list(values)
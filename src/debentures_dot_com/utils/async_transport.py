@@ -0,0 +1,332 @@
+import time
+import asyncio
+from functools import partial
+import pandas as pd
+from .cache import ResponseCache
+from .query import Query, LineBuffer, _apparent_encoding, _chunk_frames, _parse, _timed_frames, error_message
+from .events import RequestEvent, emit, count_rows
+from ..exceptions import DebenturesError, ConnectionFailed, RequestTimeout, HTTPStatusError
+from .transport import _ACCEPT_ENCODING
+from .ratelimit import RateLimiter, resolve_rate_limiter, retry_after_seconds
+from .coalesce import SingleFlight, resolve_coalesce, query_key
+
+try:
+    import aiohttp
+except ImportError: # Optional dependency, see the 'async' extra
+    aiohttp = None
+
+
+async def _in_thread(func, *args, **kwargs):
+    # ResponseCache reads and writes SQLite and the disk; run off the event loop so other coroutines keep going
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+
+class AsyncTransport:
+    """
+    Non-blocking counterpart of Transport, built on an aiohttp.ClientSession.
+
+    A bounded semaphore caps the number of requests in flight, so callers can
+    gather hundreds of queries on one event loop without flooding the server.
+    The session is created lazily inside the running loop and recreated if the
+    transport is reused from another loop. Each attempt also goes through the per-host
+    RateLimiter shared with the synchronous transports. Identical queries gathered at the
+    same time share one download and parse (see SingleFlight).
+
+    Args:
+        max_concurrency: Maximum number of requests in flight.
+        limit_per_host: Maximum number of open connections per host.
+        retries: Number of retries for connection errors, timeouts and retryable status codes.
+        backoff_factor: Backoff factor between retries (0.5 -> 0.5s, 1s, 2s, ...).
+        status_forcelist: Status codes that trigger a retry.
+        headers: Extra headers sent with every request.
+        cache: Optional ResponseCache consulted before hitting the network.
+        rate_limiter: RateLimiter to use instead of the shared one, or False to disable rate limiting.
+        coalesce: How concurrent identical queries share their result: 'copy' (default) gives each
+            caller its own copy, and False disables coalescing.
+    """
+
+    def __init__(self, max_concurrency:int=None, limit_per_host:int=None, retries:int=None,
+                 backoff_factor:float=None, status_forcelist:tuple=None, headers:dict=None,
+                 cache:ResponseCache=None, rate_limiter:RateLimiter=None, coalesce:str=None):
+        if aiohttp is None:
+            raise ImportError("AsyncTransport requires aiohttp: pip install 'debentures-dot-com[async]'")
+        self.max_concurrency = max_concurrency if isinstance(max_concurrency, int) else 32
+        self.limit_per_host = limit_per_host if isinstance(limit_per_host, int) else 16
+        self.retries = retries if isinstance(retries, int) else 3
+        self.backoff_factor = backoff_factor if isinstance(backoff_factor, (int, float)) else 0.5
+        self.status_forcelist = tuple(status_forcelist) if status_forcelist else (429, 500, 502, 503, 504)
+        self.headers = {'Accept-Encoding': _ACCEPT_ENCODING}
+        if headers:
+            self.headers.update(headers)
+        self.cache = cache
+        self.rate_limiter = resolve_rate_limiter(rate_limiter)
+        self.single_flight = SingleFlight() if resolve_coalesce(coalesce) else None
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def _ensure_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+            self._semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+            self._loop = loop
+        return self._session
+
+    async def request(self, method:str, url:str, endpoint:str=None, closed:bool=False, headers:dict=None,
+                      data:dict=None, timeout:float=None, event:RequestEvent=None):
+        """
+        Sends a request and returns (status, content, charset, content_type).
+        When an event is given, its status, timings, retries and cache fields are filled in.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(method, url, data)
+            hit = await _in_thread(self.cache.get, key)
+            if event is not None:
+                event.cache = 'miss' if hit is None else 'hit'
+            if hit is not None:
+                if event is not None:
+                    event.status = hit['status']
+                return hit['status'], hit['content'], hit['encoding'], hit['headers'].get('Content-Type', '')
+
+        session = self._ensure_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        host = self.rate_limiter.host(url) if self.rate_limiter is not None else None
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                if host is not None:
+                    await host.acquire_async()
+                ok, espera, pausa = None, 0.0, None
+                inicio = time.perf_counter()
+                try:
+                    async with session.request(method, url, headers=headers, data=data, timeout=client_timeout) as resp:
+                        cabecalho = time.perf_counter()
+                        content = await resp.read()
+                        ok = resp.status not in self.status_forcelist
+                        espera = 0.0 if ok else retry_after_seconds(resp.headers.get('Retry-After'))
+                        if not ok and attempt < self.retries:
+                            attempt += 1
+                            pausa = espera or self.backoff_factor * 2 ** (attempt - 1)
+                        else:
+                            status, charset, content_type = resp.status, resp.charset, resp.headers.get('Content-Type', '')
+                            if event is not None:
+                                event.status, event.retries = status, attempt
+                                event.connect_s = cabecalho - inicio
+                                event.download_s = time.perf_counter() - cabecalho
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    ok = False
+                    if attempt >= self.retries:
+                        if event is not None:
+                            event.retries = attempt
+                        raise
+                    attempt += 1
+                    pausa = self.backoff_factor * 2 ** (attempt - 1)
+                finally:
+                    if host is not None:
+                        host.release(ok=ok, retry_after=espera)
+                if pausa is None:
+                    break
+                # The host slot is free during the backoff, so other coroutines keep using it
+                await asyncio.sleep(pausa)
+
+        if key is not None and 200 <= status < 300:
+            await _in_thread(self.cache.set, key, url, status, charset, {'Content-Type': content_type}, content,
+                             endpoint=endpoint, ttl=self.cache.ttl_for(endpoint, closed))
+        return status, content, charset, content_type
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def _encoding(content:bytes, charset:str, content_type:str) -> str:
+    # Mirrors requests: header charset, ISO-8859-1 for text/* without one, else detection
+    if not charset and 'text' in (content_type or ''):
+        charset = 'ISO-8859-1'
+    return charset or _apparent_encoding(content)
+
+
+def _wrap_error(error:Exception, query:Query) -> DebenturesError:
+    # The DebenturesError for an aiohttp failure, None for other exceptions
+    if isinstance(error, DebenturesError):
+        return error
+    if isinstance(error, asyncio.TimeoutError):
+        return RequestTimeout(f'{type(error).__name__}: {error}', query.endpoint, query.url)
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return ConnectionFailed(f'{type(error).__name__}: {error}', query.endpoint, query.url)
+    return None
+
+
+def _status_error(status:int, query:Query) -> HTTPStatusError:
+    return HTTPStatusError(f'{status} Error for url: {query.url}', query.endpoint, query.url, status=status)
+
+
+async def fetch_query_async(query:Query, transport:AsyncTransport, event:RequestEvent=None) -> tuple:
+    """
+    Downloads the query's response and returns its (content, encoding).
+    Failures are raised as DebenturesError subclasses (see debentures_dot_com.exceptions).
+    """
+    try:
+        status, content, charset, content_type = await transport.request(
+            query.method, query.url, endpoint=query.endpoint, closed=query.closed,
+            headers=query.headers, data=query.data, timeout=query.timeout, event=event,
+        )
+    except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+        raise _wrap_error(e, query) from e
+    if status >= 400:
+        raise _status_error(status, query)
+    if event is not None:
+        event.bytes = len(content)
+    return content, query.encoding or _encoding(content, charset, content_type)
+
+
+async def execute_query_async(query:Query, transport:AsyncTransport):
+    """
+    Async counterpart of execute_query: fetches, parses and types a query and emits its RequestEvent.
+    """
+    event = RequestEvent(query.endpoint, query.url, query.method)
+    inicio = time.perf_counter()
+
+    async def buscar():
+        event.coalesced = False # Only the caller that fetches runs this
+        content, encoding = await fetch_query_async(query, transport, event)
+        parse = time.perf_counter()
+        try:
+            return _parse(query, content, encoding)
+        finally:
+            event.parse_s = time.perf_counter() - parse
+
+    try:
+        if transport.single_flight is None:
+            result = await buscar()
+        else:
+            event.coalesced = True
+            result = await transport.single_flight.do_async(query_key(query), buscar)
+        event.rows = count_rows(result)
+        return result
+    except Exception as e:
+        event.error = e
+        raise
+    finally:
+        event.total_s = time.perf_counter() - inicio
+        emit(event)
+
+
+async def run_query_async(query:Query, transport:AsyncTransport):
+    """
+    Async counterpart of run_query: prints the error and returns an empty DataFrame on failure.
+    """
+    try:
+        return await execute_query_async(query, transport)
+    except Exception as e:
+        print(error_message(e, query.url))
+    return query.finish(pd.DataFrame())
+
+
+async def _stream_blocks(query:Query, transport:AsyncTransport, event:RequestEvent):
+    # (block, charset, content_type) of the body, replayed from the cache or read as it arrives
+    if transport.cache is not None:
+        hit = await _in_thread(transport.cache.get, transport.cache.make_key(query.method, query.url, query.data))
+        event.cache = 'miss' if hit is None else 'hit'
+        if hit is not None:
+            event.status = hit['status']
+            yield hit['content'], hit['encoding'], hit['headers'].get('Content-Type', '')
+            return
+    session = transport._ensure_session()
+    # The timeout bounds each read, as with requests, not the whole download
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=query.timeout, sock_read=query.timeout)
+    host = transport.rate_limiter.host(query.url) if transport.rate_limiter is not None else None
+    async with transport._semaphore:
+        if host is not None:
+            await host.acquire_async()
+        ok = None
+        inicio = time.perf_counter()
+        try:
+            async with session.request(query.method, query.url, headers=query.headers, data=query.data,
+                                       timeout=client_timeout) as resp:
+                event.connect_s, event.status = time.perf_counter() - inicio, resp.status
+                ok = resp.status not in transport.status_forcelist
+                if host is not None:
+                    # Like the synchronous transport, the slot is freed once the headers arrive
+                    host.release(ok=ok, retry_after=0.0 if ok else retry_after_seconds(resp.headers.get('Retry-After')))
+                    host = None
+                if resp.status >= 400:
+                    raise _status_error(resp.status, query)
+                async for block in resp.content.iter_chunked(1 << 16):
+                    yield block, resp.charset, resp.headers.get('Content-Type', '')
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            ok = False
+            raise _wrap_error(e, query) from e
+        finally:
+            if host is not None:
+                host.release(ok=ok)
+
+
+async def iter_query_async(query:Query, transport:AsyncTransport, chunksize:int=None):
+    """
+    Async counterpart of iter_query: an async generator of DataFrames of at most chunksize rows.
+    Streamed responses are not retried nor stored in the cache, and errors are raised.
+    One RequestEvent is emitted when the stream ends, is closed or fails.
+    """
+    splitter = query.chunks(chunksize)
+    linhas, encoding = LineBuffer(), query.encoding
+    event = RequestEvent(query.endpoint, query.url, query.method, streamed=True)
+    inicio = time.perf_counter()
+    event.rows = 0
+    try:
+        async for block, charset, content_type in _stream_blocks(query, transport, event):
+            if not block:
+                continue
+            event.bytes += len(block)
+            encoding = encoding or _encoding(block, charset, content_type)
+            for df in _timed_frames(event, lambda: _chunk_frames(query, splitter, linhas.feed(block), encoding)):
+                yield df
+        for df in _timed_frames(event, lambda: _chunk_frames(query, splitter, linhas.close(), encoding)):
+            yield df
+        for df in _timed_frames(event, lambda: [query.finish(splitter.parse(piece, encoding)) for piece in splitter.close()]):
+            yield df
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            event.error = e
+        raise
+    finally:
+        event.total_s = time.perf_counter() - inicio
+        event.download_s = max(event.total_s - event.connect_s - event.parse_s, 0.0)
+        emit(event)
+
+
+_default_async_transport = None
+
+
+def get_default_async_transport() -> AsyncTransport:
+    """
+    Returns the process-wide AsyncTransport used when no transport is passed explicitly.
+    """
+    global _default_async_transport
+    if _default_async_transport is None:
+        _default_async_transport = AsyncTransport()
+    return _default_async_transport
+
+
+async def _run_raising_async(query:Query, transport:AsyncTransport):
+    try:
+        return await execute_query_async(query, transport), None
+    except Exception as e:
+        return None, e
+
+
+async def run_many_async(queries:list, transport:AsyncTransport) -> list:
+    """
+    Async counterpart of run_many; concurrency is bounded by the transport's semaphore.
+    """
+    return list(await asyncio.gather(*(_run_raising_async(q, transport) for q in queries)))
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlencode
+
+# Default time-to-live, in seconds, of an open window (one that still includes today)
+# for each endpoint. Closed historical windows never expire, see ResponseCache.ttl_for.
+DEFAULT_TTLS = {
+    'lista_deb_publicas': 6 * 3600,
+    'lista_caracteristicas': 6 * 3600,
+    'caracteristicas_debs': 6 * 3600,
+    'pu_historico': 5 * 60,
+    'prazo_medio': 3600,
+    'conversao_permuta': 3600,
+    'estoque_por_ativo': 5 * 60,
+    'estoque_por_periodo': 5 * 60,
+    'estoque_a_vencer': 5 * 60,
+    'estoque_relatorio': 5 * 60,
+    'agenda_eventos': 3600,
+    'pu_eventos': 3600,
+    'arquivo_precos_diario': 5 * 60,
+    'preco_negociacao': 5 * 60,
+    'volume_negociacao': 5 * 60,
+    'volume_por_periodo': 5 * 60,
+    'volume_por_garantia_especie': 5 * 60,
+    'default': 5 * 60,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT,
+    url TEXT,
+    status INTEGER,
+    encoding TEXT,
+    headers TEXT,
+    content BLOB,
+    size INTEGER,
+    created REAL,
+    expires REAL,
+    last_access REAL
+)
+"""
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of raw HTTP responses, stored in a single SQLite file.
+
+    Entries are keyed on the method, the fully built URL and the request body.
+    Each endpoint has its own TTL for windows that still include today, while
+    closed historical windows are kept until evicted. When the stored content
+    grows past max_bytes, the least recently used entries are evicted.
+
+    Args:
+        path: Directory holding the cache file. Defaults to ~/.cache/debentures_dot_com.
+        max_bytes: Size cap of the stored content, in bytes.
+        ttls: Per-endpoint TTL overrides, in seconds, merged over DEFAULT_TTLS.
+    """
+
+    def __init__(self, path:str=None, max_bytes:int=None, ttls:dict=None):
+        path = path if isinstance(path, str) else os.path.join(os.path.expanduser('~'), '.cache', 'debentures_dot_com')
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, 'responses.sqlite')
+        self.max_bytes = max_bytes if isinstance(max_bytes, int) else 512 * 1024 * 1024
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(_SCHEMA)
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)')
+
+    @staticmethod
+    def make_key(method:str, url:str, data=None) -> str:
+        if isinstance(data, dict):
+            body = urlencode(sorted(data.items()))
+        elif isinstance(data, bytes):
+            body = data.decode('latin-1')
+        else:
+            body = data or ''
+        return hashlib.sha256(f'{method.upper()}\n{url}\n{body}'.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, endpoint:str=None, closed:bool=False):
+        """
+        Returns the TTL in seconds for an endpoint, or None (never expires) for closed windows.
+        """
+        if closed:
+            return None
+        return self.ttls.get(endpoint, self.ttls['default'])
+
+    def get(self, key:str):
+        """
+        Returns a dict with the stored response, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT url, status, encoding, headers, content, expires FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            url, status, encoding, headers, content, expires = row
+            if expires is not None and expires < now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+        return {'url': url, 'status': status, 'encoding': encoding, 'headers': json.loads(headers), 'content': content}
+
+    def set(self, key:str, url:str, status:int, encoding:str, headers:dict, content:bytes, endpoint:str=None, ttl:float=None):
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, endpoint, url, status, encoding, json.dumps(headers), content, len(content), now, expires, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._conn.execute('DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?', (time.time(),))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+
+    def clear(self, endpoint:str=None):
+        with self._lock, self._conn:
+            if endpoint is None:
+                self._conn.execute('DELETE FROM responses')
+            else:
+                self._conn.execute('DELETE FROM responses WHERE endpoint = ?', (endpoint,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
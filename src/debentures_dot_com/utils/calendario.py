@@ -0,0 +1,54 @@
+"""
+Offline Brazilian business-day calendar (national holidays, as used by ANBIMA and B3).
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+
+def _pascoa(ano:int) -> date:
+    # Anonymous Gregorian algorithm (Meeus/Jones/Butcher)
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+@lru_cache(maxsize=None)
+def feriados(ano:int) -> frozenset:
+    """
+    National holidays of a year: the fixed dates, plus Carnival (Monday and Tuesday),
+    Good Friday and Corpus Christi, which move with Easter. Black Consciousness Day
+    (Nov 20) is a national holiday since 2024.
+    """
+    fixos = [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (12, 25)]
+    if ano >= 2024:
+        fixos.append((11, 20))
+    pascoa = _pascoa(ano)
+    moveis = [pascoa - timedelta(days=48), pascoa - timedelta(days=47), pascoa - timedelta(days=2),
+              pascoa + timedelta(days=60)]
+    return frozenset([date(ano, m, d) for m, d in fixos] + moveis)
+
+
+def dia_util(dia:date) -> bool:
+    """
+    True when the date is neither a weekend nor a national holiday.
+    """
+    return dia.weekday() < 5 and dia not in feriados(dia.year)
+
+
+def dias_uteis(inicio:date, fim:date) -> list:
+    """
+    Business days in [inicio, fim], in order.
+    """
+    dias, atual = [], inicio
+    while atual <= fim:
+        if dia_util(atual):
+            dias.append(atual)
+        atual += timedelta(days=1)
+    return dias
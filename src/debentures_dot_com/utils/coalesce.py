@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import threading
+from functools import lru_cache
+from .cache import ResponseCache
+
+
+def resolve_coalesce(coalesce:str=None) -> str:
+    """
+    Validates the coalescing mode of a transport: 'copy' (default) or False.
+    """
+    if coalesce is False:
+        return None
+    coalesce = coalesce if isinstance(coalesce, str) else 'copy'
+    if coalesce != 'copy':
+        raise ValueError("Parameter 'coalesce' must be 'copy' or False.")
+    return coalesce
+
+
+@lru_cache(maxsize=None)
+def _copy_on_write() -> bool:
+    # With copy-on-write (always on from pandas 3), a shallow copy is already isolated from the original
+    pd = sys.modules['pandas']
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except Exception:
+        return False
+
+
+def _copy(result):
+    # A DataFrame can only exist once pandas is imported; the transport itself never imports it
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(result, pd.DataFrame):
+        return result.copy(deep=not _copy_on_write())
+    if isinstance(result, tuple):
+        return tuple(_copy(r) for r in result)
+    return result
+
+
+def query_key(query) -> tuple:
+    """
+    What makes two queries the same request with the same result: the request itself
+    (method, URL, body, headers) and how it is parsed (parser, its arguments, post, schema, encoding).
+    """
+    headers = repr(sorted(query.headers.items())) if query.headers else ''
+    return (ResponseCache.make_key(query.method, query.url, query.data), headers, repr(query.parser),
+            repr(sorted(query.parse_kwargs.items())), repr(query.post), query.schema, query.encoding)
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def _retrieve(task:asyncio.Task):
+    # Marks the exception as retrieved, in case every caller of the task was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests: while one is being fetched and parsed, callers
+    of the same request wait for it and share its result instead of downloading it again.
+
+    Only requests in flight are shared; once a result is handed out, the next call fetches
+    again (or hits the ResponseCache). Failures are shared too, so a burst of callers of a
+    failing request raises one error each from a single attempt.
+
+    Every caller but the first gets its own copy of the result (a cheap lazy copy under
+    pandas copy-on-write), so no caller can change the frame another one holds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._tasks = {}
+
+    def do(self, key, fn):
+        """
+        Runs fn() for the first caller of key and returns its result to every caller that
+        arrives while it runs.
+        """
+        with self._lock:
+            voo = self._flights.get(key)
+            lider = voo is None
+            if lider:
+                voo = self._flights[key] = _Flight()
+            else:
+                voo.waiters += 1
+        if not lider:
+            voo.done.wait()
+            if voo.error is not None:
+                raise voo.error
+            return _copy(voo.result)
+        try:
+            voo.result = fn()
+        except BaseException as e:
+            voo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            voo.done.set()
+        # No caller can join after the flight is removed, so waiters is final here
+        return _copy(voo.result) if voo.waiters else voo.result
+
+    async def do_async(self, key, fn):
+        """
+        Async counterpart of do: fn() returns a coroutine, run once as a task shared by the
+        callers of key on the same event loop. A cancelled caller does not cancel the others.
+        """
+        loop = asyncio.get_running_loop()
+        chave = (id(loop), key)
+        entrada = self._tasks.get(chave)
+        if entrada is None:
+            task = loop.create_task(self._run(chave, fn))
+            entrada = self._tasks[chave] = [task, 0]
+            task.add_done_callback(_retrieve)
+        else:
+            entrada[1] += 1
+        task = entrada[0]
+        result = await asyncio.shield(task)
+        return _copy(result) if entrada[1] else result
+
+    async def _run(self, chave, fn):
+        try:
+            return await fn()
+        finally:
+            # Removed before the result is handed out, so waiters is final once the task is done
+            self._tasks.pop(chave, None)
+
+    def __repr__(self):
+        return f'SingleFlight({len(self._flights) + len(self._tasks)} in flight)'
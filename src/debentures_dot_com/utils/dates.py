@@ -0,0 +1,134 @@
+"""
+Date and CNPJ helpers shared by the clients. Kept free of pandas, so the lightweight paths
+(params, records) can use them without loading it.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def _cnpj_digits(cnpj: str) -> str:
+    cnpj_digits = ''.join(filter(str.isdigit, cnpj))
+    
+    if len(cnpj_digits) > 14:
+        return '' # CNPJ too long
+    
+    return cnpj_digits.zfill(14)
+
+def _format_cnpj(cnpj: str) -> str:
+    """
+    Formats a CNPJ string to be 14 digits, padding with leading zeros if necessary.
+    Returns an empty string if the input is not a valid CNPJ (e.g., non-numeric or too long).
+    """
+    if not isinstance(cnpj, str):
+        return ''
+    return _cnpj_digits(cnpj)
+
+# Formats the endpoints receive dates in, tried before falling back to dateutil
+_YYYYMMDD = re.compile(r'(\d{4})(\d{2})(\d{2})')
+_ISO_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_BR_DATE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+
+# Month names as written by the pt_BR locale, so %b and %B do not depend on the host's locales
+_MESES = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho', 'agosto', 'setembro',
+          'outubro', 'novembro', 'dezembro']
+_FORMAT_DIRECTIVE = re.compile(r'%(.)')
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text: str) -> date:
+    text = text.strip()
+    for pattern, order in ((_YYYYMMDD, (0, 1, 2)), (_ISO_DATE, (0, 1, 2)), (_BR_DATE, (2, 1, 0))):
+        match = pattern.fullmatch(text)
+        if match:
+            partes = match.groups()
+            try:
+                return date(*(int(partes[i]) for i in order))
+            except ValueError:
+                return None
+    try:
+        # Ambiguous dates such as 01/02/2020 are read day first, as written in Brazil
+        from dateutil import parser
+        return parser.parse(text, dayfirst=True).date()
+    except (ValueError, OverflowError):
+        return None
+
+def _month_names(dia: date, dtfmt: str) -> str:
+    def directive(match):
+        if match.group(1) == 'B':
+            return _MESES[dia.month - 1]
+        if match.group(1) == 'b':
+            return _MESES[dia.month - 1][:3]
+        return match.group(0)
+    return _FORMAT_DIRECTIVE.sub(directive, dtfmt)
+
+@lru_cache(maxsize=4096)
+def _format_date_text(date_input, dtfmt: str) -> str:
+    parsed = date_input if isinstance(date_input, date) else _parse_date_text(date_input)
+    if parsed is None:
+        return '' # Invalid date format
+    return parsed.strftime(_month_names(parsed, dtfmt))
+
+def _format_date_for_url(date_input: str, dtfmt:str = None, locale_:str = None) -> str:
+    """
+    Converts a date (a date object or a string in various formats) to DD%2FMM%2FYYYY, or
+    to the dtfmt format, for URL usage. Returns an empty string if the date cannot be parsed.
+
+    YYYYMMDD, YYYY-MM-DD and DD/MM/YYYY are read directly; other strings go through dateutil,
+    day first. Month names (%b, %B) are written in Portuguese without touching the process
+    locale, so the function is safe to call from many threads; locale_ is kept for
+    compatibility and ignored.
+    """
+    if dtfmt is None:
+        dtfmt = '%d%%2F%m%%2F%Y'
+    if isinstance(date_input, date):
+        return _format_date_text(date_input, dtfmt)
+    if not isinstance(date_input, str) or not date_input:
+        return ''
+    return _format_date_text(date_input, dtfmt)
+    
+def _parse_date(date_input: str) -> date:
+    """
+    Parses a date in the formats accepted by _format_date_for_url. Returns None if it cannot be parsed.
+    """
+    if isinstance(date_input, datetime):
+        return date_input.date()
+    if isinstance(date_input, date):
+        return date_input
+    if not isinstance(date_input, str) or not date_input:
+        return None
+    return _parse_date_text(date_input)
+
+def _is_past_date(date_input: str) -> bool:
+    """
+    Returns True when the date is strictly before today, i.e. a window ending there is closed
+    and its data will not change anymore. Empty or unparseable dates count as open.
+    """
+    parsed = _parse_date(date_input)
+    return parsed is not None and parsed < date.today()
+
+_CHUNKS = {'month': 1, 'quarter': 3, 'year': 12}
+
+def split_window(dt_ini: str, dt_fim: str, chunk: str) -> list:
+    """
+    Splits the [dt_ini, dt_fim] range into calendar aligned windows of a month, a quarter or a year.
+
+    Returns a list of (start, end) pairs formatted as YYYYMMDD, covering the range without overlap.
+    """
+    if chunk not in _CHUNKS:
+        raise ValueError("Parameter 'chunk' must be 'month', 'quarter' or 'year'.")
+    inicio, fim = _parse_date(dt_ini), _parse_date(dt_fim)
+    if inicio is None or fim is None:
+        raise ValueError("Chunked queries need valid 'dt_ini' and 'dt_fim' dates.")
+    meses = _CHUNKS[chunk]
+    janelas = []
+    atual = inicio
+    while atual <= fim:
+        # First month of the window containing 'atual', then the first day after the window
+        mes0 = (atual.month - 1) // meses * meses
+        ano, mes = divmod(mes0 + meses, 12)
+        proxima = date(atual.year + ano, mes + 1, 1)
+        ultimo = min(fim, proxima - timedelta(days=1))
+        janelas.append((atual.strftime('%Y%m%d'), ultimo.strftime('%Y%m%d')))
+        atual = proxima
+    return janelas
@@ -0,0 +1,110 @@
+import time
+import warnings
+import threading
+
+
+class RequestEvent:
+    """
+    What happened to one request on the fetch path, handed to every hook when it finishes.
+
+    Attributes:
+        endpoint: Name of the endpoint method.
+        url: URL of the request.
+        method: HTTP method.
+        status: HTTP status of the answer, None when no answer arrived.
+        bytes: Size of the response body.
+        connect_s: Seconds until the response headers arrived: connection, retries and the server's wait.
+        download_s: Seconds reading the body after the headers.
+        parse_s: Seconds parsing and typing the body.
+        total_s: Seconds of the whole request.
+        retries: Retries made by the transport.
+        cache: 'hit' or 'miss', None when the transport has no cache.
+        rows: Rows of the result (summed over the chunks of the iter_* methods).
+        streamed: True for the iter_* methods.
+        coalesced: True when the request joined an identical one in flight instead of fetching (see SingleFlight).
+        error: The DebenturesError (or other exception) of a failed request, None on success.
+        started: Wall clock time (time.time()) when the request started.
+    """
+
+    __slots__ = ('endpoint', 'url', 'method', 'status', 'bytes', 'connect_s', 'download_s', 'parse_s', 'total_s',
+                 'retries', 'cache', 'rows', 'streamed', 'coalesced', 'error', 'started')
+
+    def __init__(self, endpoint:str, url:str, method:str='GET', streamed:bool=False):
+        self.endpoint = endpoint
+        self.url = url
+        self.method = method
+        self.status = None
+        self.bytes = 0
+        self.connect_s = 0.0
+        self.download_s = 0.0
+        self.parse_s = 0.0
+        self.total_s = 0.0
+        self.retries = 0
+        self.cache = None
+        self.rows = None
+        self.streamed = streamed
+        self.coalesced = False
+        self.error = None
+        self.started = time.time()
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def as_dict(self) -> dict:
+        d = {k: getattr(self, k) for k in self.__slots__ if k != 'error'}
+        d['error'] = None if self.error is None else f'{type(self.error).__name__}: {self.error}'
+        return d
+
+    def __repr__(self):
+        estado = 'ok' if self.ok else type(self.error).__name__
+        return f'RequestEvent({self.endpoint!r}, {estado}, {self.total_s:.3f}s)'
+
+
+def count_rows(result):
+    """
+    Rows of an endpoint result: a pandas, Arrow or polars frame, a list of records, a tuple of them or None.
+    """
+    # Frames are recognised by their shape, so that counting never imports pandas
+    if hasattr(result, 'shape') or isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return sum(len(r) for r in result if hasattr(r, 'shape') or isinstance(r, list))
+    return None
+
+
+_hooks = ()
+_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """
+    Registers a function called with the RequestEvent of every request of the process.
+    Hooks run on the thread (or event loop) that made the request, so they should be quick.
+    Returns the hook, so it can be used as a decorator.
+    """
+    global _hooks
+    with _lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook):
+    """
+    Unregisters a hook added with add_hook; unknown hooks are ignored.
+    Hooks are compared by equality, like add_hook does, so a bound method such as
+    lista.append is removed even though each access creates a new method object.
+    """
+    global _hooks
+    with _lock:
+        _hooks = tuple(h for h in _hooks if h != hook)
+
+
+def emit(event:RequestEvent):
+    for hook in _hooks:
+        try:
+            hook(event)
+        except Exception as e:
+            # A broken hook must not turn a successful request into a failed one
+            warnings.warn(f'Request hook {hook!r} failed: {type(e).__name__}: {e}', RuntimeWarning)
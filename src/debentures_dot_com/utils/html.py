@@ -0,0 +1,52 @@
+import io
+
+try:
+    from lxml import etree
+except ImportError: # Optional dependency, see the 'lxml' extra
+    etree = None
+
+
+def _has_class(element, class_:str) -> bool:
+    return class_ in (element.get('class') or '').split()
+
+
+def find_tables(content:bytes, encoding:str, classes:list) -> dict:
+    """
+    Streams the page through lxml's HTML parser and returns the first table of each class,
+    stopping as soon as all of them are closed, so the rest of the page is never parsed.
+
+    Returns None when lxml is not installed or cannot read the page; callers then fall
+    back to BeautifulSoup. Classes without a matching table are left out of the result.
+    """
+    if etree is None:
+        return None
+    abertas, tabelas = {}, {}
+    try:
+        for event, element in etree.iterparse(io.BytesIO(content), events=('start', 'end'), tag='table',
+                                              html=True, encoding=encoding):
+            if event == 'start':
+                # Attributes are known on 'start', so nested tables keep document order like soup.find
+                for class_ in classes:
+                    if class_ not in abertas and _has_class(element, class_):
+                        abertas[class_] = element
+            else:
+                tabelas.update((c, t) for c, t in abertas.items() if t is element)
+                if len(tabelas) == len(set(classes)):
+                    break
+    except (etree.LxmlError, LookupError, ValueError):
+        return None
+    if any(t.find('.//script') is not None or t.find('.//style') is not None for t in tabelas.values()):
+        return None # BeautifulSoup leaves script and style text out of get_text
+    return tabelas
+
+
+def cell_text(element) -> str:
+    # Same result as BeautifulSoup's get_text(strip=True): every text node stripped, empty ones skipped
+    return ''.join(s.strip() for s in element.itertext())
+
+
+def row_texts(table, tags:tuple=('td',)) -> list:
+    """
+    Returns the stripped text of the cells of every row of the table, nested rows included.
+    """
+    return [[cell_text(cell) for cell in row.iter(*tags)] for row in table.iter('tr')]
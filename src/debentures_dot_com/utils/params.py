@@ -0,0 +1,104 @@
+"""
+Declarative query string parameters of the endpoints.
+
+Each endpoint lists its parameters once, as a ParamSpec, instead of coercing every
+argument by hand and pasting them into an f-string. Specs are immutable and the date and
+CNPJ normalization they use is cached and locale-free, so a spec can be compiled from
+many threads at once.
+"""
+from .dates import _format_cnpj, _format_date_for_url
+
+_KINDS = ('text', 'bool', 'int', 'year', 'cnpj', 'date', 'choice', 'const')
+
+
+class Param:
+    """
+    One query string parameter.
+
+    Args:
+        key: Name of the parameter in the query string.
+        arg: Name of the method argument it comes from, the key itself by default.
+        kind: How the argument is normalized:
+            'text' keeps strings, 'bool' and 'int' keep values of that type,
+            'year' accepts an int or a string, 'cnpj' pads the digits to 14 (see _format_cnpj),
+            'date' formats the date with fmt (see _format_date_for_url),
+            'choice' only accepts one of choices and 'const' always writes the default.
+        default: Value written when the argument is missing or of another type.
+        fmt: strftime format of 'date' parameters, DD%2FMM%2FYYYY by default.
+        choices: Accepted values of a 'choice' parameter; others raise ValueError.
+        template: How the value is written, e.g. '{},%20' to append a suffix.
+    """
+
+    __slots__ = ('key', 'arg', 'kind', 'default', 'fmt', 'choices', 'template')
+
+    def __init__(self, key:str, arg:str=None, kind:str='text', default='', fmt:str=None, choices:tuple=None,
+                 template:str='{}'):
+        if kind not in _KINDS:
+            raise ValueError(f"Parameter kind must be one of {', '.join(_KINDS)}.")
+        self.key = key
+        self.arg = arg if isinstance(arg, str) else key
+        self.kind = kind
+        self.default = default
+        self.fmt = fmt
+        self.choices = tuple(choices) if choices else ()
+        self.template = template
+
+    def value(self, args:dict) -> str:
+        valor = args.get(self.arg)
+        kind = self.kind
+        if kind == 'text':
+            valor = valor if isinstance(valor, str) else self.default
+        elif kind == 'bool':
+            valor = valor if isinstance(valor, bool) else self.default
+        elif kind == 'int':
+            valor = valor if isinstance(valor, int) else self.default
+        elif kind == 'year':
+            valor = valor if isinstance(valor, (int, str)) else self.default
+        elif kind == 'cnpj':
+            valor = _format_cnpj(valor) if valor else self.default
+        elif kind == 'date':
+            valor = _format_date_for_url(valor, self.fmt) if valor else self.default
+        elif kind == 'choice':
+            if valor is not None and valor not in self.choices:
+                opcoes = ' or '.join(str(c) for c in self.choices)
+                raise ValueError(f"Parameter '{self.arg}' must be {opcoes}.")
+            valor = valor if isinstance(valor, int) else self.default
+        else:
+            valor = self.default
+        return self.template.format(valor)
+
+
+class ParamSpec:
+    """
+    The page and the ordered query string parameters of an endpoint.
+
+    Args:
+        path: Page of the endpoint, relative to the client's root URL.
+        params: Param objects, or plain names for text parameters whose key is the argument name.
+    """
+
+    __slots__ = ('path', 'params')
+
+    def __init__(self, path:str, params:list):
+        self.path = path
+        self.params = tuple(p if isinstance(p, Param) else Param(p) for p in params)
+
+    def values(self, args:dict) -> dict:
+        """
+        Normalized parameters, keyed by their query string names, e.g. for a form body.
+
+        Args:
+            args: Arguments of the endpoint method, usually locals().
+        """
+        return {p.key: p.value(args) for p in self.params}
+
+    def url(self, root:str, args:dict) -> str:
+        """
+        Final URL of the endpoint for the given arguments.
+
+        Args:
+            root: Root URL of the client.
+            args: Arguments of the endpoint method, usually locals().
+        """
+        query = '&'.join(f'{p.key}={p.value(args)}' for p in self.params)
+        return f'{root}/{self.path}?{query}'
@@ -0,0 +1,385 @@
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .transport import Transport, _resolve_transport
+from .events import RequestEvent, emit, count_rows
+from .coalesce import query_key
+from ..exceptions import ConnectionFailed, RequestTimeout, HTTPStatusError, ParseError, wrap_error
+from .schemas import apply_schema
+from .arrow import convert_result
+
+
+def bytes_parser(func):
+    """
+    Marks a parser that reads the raw response bytes (and receives encoding=) instead of decoded text.
+    """
+    func.reads_bytes = True
+    return func
+
+
+def _apparent_encoding(content:bytes) -> str:
+    chardet = getattr(requests.compat, 'chardet', None)
+    if chardet is not None:
+        return chardet.detect(content)['encoding'] or 'utf-8'
+    return 'utf-8'
+
+
+def decode_body(content:bytes, encoding:str=None) -> str:
+    """
+    Decodes a response body the way requests' Response.text does.
+    """
+    try:
+        return str(content, encoding or _apparent_encoding(content), errors='replace')
+    except LookupError:
+        return str(content, 'utf-8', errors='replace')
+
+
+class Query:
+    """
+    Description of a single endpoint request: what to fetch and how to turn it into a result.
+
+    Endpoint methods build a Query and hand it to their client's _run, so the same
+    description can be executed by the blocking or the asyncio transport.
+
+    Args:
+        endpoint: Name of the endpoint method (used for cache TTLs).
+        url: Fully built URL.
+        parser: Module-level function turning the response text (or bytes, see bytes_parser) into a DataFrame.
+        parse_kwargs: Extra keyword arguments for the parser.
+        method: HTTP method.
+        headers: Extra request headers.
+        data: Request body (form data).
+        timeout: Request timeout in seconds, 10 when not given.
+        closed: True when the queried window ended before today.
+        encoding: Forces the response text encoding (e.g. 'ISO-8859-1').
+        post: Optional function applied to the parsed DataFrame.
+        schema: Name of the SCHEMAS entry typing the result, None to keep the text columns.
+    """
+
+    __slots__ = ('endpoint', 'url', 'parser', 'parse_kwargs', 'method', 'headers', 'data',
+                 'timeout', 'closed', 'encoding', 'post', 'schema')
+
+    def __init__(self, endpoint:str, url:str, parser, parse_kwargs:dict=None, method:str=None, headers:dict=None,
+                 data:dict=None, timeout:int=None, closed:bool=False, encoding:str=None, post=None, schema:str=None):
+        self.endpoint = endpoint
+        self.url = url
+        self.parser = parser
+        self.parse_kwargs = parse_kwargs if isinstance(parse_kwargs, dict) else {}
+        self.method = method if isinstance(method, str) else 'GET'
+        self.headers = headers
+        self.data = data
+        self.timeout = timeout if isinstance(timeout, (int, float)) else 10
+        self.closed = closed
+        self.encoding = encoding
+        self.post = post
+        self.schema = schema
+
+    def parse(self, content:bytes, encoding:str=None) -> pd.DataFrame:
+        if getattr(self.parser, 'reads_bytes', False):
+            return self.parser(content, encoding=encoding, **self.parse_kwargs)
+        return self.parser(decode_body(content, encoding), **self.parse_kwargs)
+
+    def chunks(self, chunksize:int=None):
+        """
+        Splitter cutting the response into pieces of about chunksize rows that the parser reads
+        on their own (see iter_query). Raises ValueError when the parser cannot be streamed.
+        """
+        splitter = getattr(self.parser, 'chunks', None)
+        if splitter is None:
+            raise ValueError(f"Endpoint '{self.endpoint}' cannot be streamed.")
+        chunksize = chunksize if isinstance(chunksize, int) and chunksize > 0 else 50000
+        return splitter(chunksize, **self.parse_kwargs)
+
+    def finish(self, df:pd.DataFrame):
+        df = self.post(df) if self.post is not None else df
+        return apply_schema(df, self.schema) if self.schema is not None else df
+
+    def __repr__(self):
+        return f'Query({self.endpoint!r}, {self.url!r})'
+
+
+def fetch_query(query:Query, transport:Transport=None, event:RequestEvent=None) -> tuple:
+    """
+    Downloads the query's response and returns its (content, encoding).
+    Failures are raised as DebenturesError subclasses (see debentures_dot_com.exceptions).
+    """
+    try:
+        response = _resolve_transport(transport).request(
+            query.method, query.url, headers=query.headers, data=query.data, timeout=query.timeout,
+            endpoint=query.endpoint, closed=query.closed, event=event,
+        )
+        if query.encoding:
+            response.encoding = query.encoding
+        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+    except requests.exceptions.RequestException as e:
+        raise wrap_error(e, query.endpoint, query.url) from e
+    if event is not None:
+        event.bytes = len(response.content)
+    return response.content, response.encoding or response.apparent_encoding
+
+
+def _parse(query:Query, content:bytes, encoding:str):
+    try:
+        df = query.parse(content, encoding)
+    except Exception as e:
+        raise ParseError(f'{type(e).__name__}: {e}', query.endpoint, query.url) from e
+    return query.finish(df)
+
+
+def execute_query(query:Query, transport:Transport=None):
+    """
+    Fetches, parses and types a query, emitting its RequestEvent to the hooks (see add_hook).
+    Identical queries in flight on other threads are joined instead of fetched again (see
+    SingleFlight). Failures are raised as DebenturesError subclasses.
+    """
+    transport = _resolve_transport(transport)
+    event = RequestEvent(query.endpoint, query.url, query.method)
+    inicio = time.perf_counter()
+
+    def buscar():
+        event.coalesced = False # Only the caller that fetches runs this
+        content, encoding = fetch_query(query, transport, event)
+        parse = time.perf_counter()
+        try:
+            return _parse(query, content, encoding)
+        finally:
+            event.parse_s = time.perf_counter() - parse
+
+    try:
+        if transport.single_flight is None:
+            result = buscar()
+        else:
+            event.coalesced = True
+            result = transport.single_flight.do(query_key(query), buscar)
+        event.rows = count_rows(result)
+        return result
+    except Exception as e:
+        event.error = e
+        raise
+    finally:
+        event.total_s = time.perf_counter() - inicio
+        emit(event)
+
+
+_LABELS = ((ConnectionFailed, 'Connection Error'), (RequestTimeout, 'Timeout Error'), (HTTPStatusError, 'HTTP Error'))
+
+
+def error_message(error:Exception, url:str) -> str:
+    for tipo, label in _LABELS:
+        if isinstance(error, tipo):
+            return f"{label} for {url}: {error}"
+    return f"An unexpected error occurred for {url}: {error}"
+
+
+def run_query(query:Query, transport:Transport=None):
+    """
+    Fetches and parses a query, printing the error and returning an empty DataFrame on failure.
+    """
+    try:
+        return execute_query(query, transport)
+    except Exception as e:
+        print(error_message(e, query.url))
+    return query.finish(pd.DataFrame())
+
+
+class LineBuffer:
+    """
+    Cuts the blocks of a streamed body into lines, each ending with a line break.
+    """
+
+    def __init__(self):
+        self._resto = b''
+
+    def feed(self, block:bytes) -> list:
+        linhas = (self._resto + block).split(b'\n')
+        self._resto = linhas.pop()
+        return [l + b'\n' for l in linhas]
+
+    def close(self) -> list:
+        resto, self._resto = self._resto, b''
+        return [resto + b'\n'] if resto else []
+
+
+def _chunk_frames(query:Query, splitter, linhas:list, encoding:str) -> list:
+    return [query.finish(splitter.parse(piece, encoding)) for linha in linhas for piece in splitter.feed(linha)]
+
+
+def iter_query(query:Query, transport:Transport=None, chunksize:int=None):
+    """
+    Streams the query's response and yields its result as DataFrames of at most chunksize
+    rows (50000 by default), so only one chunk of the body is held in memory at a time.
+
+    Each chunk goes through the query's post-processing and schema on its own. Streamed
+    responses are not stored in the cache. Errors are raised instead of printed, since
+    a consumer writing the chunks out could not tell a truncated export from a whole one.
+    One RequestEvent is emitted when the stream ends, is closed or fails.
+    """
+    splitter = query.chunks(chunksize)
+    event = RequestEvent(query.endpoint, query.url, query.method, streamed=True)
+    inicio = time.perf_counter()
+    event.rows = 0
+    try:
+        try:
+            response = _resolve_transport(transport).request(
+                query.method, query.url, headers=query.headers, data=query.data, timeout=query.timeout,
+                endpoint=query.endpoint, closed=query.closed, stream=True, event=event,
+            )
+        except requests.exceptions.RequestException as e:
+            raise wrap_error(e, query.endpoint, query.url) from e
+        with response:
+            try:
+                response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+            except requests.exceptions.HTTPError as e:
+                raise wrap_error(e, query.endpoint, query.url) from e
+            encoding = query.encoding or response.encoding
+            linhas = LineBuffer()
+            for block in _iter_content(response, query):
+                if not block:
+                    continue
+                event.bytes += len(block)
+                # Without a declared charset, detect it on the first block instead of the whole body
+                encoding = encoding or _apparent_encoding(block)
+                yield from _timed_frames(event, lambda: _chunk_frames(query, splitter, linhas.feed(block), encoding))
+            yield from _timed_frames(event, lambda: _chunk_frames(query, splitter, linhas.close(), encoding))
+            yield from _timed_frames(event, lambda: [query.finish(splitter.parse(piece, encoding)) for piece in splitter.close()])
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            event.error = e
+        raise
+    finally:
+        event.total_s = time.perf_counter() - inicio
+        event.download_s = max(event.total_s - event.connect_s - event.parse_s, 0.0)
+        emit(event)
+
+
+def _iter_content(response, query:Query):
+    try:
+        yield from response.iter_content(chunk_size=1 << 16)
+    except requests.exceptions.RequestException as e:
+        raise wrap_error(e, query.endpoint, query.url) from e
+
+
+def _timed_frames(event:RequestEvent, build) -> list:
+    # Parses the pieces ready so far; only the parse is timed, not the consumer of the yielded frames
+    inicio = time.perf_counter()
+    try:
+        frames = build()
+    except Exception as e:
+        raise ParseError(f'{type(e).__name__}: {e}', event.endpoint, event.url) from e
+    finally:
+        event.parse_s += time.perf_counter() - inicio
+    event.rows += sum(len(df) for df in frames)
+    return frames
+
+
+def _run_raising(query:Query, transport:Transport=None):
+    try:
+        return execute_query(query, transport), None
+    except Exception as e:
+        return None, e
+
+
+def run_many(queries:list, transport:Transport=None, max_workers:int=None) -> list:
+    """
+    Runs queries concurrently on a bounded thread pool sharing one transport.
+
+    Returns, in the order of the queries, a (result, error) pair per query: error is
+    None on success and the raised exception otherwise, so callers can tell an empty
+    answer from a failed one.
+    """
+    max_workers = max_workers if isinstance(max_workers, int) else 8
+    transport = _resolve_transport(transport)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda q: _run_raising(q, transport), queries))
+
+
+def concat_windows(frames: list) -> pd.DataFrame:
+    """
+    Concatenates per-window results in order. split_window produces windows without
+    overlap, so every row is kept, including rows equal to ones of the previous window.
+    """
+    resultado = [df for df in frames if df is not None and not df.empty]
+    if not resultado:
+        return pd.DataFrame()
+    return pd.concat(resultado, ignore_index=True)
+
+
+def _pop_schema(queries:list) -> str:
+    # Merged results are typed once after concatenation, so categories span every part
+    schema = queries[0].schema if queries else None
+    for query in queries:
+        query.schema = None
+    return schema
+
+
+def _windows_result(queries:list, results:list, schema:str=None) -> pd.DataFrame:
+    frames = []
+    for query, (df, erro) in zip(queries, results):
+        if erro is not None:
+            print(f"Window failed for {query.url}: {type(erro).__name__}: {erro}")
+            continue
+        frames.append(df)
+    df = concat_windows(frames)
+    return apply_schema(df, schema) if schema is not None else df
+
+
+def resolve_errors(errors:str=None) -> str:
+    """
+    Validates the error handling of a client: 'print' (default) or 'raise'.
+    """
+    errors = errors if isinstance(errors, str) else 'print'
+    if errors not in ('print', 'raise'):
+        raise ValueError("Parameter 'errors' must be 'print' or 'raise'.")
+    return errors
+
+
+class QueryClient:
+    """
+    Base of the endpoint classes: executes Query objects through the client's transport.
+
+    The asyncio clients override _run and _run_windows, so endpoint methods written
+    against this interface work unchanged in both flavours.
+
+    Results are typed by the endpoint's schema (datetime64, float64, category) unless
+    the client was created with raw=True, which keeps the text columns of the exports.
+    With output='arrow' or 'polars', results are returned as pyarrow.Table or polars.DataFrame.
+    With errors='raise', failed requests raise instead of printing the error and returning
+    an empty DataFrame, so callers can tell a failure from an empty answer.
+    """
+
+    raw = False
+    output = 'pandas'
+    errors = 'print'
+
+    def _schema(self, name:str) -> str:
+        return None if self.raw else name
+
+    def _output(self, result):
+        return convert_result(result, self.output)
+
+    def _check(self, results:list):
+        if self.errors == 'raise':
+            for _, erro in results:
+                if erro is not None:
+                    raise erro
+
+    def _run(self, query:Query):
+        if self.errors == 'raise':
+            results = [_run_raising(query, self.transport)]
+            self._check(results)
+            return self._output(results[0][0])
+        return self._output(run_query(query, self.transport))
+
+    def _run_windows(self, queries:list, max_workers:int=None) -> pd.DataFrame:
+        """
+        Runs the per-window queries of a chunked request concurrently and concatenates them in order.
+        Failed windows are reported and left out, or raised with errors='raise'.
+        """
+        schema = _pop_schema(queries)
+        results = run_many(queries, self.transport, max_workers)
+        self._check(results)
+        return self._output(_windows_result(queries, results, schema))
+
+    def _iter(self, query:Query, chunksize:int=None):
+        return (self._output(df) for df in iter_query(query, self.transport, chunksize))
@@ -0,0 +1,238 @@
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+
+
+def retry_after_seconds(value) -> float:
+    """
+    Seconds to wait from a Retry-After header, given in seconds or as an HTTP date; 0 when absent or invalid.
+    """
+    if value is None:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return 0.0
+
+
+class HostLimiter:
+    """
+    Token bucket and adaptive concurrency window for one host.
+
+    Requests take a token (refilled at `rate` per second, up to `burst`) and a slot among
+    `concurrency` requests in flight. Both limits follow additive increase / multiplicative
+    decrease: a throttling signal (429, 5xx, timeout) halves them, at most once per
+    `cooldown` seconds, and every `concurrency` healthy answers in a row raise the window
+    by one and the rate by 10%. A Retry-After pauses every request to the host until it passes.
+    """
+
+    def __init__(self, rate:float, burst:float, concurrency:int, min_concurrency:int, max_concurrency:int,
+                 min_rate:float, max_rate:float, cooldown:float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.concurrency = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.cooldown = cooldown
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self._last = time.monotonic()
+        self._last_decrease = 0.0
+        self._healthy = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now:float):
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _try_acquire(self) -> float:
+        # Takes a token and a slot and returns 0, or returns how long to wait before trying again
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return 0.05 # Woken by release() in the threaded path; polled by the async one
+        self._refill(now)
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        self.requests += 1
+        return 0.0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                espera = self._try_acquire()
+                if not espera:
+                    return
+                self._cond.wait(espera)
+
+    async def acquire_async(self):
+        while True:
+            with self._cond:
+                espera = self._try_acquire()
+            if not espera:
+                return
+            await asyncio.sleep(espera)
+
+    def release(self, ok:bool=True, retry_after:float=0.0):
+        """
+        Frees the slot of a finished request. ok=False reports a throttling signal and
+        ok=None an outcome that says nothing about the host's load.
+        """
+        with self._cond:
+            self.in_flight = max(self.in_flight - 1, 0)
+            self._feedback(ok, retry_after)
+            self._cond.notify_all()
+
+    def penalize(self, retry_after:float=0.0):
+        """
+        Reports a throttling signal of an attempt that is retried without releasing its slot.
+        """
+        with self._cond:
+            self._feedback(False, retry_after)
+
+    def _feedback(self, ok:bool, retry_after:float):
+        now = time.monotonic()
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if ok is None:
+            return
+        if ok:
+            self._healthy += 1
+            if self._healthy >= int(self.concurrency):
+                self._healthy = 0
+                self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+                self.rate = min(self.rate * 1.1, self.max_rate)
+            return
+        self.throttled += 1
+        self._healthy = 0
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self.concurrency = max(self.concurrency / 2, self.min_concurrency)
+            self.rate = max(self.rate / 2, self.min_rate)
+            self.tokens = min(self.tokens, 1.0)
+
+
+class RateLimiter:
+    """
+    Per-host rate limiting shared by transports, so every client talking to the same host
+    (debentures.com.br, anbima.com.br, ...) draws from the same budget.
+
+    Each host gets a HostLimiter: a token bucket that spaces requests and a window that caps
+    the requests in flight. Both shrink when the host answers 429/5xx or times out, grow back
+    while answers are healthy, and Retry-After headers pause the host for the requested time.
+
+    Args:
+        rate: Initial requests per second per host.
+        burst: Tokens that can be spent at once after an idle period.
+        concurrency: Initial number of requests in flight per host.
+        min_concurrency: Floor of the concurrency window.
+        max_concurrency: Ceiling of the concurrency window.
+        min_rate: Floor of the rate, in requests per second.
+        max_rate: Ceiling of the rate, in requests per second.
+        cooldown: Minimum seconds between two decreases, so one burst of errors halves the limits once.
+        hosts: Per-host overrides of the arguments above, e.g. {'www.anbima.com.br': {'rate': 2}}.
+    """
+
+    def __init__(self, rate:float=None, burst:float=None, concurrency:int=None, min_concurrency:int=None,
+                 max_concurrency:int=None, min_rate:float=None, max_rate:float=None, cooldown:float=None,
+                 hosts:dict=None):
+        self.defaults = {
+            'rate': rate if isinstance(rate, (int, float)) else 20.0,
+            'burst': burst if isinstance(burst, (int, float)) else 20.0,
+            'concurrency': concurrency if isinstance(concurrency, int) else 8,
+            'min_concurrency': min_concurrency if isinstance(min_concurrency, int) else 1,
+            'max_concurrency': max_concurrency if isinstance(max_concurrency, int) else 64,
+            'min_rate': min_rate if isinstance(min_rate, (int, float)) else 0.5,
+            'max_rate': max_rate if isinstance(max_rate, (int, float)) else 200.0,
+            'cooldown': cooldown if isinstance(cooldown, (int, float)) else 1.0,
+        }
+        self.overrides = dict(hosts or {})
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url:str) -> HostLimiter:
+        """
+        The HostLimiter of a URL's host (or of a bare host name).
+        """
+        nome = (urlsplit(url).hostname if '//' in url else url).lower()
+        limiter = self._hosts.get(nome)
+        if limiter is None:
+            with self._lock:
+                limiter = self._hosts.get(nome)
+                if limiter is None:
+                    limiter = self._hosts[nome] = HostLimiter(**{**self.defaults, **self.overrides.get(nome, {})})
+        return limiter
+
+    def stats(self) -> 'pd.DataFrame':
+        """
+        Current limits and counters of every host seen so far.
+        """
+        import pandas as pd
+        return pd.DataFrame([
+            {'Host': nome, 'Taxa': round(h.rate, 2), 'Concorrencia': int(h.concurrency), 'Em curso': h.in_flight,
+             'Requisicoes': h.requests, 'Limitadas': h.throttled}
+            for nome, h in list(self._hosts.items())
+        ], columns=['Host', 'Taxa', 'Concorrencia', 'Em curso', 'Requisicoes', 'Limitadas'])
+
+
+class LimitedRetry(Retry):
+    """
+    urllib3 Retry that reports every retried throttling answer or timeout to the RateLimiter,
+    so the limits shrink while the adapter is still retrying instead of after the last attempt.
+    """
+
+    def __init__(self, *args, rate_limiter:RateLimiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.rate_limiter = self.rate_limiter
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        throttled = error is not None or (response is not None and response.status in (self.status_forcelist or ()))
+        if self.rate_limiter is not None and _pool is not None and throttled:
+            espera = retry_after_seconds(response.headers.get('Retry-After')) if response is not None else 0.0
+            self.rate_limiter.host(_pool.host).penalize(espera)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+_default_rate_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide RateLimiter used by transports created without one.
+    """
+    global _default_rate_limiter
+    if _default_rate_limiter is None:
+        with _default_lock:
+            if _default_rate_limiter is None:
+                _default_rate_limiter = RateLimiter()
+    return _default_rate_limiter
+
+
+def resolve_rate_limiter(rate_limiter=None):
+    """
+    The shared RateLimiter when none is given, or None when rate limiting is disabled with False.
+    """
+    if rate_limiter is False:
+        return None
+    return rate_limiter if isinstance(rate_limiter, RateLimiter) else get_default_rate_limiter()
@@ -0,0 +1,150 @@
+import re
+import unicodedata
+import pandas as pd
+
+# Placeholders the exports use for an empty cell
+_MISSING = ['', '-', '--', 'N/D', 'n/d', 'ND']
+
+
+def normalize_name(name) -> str:
+    """
+    Lower-cased, accent-free, single spaced version of a column name, so schemas match
+    labels such as 'Prêmio' even when the page was decoded with the wrong code page ('Pręmio').
+    """
+    if not isinstance(name, str):
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name).split())
+
+
+class Schema:
+    """
+    Column types of one endpoint, given as regular expressions matched against the
+    normalized column names (see normalize_name).
+
+    Args:
+        dates: Columns holding dd/mm/yyyy dates, converted to datetime64.
+        numbers: Columns holding Brazilian formatted numbers ('1.234,56', '12,5%'), converted to float64.
+        categories: Columns of repeated labels, converted to category.
+    """
+
+    __slots__ = ('dates', 'numbers', 'categories')
+
+    def __init__(self, dates:list=None, numbers:list=None, categories:list=None):
+        self.dates = [re.compile(p) for p in (dates or [])]
+        self.numbers = [re.compile(p) for p in (numbers or [])]
+        self.categories = [re.compile(p) for p in (categories or [])]
+
+    def kind(self, name) -> str:
+        name = normalize_name(name)
+        for kind, patterns in (('date', self.dates), ('number', self.numbers), ('category', self.categories)):
+            if any(p.search(name) for p in patterns):
+                return kind
+        return None
+
+
+SCHEMAS = {
+    'lista_deb_publicas': Schema(
+        categories=[r'^emissor', r'^situa'],
+    ),
+    'pu_historico': Schema(
+        dates=[r'^data'],
+        numbers=[r'^valor nominal', r'^juros', r'^pr\w*mio', r'^pre\w*o unit'],
+        categories=[r'^ativo$', r'^crit\w*rio', r'^situa'],
+    ),
+    'estoque_por_ativo': Schema(
+        dates=[r'^data'],
+        numbers=[r'^qtd', r'^volume'],
+    ),
+    'agenda_eventos': Schema(
+        dates=[r'^data'],
+        numbers=[r'^taxa', r'^valor', r'^pu\b'],
+        categories=[r'^ativo$', r'^emissor', r'^empresa', r'^evento', r'^status', r'^situa', r'^tipo'],
+    ),
+    'pu_eventos': Schema(
+        dates=[r'^data'],
+        numbers=[r'^taxa', r'^valor', r'^pu\b', r'^juros', r'^amortiza', r'^pr\w*mio'],
+        categories=[r'^ativo$', r'^emissor', r'^empresa', r'^evento', r'^status', r'^situa', r'^tipo'],
+    ),
+    'preco_negociacao': Schema(
+        dates=[r'^data'],
+        numbers=[r'^quantidade', r'^n\w*mero de neg', r'^pu\b', r'^taxa', r'^volume', r'^valor', r'^percentual', r'^pu da curva'],
+        categories=[r'^ativo$', r'^emissor', r'^empresa', r'^isin', r'^c\w*digo isin'],
+    ),
+    'caracteristicas_debs': Schema(
+        dates=[r'^data', r'^vencimento'],
+        numbers=[r'^valor', r'^quantidade', r'^qtde', r'^taxa', r'^percentual', r'^spread', r'^pre\w*o'],
+        categories=[r'^empresa', r'^emissor', r'^situa', r'^indice', r'^tipo', r'^classe', r'^forma', r'^esp\w*cie',
+                    r'^garantia', r'^banco', r'^agente', r'^coordenador', r'^deposit', r'^registro', r'^criterio',
+                    r'^periodicidade', r'^unidade', r'^ramo', r'^setor', r'^artigo', r'^moeda'],
+    ),
+    'volume_por_periodo': Schema(
+        dates=[r'^data'],
+        numbers=[r'^quantidade', r'^n\w*mero de neg', r'^volume', r'^valor'],
+    ),
+    'volume_por_garantia_especie': Schema(
+        dates=[r'^mes$'],
+        numbers=[r'^quantidade', r'^n\w*mero de neg', r'^volume', r'^valor', r'^participa'],
+        categories=[r'^esp\w*cie', r'^garantia'],
+    ),
+    'arquivo_precos_diario': Schema(
+        dates=[r'^data$', r'venc', r'^refer\w*ncia'],
+        numbers=[r'^taxa', r'^desvio', r'^intervalo', r'^pu\b', r'^duration', r'reune'],
+        categories=[r'^nome', r'^\w*ndice'],
+    ),
+}
+
+
+def _clean(s:pd.Series):
+    valores = s.astype(object).where(s.notna(), '').astype(str).str.strip()
+    return valores, valores.isin(_MISSING)
+
+
+def _as_dates(s:pd.Series):
+    valores, vazio = _clean(s)
+    datas = pd.to_datetime(valores.where(~vazio), format='%d/%m/%Y', errors='coerce')
+    # A value that is not a date means the column was guessed wrong: keep the text
+    return None if (datas.isna() & ~vazio).any() else datas
+
+
+def _as_numbers(s:pd.Series):
+    valores, vazio = _clean(s)
+    valores = valores.str.replace('.', '', regex=False).str.replace(',', '.', regex=False).str.rstrip('%').str.strip()
+    numeros = pd.to_numeric(valores.where(~vazio), errors='coerce').astype('float64')
+    return None if (numeros.isna() & ~vazio).any() else numeros
+
+
+def apply_schema(df:pd.DataFrame, schema) -> pd.DataFrame:
+    """
+    Converts the text columns of an endpoint result to their types in one pass:
+    dates to datetime64, numbers to float64 and repeated labels to category.
+
+    Columns the schema does not know, and columns with values that do not fit their
+    type, are left as text. Non-DataFrame results (e.g. tuples) are returned unchanged.
+
+    Args:
+        df: Result of an endpoint method.
+        schema: A Schema or the name of an entry of SCHEMAS.
+    """
+    if isinstance(schema, str):
+        schema = SCHEMAS[schema]
+    if not isinstance(df, pd.DataFrame) or df.empty or schema is None:
+        return df
+    df = df.copy()
+    for i, name in enumerate(df.columns):
+        s = df.iloc[:, i]
+        if not (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+            continue
+        kind = schema.kind(name)
+        if kind == 'date':
+            convertido = _as_dates(s)
+        elif kind == 'number':
+            convertido = _as_numbers(s)
+        elif kind == 'category':
+            convertido = s.astype('category')
+        else:
+            continue
+        if convertido is not None:
+            df.isetitem(i, convertido)
+    return df
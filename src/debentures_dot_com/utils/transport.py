@@ -0,0 +1,193 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from .cache import ResponseCache
+from .events import RequestEvent
+from .ratelimit import RateLimiter, LimitedRetry, resolve_rate_limiter, retry_after_seconds
+from .coalesce import SingleFlight, resolve_coalesce
+
+try:
+    import brotli  # noqa: F401 (requests only decodes 'br' when a brotli package is installed)
+    _ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        _ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class Transport:
+    """
+    Keep-alive HTTP transport shared by the endpoint classes.
+
+    Wraps a requests.Session mounted with a pooled adapter, so consecutive queries
+    reuse open connections instead of paying a new TCP+TLS handshake each time.
+    Failed connections and 429/5xx answers are retried with exponential backoff.
+    When a ResponseCache is given, successful answers are stored and replayed from disk.
+    Requests that reach the network go through a per-host RateLimiter, shared by default by
+    every transport of the process, which adapts to throttling and honors Retry-After.
+    Identical queries made at the same time by several threads share one download and
+    parse (see SingleFlight).
+
+    Args:
+        pool_connections: Number of host pools kept by the adapter.
+        pool_maxsize: Maximum number of open connections kept per host.
+        retries: Number of retries for connection errors and retryable status codes.
+        backoff_factor: Backoff factor between retries (0.5 -> 0.5s, 1s, 2s, ...).
+        status_forcelist: Status codes that trigger a retry.
+        headers: Extra headers sent with every request.
+        cache: Optional ResponseCache consulted before hitting the network.
+        rate_limiter: RateLimiter to use instead of the shared one, or False to disable rate limiting.
+        coalesce: How concurrent identical queries share their result: 'copy' (default) gives each
+            caller its own copy, and False disables coalescing.
+    """
+
+    def __init__(self, pool_connections:int=None, pool_maxsize:int=None, retries:int=None,
+                 backoff_factor:float=None, status_forcelist:tuple=None, headers:dict=None,
+                 cache:ResponseCache=None, rate_limiter:RateLimiter=None, coalesce:str=None):
+        self.cache = cache
+        self.rate_limiter = resolve_rate_limiter(rate_limiter)
+        self.single_flight = SingleFlight() if resolve_coalesce(coalesce) else None
+        self.pool_connections = pool_connections if isinstance(pool_connections, int) else 4
+        self.pool_maxsize = pool_maxsize if isinstance(pool_maxsize, int) else 16
+        self.retries = retries if isinstance(retries, int) else 3
+        self.backoff_factor = backoff_factor if isinstance(backoff_factor, (int, float)) else 0.5
+        self.status_forcelist = tuple(status_forcelist) if status_forcelist else (429, 500, 502, 503, 504)
+
+        retry = LimitedRetry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=frozenset(['GET', 'POST', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False, # Hand the last response back so raise_for_status() reports it
+            rate_limiter=self.rate_limiter,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept-Encoding': _ACCEPT_ENCODING, 'Connection': 'keep-alive'})
+        if headers:
+            self.session.headers.update(headers)
+
+    def request(self, method:str, url:str, endpoint:str=None, closed:bool=False, event:RequestEvent=None,
+                **kwargs) -> requests.Response:
+        """
+        Sends a request through the pooled session.
+
+        Args:
+            endpoint: Name of the endpoint method, used to pick the cache TTL.
+            closed: True when the queried window ends before today and can be cached forever.
+            event: RequestEvent filled with the status, timings, retries and cache outcome.
+
+        Streamed requests (stream=True) are served from the cache but never stored in it,
+        since their body is not held in memory. Their rate limiter slot is freed once the
+        headers arrive.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(method, url, kwargs.get('data'))
+            hit = self.cache.get(key)
+            if event is not None:
+                event.cache = 'miss' if hit is None else 'hit'
+            if hit is not None:
+                response = _cached_response(hit)
+                if event is not None:
+                    event.status = response.status_code
+                return response
+
+        response = self._send(method, url, event, **kwargs)
+        if key is not None and 200 <= response.status_code < 300 and not kwargs.get('stream'):
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in ('content-encoding', 'transfer-encoding')}
+            self.cache.set(key, url, response.status_code, response.encoding, headers, response.content,
+                           endpoint=endpoint, ttl=self.cache.ttl_for(endpoint, closed))
+        return response
+
+    def _send(self, method:str, url:str, event:RequestEvent=None, stream:bool=False, **kwargs) -> requests.Response:
+        # The body is read here (unless streaming), inside the rate limiter slot and timed apart from the headers
+        host = self.rate_limiter.host(url) if self.rate_limiter is not None else None
+        if host is not None:
+            host.acquire()
+        inicio = time.perf_counter()
+        try:
+            response = self.session.request(method, url, stream=True, **kwargs)
+            cabecalhos = time.perf_counter()
+            if not stream:
+                response.content
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if host is not None:
+                host.release(ok=False)
+            raise
+        except BaseException:
+            if host is not None:
+                host.release(ok=None)
+            raise
+        if host is not None:
+            if response.status_code in self.status_forcelist:
+                host.release(ok=False, retry_after=retry_after_seconds(response.headers.get('Retry-After')))
+            else:
+                host.release()
+        if event is not None:
+            event.status = response.status_code
+            event.connect_s = cabecalhos - inicio
+            event.download_s = 0.0 if stream else time.perf_counter() - cabecalhos
+            historico = getattr(getattr(response.raw, 'retries', None), 'history', None)
+            event.retries = len(historico) if historico else 0
+        return response
+
+    def get(self, url:str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url:str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _cached_response(hit:dict) -> requests.Response:
+    response = requests.Response()
+    response._content = hit['content']
+    response.status_code = hit['status']
+    response.encoding = hit['encoding']
+    response.headers = CaseInsensitiveDict(hit['headers'])
+    response.url = hit['url']
+    response._content_consumed = True # Lets iter_content replay the stored body
+    response.from_cache = True
+    return response
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport() -> Transport:
+    """
+    Returns the process-wide Transport used when no transport is passed explicitly.
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
+
+
+def _resolve_transport(transport:Transport=None) -> Transport:
+    return transport if transport is not None else get_default_transport()
@@ -1,156 +1,293 @@
-import requests
 import io
+import re
+import csv
+import collections
+import numpy as np
 import pandas as pd
-import locale
-from bs4 import BeautifulSoup
-from dateutil import parser
+from .transport import Transport
+from .query import Query, run_query, bytes_parser, decode_body, _apparent_encoding
+from .html import find_tables, cell_text, row_texts
+from .dates import (_cnpj_digits, _format_cnpj, _parse_date_text, _format_date_for_url, _parse_date, _is_past_date,
+                    split_window)
 
 
-def get_response_to_pd(url: str, sep:str = None, headers:dict=None, data:dict=None,timeout:int=None,skiprows:int=None) -> pd.DataFrame:
+def _parse_tabular_text(text:str, sep:str = None, skiprows:int=None, header_line:int=0, footer:int=2) -> pd.DataFrame:
+    # Original line-splitting parser, kept as the fallback for inputs the C engine rejects
+    df = pd.read_csv(io.StringIO(text), sep=sep, encoding='utf-8', names=['raw'], skiprows=skiprows)
+    df = df['raw'].str.split('\t', expand=True).reset_index(drop=True)
+    df = df[header_line:].reset_index(drop=True)
+    df.columns = df.iloc[0]
+    df = df[1:].reset_index(drop=True)
+    return df[:-footer] if footer else df
+
+# pandas skips lines holding only spaces, tabs and line breaks
+_WHITESPACE_LINE = re.compile(rb'^[ \t\r]*[ \t][ \t\r]*$', re.M)
+# The original parser read each line as one csv field, so a line opening with a quote was unquoted
+_QUOTED_LINE = re.compile(rb'^"', re.M)
+
+def _is_blank(line:bytes) -> bool:
+    return not line.strip(b' \t\r\n')
+
+def _next_line(content:bytes, pos:int) -> int:
+    nl = content.find(b'\n', pos)
+    return len(content) if nl < 0 else nl + 1
+
+def _tabular_bounds(content:bytes, skiprows:int, header_line:int, footer:int):
+    """
+    Locates, in one pass over the line breaks, the header line and the byte span of the
+    data rows, skipping the preamble, blank lines and the footer lines.
+    """
+    pos = 0
+    for _ in range(skiprows):
+        pos = _next_line(content, pos)
+    start = pos
+    non_blank = -1
+    while pos < len(content):
+        end = _next_line(content, pos)
+        if not _is_blank(content[pos:end]):
+            non_blank += 1
+            if non_blank == header_line:
+                header, data_start = content[pos:end], end
+                break
+        pos = end
+    else:
+        return None, start, len(content), len(content)
+
+    data_end, removed = len(content), 0
+    while removed < footer and data_end > data_start:
+        line_start = max(content.rfind(b'\n', data_start, data_end - 1) + 1, data_start)
+        if not _is_blank(content[line_start:data_end]):
+            removed += 1
+        data_end = line_start
+    return header, start, data_start, data_end
+
+@bytes_parser
+def parse_tabular(content, sep:str = None, skiprows:int=None, encoding:str=None, header_line:int=None, footer:int=None) -> pd.DataFrame:
+    """
+    Parses the tab separated export used by most debentures.com.br '_e.asp' pages:
+    a preamble, a header row, the data rows and a two line footer.
+
+    The response bytes are read directly by pandas' C engine as tab-delimited data, after
+    locating the header and footer once, so no intermediate one-column frame is built.
+    Inputs the C engine rejects (ragged rows, a non default sep, text) use the original parser.
+
+    Args:
+        content: Response body, as bytes (or already decoded text).
+        skiprows: Raw lines skipped before the header (2 by default).
+        encoding: Encoding of the body.
+        header_line: Index of the header among the non-blank lines after skiprows (0 by default).
+        footer: Number of non-blank trailing lines dropped (2 by default).
+    """
     if sep is None:
         sep = '|'
-    if timeout is None:
-        timeout= 10
     if skiprows is None:
         skiprows = 2
-    try:
-        response = requests.get(url, headers=headers, data=data, timeout=timeout)         
-        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
-        df = pd.read_csv(io.StringIO(response.text), sep=sep, encoding='utf-8', names=['raw'], skiprows=skiprows)
-        df = df['raw'].str.split('\t', expand=True).reset_index(drop=True)
-        df.columns = df.iloc[0]
-        df = df[1:].reset_index(drop=True)[:-2]
+    header_line = header_line if isinstance(header_line, int) else 0
+    footer = footer if isinstance(footer, int) else 2
+    encoding = encoding if isinstance(encoding, str) else 'utf-8'
+    if isinstance(content, str) or sep != '|':
+        text = content if isinstance(content, str) else content.decode(encoding, errors='replace')
+        return _parse_tabular_text(text, sep, skiprows, header_line, footer)
+
+    header, start, data_start, data_end = _tabular_bounds(content, skiprows, header_line, footer)
+    if header is None or _QUOTED_LINE.search(content, start):
+        return _parse_tabular_text(content.decode(encoding, errors='replace'), sep, skiprows, header_line, footer)
+    columns = header.rstrip(b'\r\n').decode(encoding, errors='replace').split('\t')
+    # The original parser split every line after skiprows, so its width is the widest of all of them
+    width = max(line.count(b'\t') + 1 for line in (content[start:data_start] + content[data_end:]).split(b'\n')
+                if not _is_blank(line))
+    data = content[data_start:data_end]
+    if _is_blank(data):
+        df = pd.DataFrame(columns=range(width), dtype=str)
+        df.columns = pd.Index(columns + [np.nan] * (width - len(columns)), name=0)
         return df
-    except requests.exceptions.ConnectionError as e:
-        print(f"Connection Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.Timeout as e:
-        print(f"Timeout Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error for {url}: {e}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"An unexpected error occurred for {url}: {e}")
-        return pd.DataFrame()
-    
-def simple_response_to_pd(url:str, sep:str, encoding:str=None, names:list=None, skiprows:int=None) ->pd.DataFrame:
+    if _WHITESPACE_LINE.search(data):
+        return _parse_tabular_text(content.decode(encoding, errors='replace'), sep, skiprows, header_line, footer)
+    try:
+        df = pd.read_csv(
+            io.BytesIO(data), sep='\t', header=None, dtype=str, na_filter=False,
+            quoting=csv.QUOTE_NONE, encoding=encoding, encoding_errors='replace', engine='c',
+        )
+    except pd.errors.ParserError:
+        df = None
+    # Short rows would come back padded with '' instead of missing values; a tab count tells them apart
+    if df is None or data.count(b'\t') != len(df) * (df.shape[1] - 1):
+        return _parse_tabular_text(content.decode(encoding, errors='replace'), sep, skiprows, header_line, footer)
+    width = max(width, df.shape[1])
+    for i in range(df.shape[1], width):
+        df[i] = pd.Series(np.nan, index=df.index, dtype=df[0].dtype)
+    columns = columns + [np.nan] * (width - len(columns))
+    # Same labels as the original parser, which promoted row 0 (hence name=0) to the header
+    df.columns = pd.Index(columns, name=0)
+    return df
+
+class TabularChunks:
+    """
+    Splits a streamed tab export into pieces of chunksize data rows, each made of the
+    header line and its rows, for iter_query. The last footer lines are held back until
+    the body ends and then dropped, as parse_tabular does.
+
+    Args:
+        chunksize: Data rows per piece.
+        sep, skiprows, header_line, footer: Same arguments as parse_tabular; sep is used to parse the pieces.
+    """
+
+    def __init__(self, chunksize:int, sep:str=None, skiprows:int=None, header_line:int=None, footer:int=None, **kwargs):
+        self.chunksize = chunksize
+        self.sep = sep
+        self._skip = skiprows if isinstance(skiprows, int) else 2
+        self._header_line = header_line if isinstance(header_line, int) else 0
+        self.footer = footer if isinstance(footer, int) else 2
+        self._non_blank = -1
+        self._header = None
+        self._pendentes = collections.deque()
+        self._linhas = 0
+
+    def feed(self, line:bytes) -> list:
+        if self._skip:
+            self._skip -= 1
+        elif self._header is None:
+            if not _is_blank(line):
+                self._non_blank += 1
+                if self._non_blank == self._header_line:
+                    self._header = line
+        else:
+            self._pendentes.append(line)
+            if not _is_blank(line):
+                self._linhas += 1
+            if self._linhas >= self.chunksize + self.footer:
+                return [self._take()]
+        return []
+
+    def _take(self) -> bytes:
+        linhas, tomadas = [self._header], 0
+        while tomadas < self.chunksize:
+            line = self._pendentes.popleft()
+            tomadas += not _is_blank(line)
+            linhas.append(line)
+        self._linhas -= tomadas
+        return b''.join(linhas)
+
+    def close(self) -> list:
+        removidas = 0
+        while removidas < self.footer and self._pendentes:
+            removidas += not _is_blank(self._pendentes.pop())
+        self._linhas = max(self._linhas - removidas, 0)
+        if not self._linhas:
+            return []
+        self.chunksize = self._linhas
+        return [self._take()]
+
+    def parse(self, piece:bytes, encoding:str=None) -> pd.DataFrame:
+        return parse_tabular(piece, sep=self.sep, skiprows=0, header_line=0, footer=0, encoding=encoding)
+
+parse_tabular.chunks = TabularChunks
+
+def parse_simple(text:str, sep:str, encoding:str=None, names:list=None, skiprows:int=None) -> pd.DataFrame:
     encoding = encoding if isinstance(encoding, str) else 'utf-8'
     names = names if isinstance(names, list) else ['raw']
     skiprows = skiprows if isinstance(skiprows, int) else 2
-    try:
-        response = requests.get(url, timeout=10)   
-        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
-        df = pd.read_csv(io.StringIO(response.text), sep=sep, encoding=encoding, names=names, skiprows=skiprows)
-        return df
-    except requests.exceptions.ConnectionError as e:
-        print(f"Connection Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.Timeout as e:
-        print(f"Timeout Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error for {url}: {e}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"An unexpected error occurred for {url}: {e}")
-        return pd.DataFrame()
-
-def _format_cnpj(cnpj: str) -> str:
+    return pd.read_csv(io.StringIO(text), sep=sep, encoding=encoding, names=names, skiprows=skiprows)
+
+def parse_anbima_precos(text:str, sep:str=None, skiprows:int=None) -> pd.DataFrame:
     """
-    Formats a CNPJ string to be 14 digits, padding with leading zeros if necessary.
-    Returns an empty string if the input is not a valid CNPJ (e.g., non-numeric or too long).
+    Parses an ANBIMA daily debenture price file (db{yymmdd}.txt) into one column per field:
+    two title lines, then an '@' separated header and rows. Section title lines between
+    the rows, which only fill the first field, are dropped.
     """
-    if not isinstance(cnpj, str):
-        return ''
-    
-    cnpj_digits = ''.join(filter(str.isdigit, cnpj))
-    
-    if len(cnpj_digits) > 14:
-        return '' # CNPJ too long
+    sep = sep if isinstance(sep, str) else '@'
+    skiprows = skiprows if isinstance(skiprows, int) else 2
+    df = pd.read_csv(io.StringIO(text), sep=sep, skiprows=skiprows, dtype=str, keep_default_na=False,
+                     quoting=csv.QUOTE_NONE, index_col=False)
+    df.columns = [c.strip() if isinstance(c, str) else c for c in df.columns]
+    if df.shape[1] > 1:
+        df = df[df.iloc[:, 1:].fillna('').apply(lambda s: s.str.strip() != '').any(axis=1)].reset_index(drop=True)
+    return df
+
+def get_response_to_pd(url: str, sep:str = None, headers:dict=None, data:dict=None,timeout:int=None,skiprows:int=None,transport:Transport=None,endpoint:str=None,closed:bool=False) -> pd.DataFrame:
+    query = Query(endpoint, url, parse_tabular, {'sep': sep, 'skiprows': skiprows},
+                  headers=headers, data=data, timeout=timeout, closed=closed)
+    return run_query(query, transport)
     
-    return cnpj_digits.zfill(14)
+def simple_response_to_pd(url:str, sep:str, encoding:str=None, names:list=None, skiprows:int=None, timeout:int=None, transport:Transport=None, endpoint:str=None, closed:bool=False) ->pd.DataFrame:
+    query = Query(endpoint, url, parse_simple, {'sep': sep, 'encoding': encoding, 'names': names, 'skiprows': skiprows},
+                  timeout=timeout, closed=closed)
+    return run_query(query, transport)
+
+def _two_column_frame(headers:list, rows:list, header_class:str = None, table_class:str = None) -> pd.DataFrame:
+    # headers/rows are the cell texts of the header and data tables, None when the table is missing
+    if headers is None:
+        print(f"Could not find the header table (class='{header_class}').")
+        headers = ["Data de Negociação", "Volume Negociado em Moeda da Época"]
+
+    extracted_data = []
+
+    if rows is not None:
+        for cols in rows:
+            cleaned_row = [col for col in cols if col]
 
-def _format_date_for_url(date_input: str, dtfmt:str = None, locale_:str = None) -> str:
+            if cleaned_row:
+                if "Total:" in cleaned_row[0] or "Total:" in cleaned_row[1]: 
+                    if len(cleaned_row) == 1 and "Total:" in cleaned_row[0]:
+                        total_value_str = cleaned_row[0].replace("Total:", "").strip()
+                        extracted_data.append(["Total", total_value_str])
+                    elif len(cleaned_row) == 2 and "Total:" in cleaned_row[1]:
+                        total_value_str = cleaned_row[1].replace("Total:", "").strip()
+                        extracted_data.append(["Total", total_value_str])
+                    else: 
+                        extracted_data.append(cleaned_row)
+                elif len(cleaned_row) == 2: 
+                    extracted_data.append(cleaned_row)
+    else:
+        print(f"Could not find the data table (class='{table_class}').")
+    if extracted_data and headers:
+        df = pd.DataFrame(extracted_data, columns=headers)
+        #print("\nDataFrame created successfully:")
+    elif extracted_data:
+        df = pd.DataFrame(extracted_data)
+        print("\nDataFrame created successfully (without specific headers):")
+    else:
+        df = pd.DataFrame()
+        print("No data extracted to form a DataFrame.")
+    return df
+
+def _parse_soup_table_text(text:str, header_class:str = None, table_class:str = None) -> pd.DataFrame:
+    # BeautifulSoup extraction, used when lxml is not installed
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(text, 'html.parser')
+    header_table = soup.find('table', class_=f'{header_class}')
+    headers = None
+    if header_table:
+        headers = [td.get_text(strip=True) for td in header_table.find_all('td')]
+        headers = [text for text in headers if text]
+    data_table = soup.find('table', class_=f'{table_class}')
+    rows = None
+    if data_table:
+        rows = [[ele.get_text(strip=True) for ele in row.find_all('td')] for row in data_table.find_all('tr')]
+    return _two_column_frame(headers, rows, header_class, table_class)
+
+@bytes_parser
+def parse_soup_table(content, header_class:str = None, table_class:str = None, encoding:str = None) -> pd.DataFrame:
     """
-    Converts a date string (in various formats) to DD%2FMM%2FYYYY for URL usage.
-    Returns an empty string if the date cannot be parsed.
+    Extracts a two column (date, value) HTML table, with its headers taken from a separate header table.
+
+    With lxml installed only the page up to the two tables is parsed, and the cell texts are
+    read straight from lxml's tree; otherwise the whole page goes through BeautifulSoup.
     """
-    if locale_ is None:
-        locale_ = 'pt_BR.utf8'
-    locale.setlocale(locale.LC_TIME, locale_)
-    if dtfmt is None:
-        dtfmt = '%d%%2F%m%%2F%Y'
-    if not isinstance(date_input, str) or not date_input:
-        return ''
-    try:
-        parsed_date = parser.parse(date_input)
-        return parsed_date.strftime(dtfmt)
-    except ValueError:
-        return '' # Invalid date format
-    
-def get_soup_response_to_pd(url: str, header_class:str = None, table_class:str = None, headers:dict=None, data:dict=None,timeout:int=None) ->pd.DataFrame:
-    if timeout is None:
-        timeout= 10
-    try:
-        response = requests.get(url, headers=headers, data=data, timeout=timeout)         
-        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        header_table = soup.find('table', class_=f'{header_class}')
-        headers = []
-        if header_table:
-            header_tds = header_table.find_all('td')
-            for td in header_tds:
-                text = td.get_text(strip=True)
-                if text:
-                    headers.append(text)
-        else:
-            print(f"Could not find the header table (class='{header_class}').")
-            headers = ["Data de Negociação", "Volume Negociado em Moeda da Época"]
-
-        data_table = soup.find('table', class_=f'{table_class}')
-        extracted_data = []
-
-        if data_table:
-            rows = data_table.find_all('tr')
-            for row in rows:
-                cols = row.find_all('td')
-                cols = [ele.get_text(strip=True) for ele in cols]
-                cleaned_row = [col for col in cols if col]
-
-                if cleaned_row:
-                    if "Total:" in cleaned_row[0] or "Total:" in cleaned_row[1]: 
-                        if len(cleaned_row) == 1 and "Total:" in cleaned_row[0]:
-                            total_value_str = cleaned_row[0].replace("Total:", "").strip()
-                            extracted_data.append(["Total", total_value_str])
-                        elif len(cleaned_row) == 2 and "Total:" in cleaned_row[1]:
-                            total_value_str = cleaned_row[1].replace("Total:", "").strip()
-                            extracted_data.append(["Total", total_value_str])
-                        else: 
-                            extracted_data.append(cleaned_row)
-                    elif len(cleaned_row) == 2: 
-                        extracted_data.append(cleaned_row)
-        else:
-            print(f"Could not find the data table (class='{table_class}').")
-        if extracted_data and headers:
-            df = pd.DataFrame(extracted_data, columns=headers)
-            #print("\nDataFrame created successfully:")
-        elif extracted_data:
-            df = pd.DataFrame(extracted_data)
-            print("\nDataFrame created successfully (without specific headers):")
-        else:
-            df = pd.DataFrame()
-            print("No data extracted to form a DataFrame.")
-        return df
-    except requests.exceptions.ConnectionError as e:
-        print(f"Connection Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.Timeout as e:
-        print(f"Timeout Error for {url}: {e}")
-        return pd.DataFrame()
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error for {url}: {e}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"An unexpected error occurred for {url}: {e}")
-        return pd.DataFrame()
+    if isinstance(content, str):
+        content, encoding = content.encode('utf-8'), 'utf-8'
+    encoding = encoding or _apparent_encoding(content)
+    tabelas = find_tables(content, encoding, [f'{header_class}', f'{table_class}'])
+    if tabelas is None:
+        return _parse_soup_table_text(decode_body(content, encoding), header_class, table_class)
+    headers = None
+    if f'{header_class}' in tabelas:
+        headers = [cell_text(td) for td in tabelas[f'{header_class}'].iter('td')]
+        headers = [text for text in headers if text]
+    rows = row_texts(tabelas[f'{table_class}']) if f'{table_class}' in tabelas else None
+    return _two_column_frame(headers, rows, header_class, table_class)
+
+def get_soup_response_to_pd(url: str, header_class:str = None, table_class:str = None, headers:dict=None, data:dict=None,timeout:int=None,transport:Transport=None,endpoint:str=None,closed:bool=False) ->pd.DataFrame:
+    query = Query(endpoint, url, parse_soup_table, {'header_class': header_class, 'table_class': table_class},
+                  headers=headers, data=data, timeout=timeout, closed=closed)
+    return run_query(query, transport)
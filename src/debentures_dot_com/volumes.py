@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from functools import partial
+from .utils.utils import parse_tabular, split_window, _is_past_date, _parse_date
+from .utils.params import Param, ParamSpec
+from .utils.transport import Transport, _resolve_transport
+from .utils.arrow import resolve_output
+from .utils.query import Query, QueryClient, resolve_errors
+from .__consulta_dados import UrlDebentures
+
+_MOEDA = Param('moeda', kind='choice', default=1, choices=(1, 2))
+
+_VOLUME_POR_PERIODO = ParamSpec('volumeporperiodo_e.asp', [
+    Param('op_exc', 'exec', default='Nada'),
+    Param('emissao', kind='int', default=0),
+    Param('dt_ini', kind='date'),
+    Param('dt_fim', kind='date'),
+    Param('ICVM', 'icvm'),
+    _MOEDA,
+])
+
+_VOLUME_POR_GARANTIA_ESPECIE = ParamSpec('volumeporgarantia-especie_de.asp', [
+    Param('pMes_Ini', 'mes_ini', 'int', template='{:02d}'),
+    Param('pAno_Ini', 'ano_ini', 'int'),
+    Param('pMes_Fim', 'mes_fim', 'int', template='{:02d}'),
+    Param('pAno_Fim', 'ano_fim', 'int'),
+    _MOEDA,
+    Param('pConsol', 'consolidado', 'int', default=0),
+    Param('op_exc', 'exec', default='Nada'),
+    Param('ICVM', 'icvm', default='%20NULL'),
+])
+
+
+def _periodo(dt_ini:str=None, dt_fim:str=None) -> tuple:
+    # The current month up to today by default; dt_ini alone runs up to today
+    fim = _parse_date(dt_fim) if dt_fim else date.today()
+    inicio = _parse_date(dt_ini) if dt_ini else (fim.replace(day=1) if fim is not None else None)
+    if inicio is None or fim is None:
+        raise ValueError("Parameters 'dt_ini' and 'dt_fim' must be valid dates.")
+    if inicio > fim:
+        raise ValueError("Parameter 'dt_ini' must not be after 'dt_fim'.")
+    return inicio, fim
+
+
+def _ultimo_dia(dia:date) -> date:
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def _post_mes(df, mes:date=None):
+    # Rows of a month partition carry their month, so the merged frame keeps them apart
+    df.insert(0, 'Mês', mes.strftime('%d/%m/%Y'))
+    return df
+
+
+class VolumesNegociados(QueryClient):
+    """
+        Consult the open data page on debentures.com,
+        specifically the tab 'volume' (https://www.debentures.com.br/exploreosnd/consultaadados/volume/)
+        to extract the traded volumes via Python.
+
+        Long ranges are split into month partitions fetched concurrently and merged into one frame:
+        chunk: 'month' (default), 'quarter' or 'year' windows of volume_por_periodo; None sends one request.
+        max_workers: Number of partitions fetched at the same time.
+        Partitions that end before today are closed, so a ResponseCache keeps them for good and
+        only the current month is fetched again on later calls.
+
+        raw=True keeps the text columns of the exports instead of typed ones.
+        output='arrow' or 'polars' returns pyarrow.Table or polars.DataFrame results instead of pandas ones.
+    """
+
+    def __init__(self, transport:Transport=None, raw:bool=False, output:str=None, errors:str=None)->str:
+        self.transport = _resolve_transport(transport)
+        self.raw = raw
+        self.output = resolve_output(output)
+        self.errors = resolve_errors(errors)
+        root_url = UrlDebentures().root_url
+        self.root_url = f'{root_url}/volume'
+
+    def _query_volume_por_periodo(self, dt_ini:date, dt_fim:date, emissao:int=None, exec:str=None, icvm:str=None,
+                                  moeda:int=None, timeout:int=None)->Query:
+        url = _VOLUME_POR_PERIODO.url(self.root_url, locals())
+        return Query('volume_por_periodo', url, parse_tabular, timeout=timeout, closed=_is_past_date(dt_fim),
+                     schema=self._schema('volume_por_periodo'))
+
+    def volume_por_periodo(self, dt_ini:str=None, dt_fim:str=None, emissao:int=None, exec:str=None, icvm:str=None,
+                           moeda:int=None, timeout:int=None, chunk:str='month', max_workers:int=None):
+        """
+        Daily traded volume (quantity, trades and volume) from dt_ini to dt_fim, the current
+        month by default.
+
+        Args:
+            emissao: Value of the page's 'emissao' filter, 0 by default.
+            exec: Value of the page's 'op_exc' filter, 'Nada' by default.
+            icvm: Value of the page's 'ICVM' filter, empty by default.
+            moeda: 1 for R$ (default) or 2 for US$.
+        """
+        inicio, fim = _periodo(dt_ini, dt_fim)
+        janelas = split_window(inicio, fim, chunk) if chunk else [(inicio, fim)]
+        queries = [self._query_volume_por_periodo(a, b, emissao, exec, icvm, moeda, timeout) for a, b in janelas]
+        if len(queries) == 1:
+            return self._run(queries[0])
+        return self._run_windows(queries, max_workers)
+
+    def _query_volume_por_garantia_especie(self, inicio:date, fim:date, consolidado:bool=False, exec:str=None,
+                                           icvm:str=None, moeda:int=None, timeout:int=None)->Query:
+        args = {'mes_ini': inicio.month, 'ano_ini': inicio.year, 'mes_fim': fim.month, 'ano_fim': fim.year,
+                'consolidado': int(bool(consolidado)), 'exec': exec, 'icvm': icvm, 'moeda': moeda}
+        url = _VOLUME_POR_GARANTIA_ESPECIE.url(self.root_url, args)
+        # The page answers whole months, so a partition is closed once its last month is over
+        post = None if consolidado else partial(_post_mes, mes=inicio.replace(day=1))
+        return Query('volume_por_garantia_especie', url, parse_tabular, timeout=timeout,
+                     closed=_is_past_date(_ultimo_dia(fim)), post=post,
+                     schema=self._schema('volume_por_garantia_especie'))
+
+    def volume_por_garantia_especie(self, dt_ini:str=None, dt_fim:str=None, consolidado:bool=False, exec:str=None,
+                                    icvm:str=None, moeda:int=None, timeout:int=None, max_workers:int=None):
+        """
+        Traded volume by guarantee and kind of debenture, for the months of dt_ini through
+        dt_fim (the current month by default).
+
+        One request per month is sent concurrently and the months are merged, with a 'Mês'
+        column (first day of the month). consolidado=True asks the site for the totals of the
+        whole range instead, in a single request.
+
+        Args:
+            exec: Value of the page's 'op_exc' filter, 'Nada' by default.
+            icvm: Value of the page's 'ICVM' filter, ' NULL' by default.
+            moeda: 1 for R$ (default) or 2 for US$.
+        """
+        inicio, fim = _periodo(dt_ini, dt_fim)
+        if consolidado:
+            return self._run(self._query_volume_por_garantia_especie(inicio, fim, True, exec, icvm, moeda, timeout))
+        meses = [_parse_date(a) for a, _ in split_window(inicio.replace(day=1), fim, 'month')]
+        queries = [self._query_volume_por_garantia_especie(m, m, False, exec, icvm, moeda, timeout) for m in meses]
+        if len(queries) == 1:
+            return self._run(queries[0])
+        return self._run_windows(queries, max_workers)
@@ -0,0 +1,18 @@
+import sys
+import os
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from standin import StandinServer
+
+
+@pytest.fixture(scope='session')
+def standin():
+    with StandinServer(missing={'db240316.txt'}) as servidor:
+        yield servidor
+
+
+@pytest.fixture(scope='session')
+def clients(standin):
+    return standin.clients(errors='raise')
@@ -0,0 +1,260 @@
+"""
+Local stand-in for debentures.com.br and the ANBIMA price files, serving the recorded
+responses in tests/fixtures.
+
+Fixtures are kept as UTF-8 text with LF line ends and sent as the sites send them: CRLF
+line ends, in ISO-8859-1. With rows, every export is scaled to about that many data rows
+by repeating its rows (or report blocks, with advancing dates), for large synthetic
+responses. latency delays every answer, to mimic the round trip to the real sites.
+
+    python tests/standin.py --port 8766 --latency 0.05 --rows 100000
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import itertools
+import threading
+import http.server
+from datetime import date, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# fixture -> (lines kept before the repeated rows, lines kept after them)
+_LAYOUT = {
+    'pu_historico.txt': (3, 3),
+    'caracteristicas_debs.txt': (4, 5),
+    'estoque_por_ativo.txt': (5, 3),
+    'estoque_por_periodo.txt': (3, 3),
+    'estoque_a_vencer.txt': (5, 3),
+    'agenda_eventos.txt': (3, 3),
+    'pu_eventos.txt': (3, 3),
+    'conversao_permuta.txt': (3, 3),
+    'preco_negociacao.txt': (3, 3),
+    'anbima_db.txt': (3, 0),
+    'volume_por_periodo.txt': (3, 3),
+    'volume_garantia_especie.txt': (3, 3),
+}
+
+# Page name -> fixture; caracteristicas_e.asp serves two endpoints, told apart by the query
+_ROUTES = {
+    'caracteristicas_r.asp': 'lista_deb_publicas.html',
+    'puhistorico_e.asp': 'pu_historico.txt',
+    'prazo-medio_e.asp': 'prazo_medio.txt',
+    'conversoes-permutas_e.asp': 'conversao_permuta.txt',
+    'estoqueporativo_e.asp': 'estoque_por_ativo.txt',
+    'estoqueporperiodo_e.asp': 'estoque_por_periodo.txt',
+    'estoqueavencer_e.asp': 'estoque_a_vencer.txt',
+    'estoquepor_re.asp': 'estoque_relatorio.txt',
+    'agenda_e.asp': 'agenda_eventos.txt',
+    'pudeeventos_e.asp': 'pu_eventos.txt',
+    'precosdenegociacao_e.asp': 'preco_negociacao.txt',
+    'volumesnegociados_r.asp': 'volume_negociacao.html',
+    'volumeporperiodo_e.asp': 'volume_por_periodo.txt',
+    'volumeporgarantia-especie_de.asp': 'volume_garantia_especie.txt',
+}
+
+_DATA_ESTOQUE = re.compile(r'Data do Estoque \d{2}/\d{2}/\d{4}')
+
+
+def fixture(nome:str) -> str:
+    with open(os.path.join(FIXTURES, nome), encoding='utf-8') as f:
+        return f.read()
+
+
+def _repeat(itens:list, n:int) -> list:
+    return list(itertools.islice(itertools.cycle(itens), max(n, 1)))
+
+
+def _br_date(texto:str) -> date:
+    dia, mes, ano = (int(p) for p in texto.split('/'))
+    return date(ano, mes, dia)
+
+
+def daily(texto:str, dt_ini:str, dt_fim:str) -> str:
+    """
+    A daily export (a date in the first column) answered for the requested range: one row
+    per day from dt_ini to dt_fim (dd/mm/yyyy), with the values of a recorded row picked by
+    the day, so a day has the same values whatever range it is asked in.
+    """
+    linhas = texto.rstrip('\n').split('\n')
+    dados = linhas[3:-3]
+    inicio, fim = _br_date(dt_ini), _br_date(dt_fim)
+    dias = [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+    corpo = [f'{dia:%d/%m/%Y}\t' + dados[dia.toordinal() % len(dados)].split('\t', 1)[1] for dia in dias]
+    return '\n'.join(linhas[:3] + corpo + linhas[-3:]) + '\n'
+
+
+def scale(nome:str, rows:int) -> str:
+    """
+    The fixture scaled to about `rows` data rows.
+    """
+    texto = fixture(nome)
+    linhas = texto.rstrip('\n').split('\n')
+    if nome == 'estoque_relatorio.txt':
+        # Title, then blocks of a date line, a header, the rows and the day's total
+        blocos, atual = [], []
+        for linha in linhas[1:]:
+            if linha.startswith('Data do Estoque') and atual:
+                blocos.append(atual)
+                atual = []
+            atual.append(linha)
+        blocos.append(atual)
+        por_bloco = len(blocos[0]) - 3
+        inicio = date(1992, 3, 2)
+        saida = [linhas[0]]
+        for i, bloco in enumerate(_repeat(blocos, -(-rows // por_bloco))):
+            dia = inicio + timedelta(days=i)
+            saida.append(_DATA_ESTOQUE.sub(f'Data do Estoque {dia:%d/%m/%Y}', bloco[0]))
+            saida.extend(bloco[1:])
+        return '\n'.join(saida) + '\n'
+    if nome.endswith('.html'):
+        inicio, fim = texto.index('<tr>', texto.index("class='Tab10333333'")), texto.rindex('</table>')
+        linhas_tabela = [l for l in texto[inicio:fim].split('\n') if l]
+        return texto[:inicio] + '\n'.join(_repeat(linhas_tabela, rows)) + '\n' + texto[fim:]
+    if nome not in _LAYOUT:
+        return texto
+    antes, depois = _LAYOUT[nome]
+    dados = linhas[antes:len(linhas) - depois]
+    return '\n'.join(linhas[:antes] + _repeat(dados, rows) + linhas[len(linhas) - depois:]) + '\n'
+
+
+class StandinServer:
+    """
+    Threaded HTTP server answering the endpoint pages with the fixtures.
+
+    Args:
+        latency: Seconds waited before every answer.
+        rows: Scales every export to about this many data rows. None serves the fixtures as recorded.
+        port: Port to listen on; 0 picks a free one.
+        missing: ANBIMA file names (db{yymmdd}.txt) answered with 404, like days without a file.
+    """
+
+    def __init__(self, latency:float=None, rows:int=None, port:int=None, missing:set=None):
+        self.latency = latency if isinstance(latency, (int, float)) else 0.0
+        self.rows = rows
+        self.missing = set(missing or ())
+        self.requests = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port if isinstance(port, int) else 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self._thread = None
+
+    def body(self, nome:str, tipo:str=None) -> bytes:
+        """
+        The bytes served for a fixture, as the sites encode them.
+        """
+        chave = (nome, tipo)
+        if chave not in self._bodies:
+            texto = scale(nome, self.rows) if self.rows else fixture(nome)
+            if isinstance(tipo, tuple):
+                texto = daily(texto, *tipo)
+            elif tipo:
+                texto = texto.replace('Indexadores', tipo)
+            self._bodies[chave] = texto.replace('\n', '\r\n').encode('ISO-8859-1')
+        return self._bodies[chave]
+
+    def route(self, path:str) -> tuple:
+        """
+        (fixture, report type) of a request path, or (None, None) when nothing is served there.
+        The volumes by period answer with the (dt_ini, dt_fim) they were asked for.
+        """
+        partes = urlsplit(path)
+        pagina = partes.path.rsplit('/', 1)[-1]
+        query = parse_qs(partes.query, keep_blank_values=True)
+        if pagina.startswith('db') and pagina.endswith('.txt') and '/arqs/' in partes.path:
+            return (None if pagina in self.missing else 'anbima_db.txt'), None
+        if pagina == 'caracteristicas_e.asp':
+            return ('lista_caracteristicas.txt' if set(query) == {'Ativo'} else 'caracteristicas_debs.txt'), None
+        if pagina == 'estoquepor_re.asp':
+            return _ROUTES[pagina], query.get('op_rel', ['Indexadores'])[0]
+        if pagina == 'volumeporperiodo_e.asp' and query.get('dt_ini', [''])[0] and query.get('dt_fim', [''])[0]:
+            return _ROUTES[pagina], (query['dt_ini'][0], query['dt_fim'][0])
+        return _ROUTES.get(pagina), None
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                # volume_negociacao sends its form body even on GET
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with servidor._lock:
+                    servidor.requests += 1
+                if servidor.latency:
+                    time.sleep(servidor.latency)
+                nome, tipo = servidor.route(self.path)
+                if nome is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                corpo = servidor.body(nome, tipo)
+                self.send_response(200)
+                tipo_conteudo = 'text/html' if nome.endswith('.html') else 'text/plain'
+                # The ANBIMA files come without a charset, like the real ones
+                charset = '' if nome == 'anbima_db.txt' else '; charset=ISO-8859-1'
+                self.send_header('Content-Type', tipo_conteudo + charset)
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def clients(self, **kwargs) -> tuple:
+        """
+        EmissoesDebentures, EstoquesCorporativos, EventosFinanceiros and MercadoSecundario
+        pointed at the server; kwargs are passed to every class.
+        """
+        from debentures_dot_com import EmissoesDebentures, EstoquesCorporativos, EventosFinanceiros, MercadoSecundario
+        ed, ec, ef, ms = (c(**kwargs) for c in (EmissoesDebentures, EstoquesCorporativos, EventosFinanceiros, MercadoSecundario))
+        ed.root_url = f'{self.url}/emissoesdedebentures'
+        ec.root_url = f'{self.url}/estoque'
+        ef.root_url = f'{self.url}/eventosfinanceiros'
+        ms.root_url = f'{self.url}/informacoes/merc-sec-debentures/'
+        ms.root_url_ = f'{self.url}/mercadosecundario'
+        return ed, ec, ef, ms
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--port', type=int, default=8766)
+    ap.add_argument('--latency', type=float, default=0.0)
+    ap.add_argument('--rows', type=int, default=None)
+    args = ap.parse_args()
+    servidor = StandinServer(latency=args.latency, rows=args.rows, port=args.port)
+    print(f'Serving tests/fixtures on {servidor.url}', file=sys.stderr)
+    try:
+        servidor.httpd.serve_forever()
+    except KeyboardInterrupt:
+        servidor.stop()
+
+
+if __name__ == '__main__':
+    main()
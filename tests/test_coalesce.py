@@ -0,0 +1,93 @@
+"""
+Coalescing of identical concurrent queries (SingleFlight), against a slow stand-in server.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from debentures_dot_com import AsyncEmissoesDebentures, AsyncTransport, Transport, HTTPStatusError, add_hook, remove_hook
+from standin import StandinServer
+
+
+@pytest.fixture(scope='module')
+def lento():
+    with StandinServer(latency=0.3, missing={'db240316.txt'}) as servidor:
+        yield servidor
+
+
+def _rajada(cliente, metodo, args, n=8):
+    barreira = threading.Barrier(n)
+    def chamar(_):
+        barreira.wait()
+        return getattr(cliente, metodo)(*args)
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(chamar, range(n)))
+
+
+def test_one_fetch_per_burst(lento):
+    ed = lento.clients(transport=Transport(rate_limiter=False), errors='raise')[0]
+    eventos = []
+    add_hook(eventos.append)
+    try:
+        antes = lento.requests
+        resultados = _rajada(ed, 'lista_deb_publicas', ())
+    finally:
+        remove_hook(eventos.append)
+    assert lento.requests - antes == 1
+    assert sum(e.coalesced for e in eventos) == 7
+    # Copies by default: every caller owns its frame
+    assert len({id(df) for df in resultados}) == 8
+    resultados[0].loc[0, 'Ativo'] = 'XXXX11'
+    assert resultados[1]['Ativo'].iloc[0] == 'ABCD10'
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        Transport(coalesce='readonly')
+
+
+def test_distinct_queries_not_coalesced(lento):
+    ed = lento.clients(transport=Transport(rate_limiter=False), errors='raise')[0]
+    antes = lento.requests
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(lambda a: ed.lista_caracteristicas(a), ['ABCD11', 'ABCD12']))
+    assert lento.requests - antes == 2
+
+
+def test_disabled(lento):
+    ed = lento.clients(transport=Transport(rate_limiter=False, coalesce=False), errors='raise')[0]
+    antes = lento.requests
+    _rajada(ed, 'lista_deb_publicas', (), n=3)
+    assert lento.requests - antes == 3
+
+
+def test_failure_shared(lento):
+    ms = lento.clients(transport=Transport(rate_limiter=False), errors='raise')[3]
+    antes = lento.requests
+    barreira = threading.Barrier(4)
+    def chamar(_):
+        barreira.wait()
+        try:
+            ms.arquivo_precos_diario('20240316')
+        except HTTPStatusError as e:
+            return e.status
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(chamar, range(4))) == [404] * 4
+    assert lento.requests - antes == 1
+
+
+def test_async_gather(lento):
+    async def rajada():
+        async with AsyncTransport(rate_limiter=False) as transport:
+            ed = AsyncEmissoesDebentures(transport=transport, errors='raise')
+            ed.root_url = f'{lento.url}/emissoesdedebentures'
+            return await asyncio.gather(*(ed.lista_deb_publicas() for _ in range(6)))
+    antes = lento.requests
+    resultados = asyncio.run(rajada())
+    assert lento.requests - antes == 1
+    assert all(len(df) == 12 for df in resultados) and len({id(df) for df in resultados}) == 6
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        Transport(coalesce='sim')
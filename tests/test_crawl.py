@@ -0,0 +1,60 @@
+"""
+The resumable crawl of the public universe (UniverseCrawl).
+"""
+import pytest
+from debentures_dot_com import UniverseCrawl, Transport
+
+
+def _crawl(standin, path, **kwargs) -> UniverseCrawl:
+    crawl = UniverseCrawl(str(path), transport=Transport(rate_limiter=False, retries=0), retry_wait=0, **kwargs)
+    crawl.emissoes.root_url = f'{standin.url}/emissoesdedebentures'
+    crawl.eventos.root_url = f'{standin.url}/eventosfinanceiros'
+    return crawl
+
+
+def test_full_run(standin, tmp_path):
+    with _crawl(standin, tmp_path, processes=0) as crawl:
+        status = crawl.run()
+        assert status['Ativos'].tolist() == [12, 12, 12] and status['Ok'].tolist() == [12, 12, 12]
+        assert status['Linhas'].tolist() == [12 * 7, 12 * 15, 12 * 15]
+        pu = crawl.load('pu_historico')
+        assert len(pu) == 12 * 15 and pu['Ativo'].nunique() == 12
+        assert (tmp_path / 'pu_eventos' / 'ABCD10.csv').exists()
+        antes = standin.requests
+        crawl.run()
+        assert standin.requests == antes
+
+
+def test_resume(standin, tmp_path):
+    with _crawl(standin, tmp_path, processes=0, endpoints=['pu_historico']) as crawl:
+        antes = standin.requests
+        assert crawl.run(max_tasks=5)['Pendentes'].tolist() == [7]
+        assert standin.requests == antes + 1 + 5
+    # A new instance picks the journal up and only fetches what is missing
+    with _crawl(standin, tmp_path, processes=0, endpoints=['pu_historico']) as crawl:
+        antes = standin.requests
+        assert crawl.run()['Ok'].tolist() == [12]
+        assert standin.requests == antes + 7
+
+
+def test_failures_are_recorded(standin, tmp_path):
+    with _crawl(standin, tmp_path, processes=0, endpoints=['pu_eventos'], retries=1) as crawl:
+        crawl.eventos.root_url = 'http://127.0.0.1:9/eventosfinanceiros'
+        status = crawl.run()
+        assert status['Erros'].tolist() == [12] and status['Ok'].tolist() == [0]
+        falhas = crawl.failures()
+        assert falhas['Erro'].str.startswith('ConnectionFailed').all() and (falhas['Tentativas'] == 2).all()
+        assert crawl.run(retry_failed=False)['Erros'].tolist() == [12]
+        crawl.eventos.root_url = f'{standin.url}/eventosfinanceiros'
+        assert crawl.run()['Ok'].tolist() == [12]
+        assert crawl.failures().empty
+    with pytest.raises(ValueError):
+        UniverseCrawl(str(tmp_path), endpoints=['nada'])
+
+
+def test_parser_processes(standin, tmp_path):
+    pytest.importorskip('pyarrow')
+    with _crawl(standin, tmp_path, processes=2, format='parquet') as crawl:
+        assert crawl.run()['Ok'].tolist() == [12, 12, 12]
+        pu = crawl.load('pu_historico')
+        assert len(pu) == 12 * 15 and pu['Data do PU'].dtype.kind == 'M'
@@ -0,0 +1,85 @@
+"""
+The change feed of the public list and characteristics (DeltaFeed).
+"""
+import pytest
+from standin import StandinServer
+from debentures_dot_com import DeltaFeed, ParseError, Transport
+
+
+def _trocar(servidor, nome:str, antes:str, depois:str, vezes:int=1):
+    # Changes what the stand-in answers for a fixture from now on
+    corpo = servidor.body(nome)
+    assert corpo.count(antes.encode('ISO-8859-1')) == vezes
+    servidor._bodies[(nome, None)] = corpo.replace(antes.encode('ISO-8859-1'), depois.encode('ISO-8859-1'))
+
+
+@pytest.fixture
+def feed(tmp_path):
+    with StandinServer() as servidor:
+        f = DeltaFeed(str(tmp_path / 'delta.sqlite'), transport=Transport(rate_limiter=False), errors='raise')
+        f.emissoes.root_url = f'{servidor.url}/emissoesdedebentures'
+        f.servidor = servidor
+        yield f
+        f.close()
+
+
+def test_first_sync_is_the_baseline(feed):
+    mudancas = feed.sync()
+    assert (mudancas['Mudança'] == 'novo').all() and len(mudancas) == 12
+    assert feed.servidor.requests == 1 + 12
+    assert feed.snapshot('lista_caracteristicas')['Ativo'].nunique() == 12
+    assert feed.sync().empty
+    assert feed.servidor.requests == 1 + 12 + 1
+
+
+def test_changed_rows_and_fields(feed):
+    feed.sync()
+    servidor = feed.servidor
+    _trocar(servidor, 'lista_deb_publicas.html', 'ABCD10</a></td><td>EMISSORA 0 S.A.</td><td>&nbsp;</td><td>Registrado',
+            'ABCD10</a></td><td>EMISSORA 0 S.A.</td><td>&nbsp;</td><td>Cancelado')
+    _trocar(servidor, 'lista_deb_publicas.html', 'ABCD13', 'ABCD99', vezes=2)
+    _trocar(servidor, 'lista_caracteristicas.txt', '\tIPCA\t', '\tDI\t')
+    antes = servidor.requests
+    mudancas = feed.sync()
+    assert servidor.requests == antes + 1 + 2
+    linhas = sorted(map(tuple, mudancas.fillna('').values.tolist()))
+    assert linhas == [
+        ('ABCD10', 'lista_caracteristicas', 'alterado', 'Índice', 'IPCA', 'DI'),
+        ('ABCD10', 'lista_deb_publicas', 'alterado', 'Situacao', 'Registrado', 'Cancelado'),
+        ('ABCD13', 'lista_deb_publicas', 'removido', '', '', ''),
+        ('ABCD99', 'lista_deb_publicas', 'novo', '', '', ''),
+    ]
+    # Characteristics changed behind an unchanged row are only seen when asked for
+    assert feed.sync().empty
+    assert feed.sync(ativos=['ABCD11'])['Campo'].tolist() == ['Índice']
+    assert len(feed.history()) == 12 + 4 + 1
+
+
+def test_failed_characteristics_stay_pending(feed):
+    feed.errors = 'print'
+    feed.emissoes.root_url = f'{feed.servidor.url}/emissoesdedebentures'
+    original = feed.emissoes._query_lista_caracteristicas
+
+    def quebrada(ativo, timeout=None):
+        query = original(ativo, timeout)
+        query.url = query.url.replace('caracteristicas_e.asp', 'nada.asp')
+        return query
+
+    feed.emissoes._query_lista_caracteristicas = quebrada
+    assert len(feed.sync()) == 12
+    assert len(feed.pending()) == 12 and feed.snapshot('lista_caracteristicas').empty
+    feed.emissoes._query_lista_caracteristicas = original
+    assert feed.sync().empty
+    assert feed.pending().empty and feed.snapshot('lista_caracteristicas')['Ativo'].nunique() == 12
+
+
+def test_page_without_the_list_keeps_the_baseline(feed):
+    feed.sync()
+    servidor = feed.servidor
+    original = servidor.body('lista_deb_publicas.html')
+    servidor._bodies[('lista_deb_publicas.html', None)] = '<html><body>Em manutenção</body></html>'.encode('ISO-8859-1')
+    with pytest.raises(ParseError):
+        feed.sync()
+    assert len(feed.snapshot()) == 12 and len(feed.history()) == 12
+    servidor._bodies[('lista_deb_publicas.html', None)] = original
+    assert feed.sync().empty
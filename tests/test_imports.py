@@ -0,0 +1,86 @@
+"""
+Start-up cost: what `import debentures_dot_com` loads, and the pandas free records path.
+"""
+import os
+import sys
+import json
+import subprocess
+import pytest
+import debentures_dot_com
+from debentures_dot_com import records, HTTPStatusError, add_hook, remove_hook
+from debentures_dot_com.utils.utils import parse_anbima_precos
+
+_SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+_PESADOS = ('pandas', 'numpy', 'bs4', 'dateutil', 'aiohttp', 'pyarrow', 'polars', 'lxml')
+
+
+def _carregados(codigo:str) -> list:
+    # A fresh interpreter, so the modules loaded by the other tests do not count
+    script = f'import sys\n{codigo}\nimport json\nprint(json.dumps(sorted(m for m in sys.modules if "." not in m)))'
+    saida = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                           env={**os.environ, 'PYTHONPATH': _SRC})
+    return json.loads(saida.stdout)
+
+
+def test_import_is_light():
+    carregados = _carregados('import debentures_dot_com')
+    assert [m for m in _PESADOS if m in carregados] == []
+
+
+def test_classes_load_on_access():
+    carregados = _carregados('from debentures_dot_com import Transport, RequestEvent, DebenturesError')
+    assert [m for m in _PESADOS if m in carregados] == []
+    assert 'pandas' in _carregados('from debentures_dot_com import EmissoesDebentures')
+    assert 'aiohttp' not in _carregados('from debentures_dot_com import MercadoSecundario')
+
+
+def test_lazy_exports():
+    assert set(debentures_dot_com.__all__) <= set(dir(debentures_dot_com))
+    for nome in debentures_dot_com.__all__:
+        assert getattr(debentures_dot_com, nome) is not None
+    with pytest.raises(AttributeError):
+        debentures_dot_com.NaoExiste
+
+
+def test_records_parser_matches_pandas():
+    with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'anbima_db.txt'), encoding='utf-8') as f:
+        texto = f.read()
+    df = parse_anbima_precos(texto)
+    colunas, rows = records.parse_anbima_records(texto)
+    assert colunas == list(df.columns)
+    assert rows == df.values.tolist()
+    with pytest.raises(ValueError):
+        records.parse_anbima_records('a\nb\nX@Y\n1@2@3\n')
+
+
+def test_records_fetch(standin):
+    url = f'{standin.url}/informacoes/merc-sec-debentures'
+    eventos = []
+    add_hook(eventos.append)
+    try:
+        linhas = records.arquivo_precos_diario('20240315', root_url=url)
+        colunas = records.arquivo_precos_diario('15/03/2024', output='columns', root_url=url)
+    finally:
+        remove_hook(eventos.append)
+    assert len(linhas) == 15 and linhas[0]['Código'] == 'ABCD10'
+    assert colunas['Código'] == [l['Código'] for l in linhas]
+    assert [e.rows for e in eventos] == [15, 15] and all(e.ok for e in eventos)
+    with pytest.raises(HTTPStatusError) as erro:
+        records.arquivo_precos_diario('20240316', root_url=url)
+    assert erro.value.status == 404
+    with pytest.raises(ValueError):
+        records.arquivo_precos_diario('20240315', output='pandas')
+
+
+def test_records_arrow(standin):
+    pa = pytest.importorskip('pyarrow')
+    tabela = records.arquivo_precos_diario('20240315', output='arrow', root_url=f'{standin.url}/informacoes/merc-sec-debentures')
+    assert isinstance(tabela, pa.Table) and tabela.num_rows == 15
+    assert tabela.schema.field('PU').type == pa.string()
+
+
+def test_records_path_stays_light(standin):
+    codigo = ('from debentures_dot_com import records\n'
+              f'assert len(records.arquivo_precos_diario("20240315", root_url="{standin.url}/informacoes/merc-sec-debentures")) == 15')
+    carregados = _carregados(codigo)
+    assert [m for m in ('pandas', 'numpy', 'bs4', 'dateutil', 'aiohttp', 'polars') if m in carregados] == []
@@ -0,0 +1,148 @@
+"""
+Request events, structured errors and the MetricsCollector, against the stand-in server.
+"""
+import asyncio
+import json
+import pytest
+from debentures_dot_com import (EmissoesDebentures, AsyncEmissoesDebentures, AsyncTransport, Transport, ResponseCache,
+                                RateLimiter, MetricsCollector, JsonExporter, PrometheusExporter, HTTPStatusError, ParseError,
+                                add_hook, remove_hook)
+from debentures_dot_com.utils.query import Query, execute_query
+
+
+@pytest.fixture
+def events():
+    recebidos = []
+    add_hook(recebidos.append)
+    yield recebidos
+    remove_hook(recebidos.append)
+
+
+def test_event_fields(clients, events):
+    clients[0].pu_historico('ABCD11')
+    event, = events
+    assert event.ok and event.endpoint == 'pu_historico' and event.status == 200
+    assert event.rows == 15 and event.bytes > 0 and not event.streamed
+    assert event.total_s >= event.connect_s + event.parse_s > 0
+
+
+def test_event_cache(standin, tmp_path, events):
+    ed = EmissoesDebentures(transport=Transport(cache=ResponseCache(str(tmp_path))), errors='raise')
+    ed.root_url = f'{standin.url}/emissoesdedebentures'
+    ed.pu_historico('ABCD11', '20240301', '20240315')
+    ed.pu_historico('ABCD11', '20240301', '20240315')
+    assert [e.cache for e in events] == ['miss', 'hit']
+    assert events[1].status == 200 and events[1].rows == 15
+
+
+def test_http_status_error(clients, events):
+    with pytest.raises(HTTPStatusError) as info:
+        clients[3].arquivo_precos_diario('20240316')
+    assert info.value.status == 404 and info.value.endpoint == 'arquivo_precos_diario'
+    assert events[-1].error is info.value and events[-1].status == 404
+
+
+def test_print_mode_emits_error(standin, events, capsys):
+    ms = standin.clients()[3]
+    df = ms.arquivo_precos_diario('20240316')
+    assert df.empty and 'HTTP Error' in capsys.readouterr().out
+    assert isinstance(events[-1].error, HTTPStatusError)
+
+
+def test_parse_error(standin):
+    def quebrado(texto):
+        raise KeyError('layout')
+    with pytest.raises(ParseError) as info:
+        execute_query(Query('teste', f'{standin.url}/emissoesdedebentures/puhistorico_e.asp', quebrado))
+    assert isinstance(info.value, ValueError) and isinstance(info.value.__cause__, KeyError)
+
+
+def test_streamed_event(clients, events):
+    partes = list(clients[0].iter_pu_historico('ABCD11', chunksize=4))
+    event, = events
+    assert event.streamed and event.rows == sum(len(p) for p in partes) == 15
+
+
+def test_async_events(standin, events):
+    async def baixar():
+        async with AsyncTransport() as transport:
+            ed = AsyncEmissoesDebentures(transport=transport, errors='raise')
+            ed.root_url = f'{standin.url}/emissoesdedebentures'
+            return await ed.pu_historico('ABCD11')
+    assert len(asyncio.run(baixar())) == 15
+    assert events[-1].ok and events[-1].rows == 15 and events[-1].status == 200
+
+
+def test_async_cache_off_the_loop(standin, tmp_path, events):
+    import threading
+
+    class Vigiada(ResponseCache):
+        # Records the thread of every cache access
+        threads = []
+
+        def get(self, *args, **kwargs):
+            self.threads.append(threading.get_ident())
+            return super().get(*args, **kwargs)
+
+        def set(self, *args, **kwargs):
+            self.threads.append(threading.get_ident())
+            return super().set(*args, **kwargs)
+
+    async def baixar():
+        async with AsyncTransport(cache=Vigiada(str(tmp_path))) as transport:
+            ed = AsyncEmissoesDebentures(transport=transport, errors='raise')
+            ed.root_url = f'{standin.url}/emissoesdedebentures'
+            await ed.pu_historico('ABCD11')
+            await ed.pu_historico('ABCD11')
+            return threading.get_ident()
+
+    laco = asyncio.run(baixar())
+    assert len(Vigiada.threads) == 3 and laco not in Vigiada.threads
+    assert [e.cache for e in events[-2:]] == ['miss', 'hit']
+
+
+def test_async_backoff_frees_the_host_slot():
+    limiter = RateLimiter(concurrency=1)
+    url = 'http://127.0.0.1:9/fechado'
+
+    aiohttp = pytest.importorskip('aiohttp')
+
+    async def baixar():
+        async with AsyncTransport(retries=1, backoff_factor=0.5, rate_limiter=limiter) as transport:
+            tarefa = asyncio.ensure_future(transport.request('GET', url))
+            await asyncio.sleep(0.2)
+            # The first attempt was refused and the request is waiting for its retry
+            livre = limiter.host(url).in_flight == 0
+            with pytest.raises(aiohttp.ClientConnectionError):
+                await tarefa
+            return livre
+
+    assert asyncio.run(baixar())
+
+
+def test_collector(clients, tmp_path):
+    prom, arquivo = tmp_path / 'm.prom', tmp_path / 'm.json'
+    with MetricsCollector(exporters=[PrometheusExporter(str(prom)), JsonExporter(str(arquivo))]) as coletor:
+        for _ in range(3):
+            clients[0].pu_historico('ABCD11')
+        with pytest.raises(HTTPStatusError):
+            clients[3].arquivo_precos_diario('20240316')
+    clients[0].pu_historico('ABCD11') # After uninstall, not counted
+    resumo = coletor.summary().set_index('Endpoint')
+    assert resumo.loc['pu_historico', 'Requisições'] == 3 and resumo.loc['pu_historico', 'Linhas'] == 45
+    assert resumo.loc['arquivo_precos_diario', 'Erros'] == 1
+    assert resumo.loc['pu_historico', 'Total p50'] <= resumo.loc['pu_historico', 'Total max']
+    coletor.export()
+    assert 'debentures_requests_total{endpoint="pu_historico"} 3' in prom.read_text()
+    assert json.loads(arquivo.read_text())['endpoints']['pu_historico']['status'] == {'200': 3}
+
+
+def test_remove_bound_method_hook():
+    from debentures_dot_com.utils import events as modulo
+    antes = modulo._hooks
+    recebidos = []
+    add_hook(recebidos.append)
+    add_hook(recebidos.append)
+    assert len(modulo._hooks) == len(antes) + 1
+    remove_hook(recebidos.append)
+    assert modulo._hooks == antes
@@ -0,0 +1,47 @@
+"""
+The local mirror of the characteristics export (CaracteristicasMirror).
+"""
+import pytest
+from debentures_dot_com import CaracteristicasMirror, Transport
+
+
+@pytest.fixture
+def mirror(standin, tmp_path):
+    m = CaracteristicasMirror(str(tmp_path / 'caracteristicas.sqlite'), transport=Transport(rate_limiter=False),
+                              errors='raise')
+    m.root_url = f'{standin.url}/emissoesdedebentures'
+    m.sync()
+    yield m
+    m.close()
+
+
+def test_sync_status(mirror):
+    status = mirror.status()
+    assert list(status['Tipo']) == ['privadas'] and status['Linhas'].iloc[0] == 12
+
+
+def test_local_filters(mirror, standin, clients):
+    antes = standin.requests
+    df = mirror.caracteristicas_debs(indice='di', venc_ini='01/01/2030', mnome='EMISSORA')
+    assert standin.requests == antes
+    assert (df['Índice'] == 'DI').all() and (df['Data de Vencimento'] >= '2030-01-01').all()
+    completo = clients[0].caracteristicas_debs()
+    assert list(df.columns) == list(completo.columns)
+    assert len(df) == ((completo['Índice'] == 'DI') & (completo['Data de Vencimento'] >= '2030-01-01')).sum()
+
+
+def test_prefix_and_load(mirror):
+    assert mirror.caracteristicas_debs(ativo='abcd1').shape == (10, 19)
+    assert mirror.load(ativos=['ABCD11', 'ABCD12'])['Código do Ativo'].tolist() == ['ABCD11', 'ABCD12']
+
+
+def test_fallback(mirror, standin):
+    assert not mirror.can_answer(ipo='S') and mirror.can_answer(coordenador='banco z')
+    antes = standin.requests
+    assert len(mirror.caracteristicas_debs(ipo='S')) == 12
+    assert standin.requests == antes + 1
+    mirror.fallback = False
+    with pytest.raises(LookupError):
+        mirror.caracteristicas_debs(tipo='publicas')
+    with pytest.raises(TypeError):
+        mirror.caracteristicas_debs(indice_='DI')
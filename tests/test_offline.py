@@ -0,0 +1,215 @@
+"""
+Regression tests of every endpoint against the stand-in server (tests/standin.py),
+which serves the recorded responses in tests/fixtures. No network access is needed.
+"""
+import pandas as pd
+import pytest
+from debentures_dot_com import EmissoesDebentures, Transport, ResponseCache
+from debentures_dot_com.utils.query import Query
+from standin import StandinServer
+
+# endpoint -> (client index, method, args, expected shape)
+ENDPOINTS = {
+    'lista_deb_publicas': (0, 'lista_deb_publicas', (), (12, 3)),
+    'lista_caracteristicas': (0, 'lista_caracteristicas', ('ABCD11',), (7, 2)),
+    'pu_historico': (0, 'pu_historico', ('ABCD11', '20240301', '20240315'), (15, 7)),
+    'conversao_permuta': (0, 'conversao_permuta', (), (8, 5)),
+    'caracteristicas_debs': (0, 'caracteristicas_debs', (), (12, 19)),
+    'estoque_por_ativo': (1, 'estoque_por_ativo', ('ABCD11',), (10, 7)),
+    'estoque_por_periodo': (1, 'estoque_por_periodo', (), (10, 4)),
+    'estoque_a_vencer': (1, 'estoque_a_vencer', (), (8, 3)),
+    'estoque_relatorio': (1, 'estoque_relatorio', ('Indexadores',), (20, 6)),
+    'agenda_eventos': (2, 'agenda_eventos', (), (20, 7)),
+    'pu_eventos': (2, 'pu_eventos', (), (15, 6)),
+    'preco_negociacao': (3, 'preco_negociacao', (), (25, 10)),
+    'volume_negociacao': (3, 'volume_negociacao', (), (10, 2)),
+    'arquivo_precos_diario': (3, 'arquivo_precos_diario', ('20240315',), (15, 15)),
+}
+
+
+def _call(clients, endpoint):
+    i, metodo, args, _ = ENDPOINTS[endpoint]
+    return getattr(clients[i], metodo)(*args)
+
+
+@pytest.mark.parametrize('endpoint', sorted(ENDPOINTS))
+def test_endpoint_shape(clients, endpoint):
+    assert _call(clients, endpoint).shape == ENDPOINTS[endpoint][3]
+
+
+def test_lista_deb_publicas(clients):
+    df = _call(clients, 'lista_deb_publicas')
+    assert list(df.columns) == ['Ativo', 'Emissor', 'Situacao']
+    assert df['Ativo'].iloc[0] == 'ABCD10'
+    assert df['Situacao'].iloc[1] == 'Excluído'
+
+
+def test_pu_historico_typed(clients):
+    df = _call(clients, 'pu_historico')
+    assert list(df.columns)[3] == 'Prêmio'
+    assert pd.api.types.is_datetime64_any_dtype(df['Data do PU'])
+    assert df['Preço Unitário'].dtype == 'float64'
+    assert df['Preço Unitário'].iloc[0] == pytest.approx(1000.412345)
+    assert isinstance(df['Situação'].dtype, pd.CategoricalDtype)
+
+
+def test_pu_historico_raw(standin):
+    ed = standin.clients(raw=True)[0]
+    df = ed.pu_historico('ABCD11')
+    assert df['Preço Unitário'].iloc[0] == '1.000,412345'
+
+
+def test_prazo_medio(clients):
+    medio, dados = clients[0].prazo_medio()
+    assert list(medio['Tipo Prazo']) == ['Prazo médio (anos)', 'Prazo médio ponderado (anos)']
+    assert dados.shape == (6, 5)
+
+
+def test_estoque_relatorio_tipo(clients):
+    df = clients[1].estoque_relatorio('Tipo')
+    assert list(df.columns) == ['Data do Estoque', 'Moeda', 'Tipo', 'Mercado', 'Tesouraria', 'Total']
+    assert df['Mercado'].iloc[0] == pytest.approx(1001.56)
+    assert df['Data do Estoque'].nunique() == 5
+
+
+def test_estoque_por_ativo_columns(clients):
+    df = clients[1].estoque_por_ativo('ABCD11', moeda=2)
+    assert 'Volume Total (USD Mil)' in df.columns
+
+
+def test_arquivo_precos_diario(clients):
+    df = _call(clients, 'arquivo_precos_diario')
+    # Section title lines are dropped; N/D and -- are missing values
+    assert df['Código'].iloc[0] == 'ABCD10'
+    assert df['Taxa de Compra'].isna().sum() == 3
+    assert pd.api.types.is_datetime64_any_dtype(df['Repac./  Venc.'])
+
+
+def test_arquivo_precos_periodo(clients, tmp_path):
+    df, status = clients[3].arquivo_precos_periodo('20240311', '20240318', arquivo=str(tmp_path))
+    assert len(status) == 6 and status['Sucesso'].all()
+    assert df['Data'].nunique() == 6
+    _, status = clients[3].arquivo_precos_periodo('20240311', '20240318', arquivo=str(tmp_path))
+    assert (status['Origem'] == 'arquivo').all()
+    # Without an archive nothing is written, even for responses parsed by another caller
+    outro = tmp_path / 'outro'
+    outro.mkdir()
+    clients[3].arquivo_precos_periodo('20240311', '20240318')
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['db240311.txt', 'db240312.txt', 'db240313.txt',
+                                                         'db240314.txt', 'db240315.txt', 'db240318.txt', 'outro']
+    clients[3].arquivo_precos_periodo('20240311', '20240312', arquivo=str(outro))
+    assert len(list(outro.iterdir())) == 2
+
+
+def test_arquivo_precos_periodo_error_page(tmp_path):
+    with StandinServer() as servidor:
+        servidor._bodies[('anbima_db.txt', None)] = b'<html>\r\n<head>\r\n<title>Erro</title>\r\n</head>\r\n<body>Arquivo indispon\xedvel</body>\r\n</html>\r\n'
+        ms = servidor.clients(errors='raise')[3]
+        df, status = ms.arquivo_precos_periodo('20240311', '20240312', arquivo=str(tmp_path))
+    assert not status['Sucesso'].any() and status['Erro'].str.startswith('ParseError').all()
+    assert df.empty and not any(tmp_path.iterdir())
+
+
+def test_missing_file_raises(clients):
+    with pytest.raises(Exception):
+        clients[3].arquivo_precos_diario('20240316')
+
+
+def test_pu_historico_lote(clients):
+    df, status = clients[0].pu_historico_lote(['ABCD11', 'ABCD12', 'ABCD13'])
+    assert status['Sucesso'].all()
+    assert len(df) == 45 and list(df['Ativo'].unique()) == ['ABCD11', 'ABCD12', 'ABCD13']
+
+
+def test_pu_historico_lote_failed_universe(standin):
+    from debentures_dot_com import EmissoesDebentures, Transport, ConnectionFailed
+    ed = EmissoesDebentures(transport=Transport(rate_limiter=False, retries=0))
+    ed.root_url = 'http://127.0.0.1:9/emissoesdedebentures'
+    # errors='print' still raises: an empty status frame would read as an empty universe
+    with pytest.raises(ConnectionFailed):
+        ed.pu_historico_lote()
+    ed.root_url = f'{standin.url}/emissoesdedebentures'
+    df, status = ed.pu_historico_lote()
+    assert len(status) == 12 and status['Sucesso'].all()
+
+
+@pytest.mark.parametrize('cliente,metodo,args', [
+    (1, 'estoque_por_periodo', ()),
+    (1, 'estoque_relatorio', ('Indexadores',)),
+    (2, 'agenda_eventos', ()),
+    (2, 'pu_eventos', ()),
+    (3, 'preco_negociacao', ()),
+])
+def test_windows(clients, cliente, metodo, args):
+    funcao = getattr(clients[cliente], metodo)
+    inteiro = funcao(*args, dt_ini='20240101', dt_fim='20240331')
+    df = funcao(*args, dt_ini='20240101', dt_fim='20240331', chunk='month', max_workers=3)
+    # Every window answers with the whole fixture, and the windows do not overlap: all rows are kept
+    assert len(df) == 3 * len(inteiro) > 0
+    assert list(df.columns) == list(inteiro.columns)
+
+
+def test_estoque_a_vencer_is_not_chunked(clients):
+    with pytest.raises(TypeError):
+        clients[1].estoque_a_vencer(dt_ini='20240101', dt_fim='20240331', chunk='month')
+    assert len(clients[1].estoque_a_vencer(dt_ini='20240101', dt_fim='20240331')) > 0
+
+
+@pytest.mark.parametrize('metodo,args', [
+    ('iter_pu_historico', ('ABCD11',)),
+    ('iter_caracteristicas_debs', ()),
+])
+def test_iter_matches_full(clients, metodo, args):
+    ed = clients[0]
+    completo = getattr(ed, metodo.replace('iter_', ''))(*args)
+    partes = list(getattr(ed, metodo)(*args, chunksize=4))
+    assert len(partes) > 1
+    juntas = pd.concat(partes, ignore_index=True)
+    pd.testing.assert_frame_equal(juntas.astype(str), completo.astype(str))
+
+
+def test_iter_estoque_relatorio(clients):
+    partes = list(clients[1].iter_estoque_relatorio('Indexadores', chunksize=8))
+    assert sum(len(p) for p in partes) == 20
+
+
+def test_large_synthetic():
+    with StandinServer(rows=20000) as servidor:
+        ed, ec, _, ms = servidor.clients(errors='raise')
+        assert len(ed.caracteristicas_debs()) == 20000
+        relatorio = ec.estoque_relatorio('Indexadores')
+        assert len(relatorio) == 20000 and relatorio['Data do Estoque'].is_monotonic_increasing
+        assert len(ms.preco_negociacao()) == 20000
+
+
+def test_cache_replays(standin, tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    ed = EmissoesDebentures(transport=Transport(cache=cache), errors='raise')
+    ed.root_url = f'{standin.url}/emissoesdedebentures'
+    antes = standin.requests
+    primeiro = ed.pu_historico('ABCD11', '20240301', '20240315')
+    segundo = ed.pu_historico('ABCD11', '20240301', '20240315')
+    assert standin.requests - antes == 1
+    pd.testing.assert_frame_equal(primeiro, segundo)
+
+
+def test_query_parses_fixture_bytes(standin):
+    # The parsers can be exercised without HTTP, from the bytes the server sends
+    from debentures_dot_com.utils.utils import parse_tabular
+    query = Query('pu_historico', 'unused', parse_tabular)
+    df = query.finish(query.parse(standin.body('pu_historico.txt'), 'ISO-8859-1'))
+    assert df.shape == (15, 7)
+
+
+@pytest.mark.parametrize('sep', [None, ';', '\t'])
+def test_chunks_follow_sep(standin, sep):
+    # The streamed pieces are parsed with the same arguments as the whole body
+    from debentures_dot_com.utils.utils import parse_tabular
+    corpo = standin.body('preco_negociacao.txt')
+    query = Query('preco_negociacao', 'unused', parse_tabular, {'sep': sep})
+    divisor = query.chunks(4)
+    pecas = [p for linha in corpo.splitlines(keepends=True) for p in divisor.feed(linha)] + divisor.close()
+    partes = pd.concat([divisor.parse(p, 'ISO-8859-1') for p in pecas], ignore_index=True)
+    inteiro = query.parse(corpo, 'ISO-8859-1')
+    assert partes.values.tolist() == inteiro.values.tolist()
+    assert list(partes.columns) == list(inteiro.columns)
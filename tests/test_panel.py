@@ -0,0 +1,100 @@
+"""
+The ticker x date PU matrix (PUPanel).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from debentures_dot_com import PUPanel
+
+
+def _longo() -> pd.DataFrame:
+    # Two tickers over a week (04/03/2024 is a Monday), AAAA11 missing the 6th, and a weekend row
+    return pd.DataFrame({
+        'Ativo': ['BBBB11', 'AAAA11', 'AAAA11', 'AAAA11', 'BBBB11', 'BBBB11', 'AAAA11'],
+        'Data do PU': pd.to_datetime(['2024-03-04', '2024-03-04', '2024-03-05', '2024-03-07',
+                                      '2024-03-06', '2024-03-07', '2024-03-09']),
+        'Preço Unitário': [200.0, 100.0, 110.0, 121.0, 210.0, 220.5, 999.0],
+    })
+
+
+def test_from_frame_aligns_dates():
+    painel = PUPanel.from_frame(_longo())
+    assert painel.ativos.tolist() == ['AAAA11', 'BBBB11'] and painel.valores.dtype == np.float32
+    assert [str(d) for d in painel.datas] == ['2024-03-04', '2024-03-05', '2024-03-06', '2024-03-07']
+    assert np.isnan(painel.valores[0, 2]) and np.isnan(painel.valores[1, 1])
+    assert PUPanel.from_frame(_longo(), business_days=False).shape == (2, 5)
+    assert PUPanel.from_frame(_longo(), holidays=['05/03/2024']).shape == (2, 3)
+    longo = painel.to_frame(long=True)
+    assert len(longo) == 6 and painel.to_frame().loc['2024-03-07', 'BBBB11'] == 220.5
+
+
+def test_ffill_returns_and_stats():
+    painel = PUPanel.from_frame(_longo(), dtype='float64')
+    cheio = painel.ffill()
+    assert cheio.valores[0].tolist() == [100.0, 110.0, 110.0, 121.0]
+    assert cheio.valores[1, 1] == 200.0 and np.isnan(painel.ffill(limit=0).valores[1, 1])
+    retornos = painel.returns()
+    assert np.isnan(retornos.valores[:, 0]).all()
+    assert retornos.valores[0, 1:].round(6).tolist() == [0.1, 0.0, 0.1]
+    assert np.isnan(painel.returns(fill=False).valores[0, 2])
+    stats = painel.cross_section()
+    assert stats['count'].tolist() == [2, 1, 1, 2]
+    assert stats.loc['2024-03-07', 'mean'] == pytest.approx((121.0 + 220.5) / 2)
+    assert painel.sel(['BBBB11'], dt_ini='20240306').valores.tolist() == [[210.0, 220.5]]
+
+
+def test_join_events():
+    painel = PUPanel.from_frame(_longo())
+    eventos = pd.DataFrame({'Ativo': ['AAAA11', 'BBBB11', 'CCCC11'],
+                            'Data do Evento': pd.to_datetime(['2024-03-06', '2024-03-07', '2024-03-07']),
+                            'Evento': ['Juros', 'Amortização', 'Juros']})
+    juntos = painel.join_events(eventos)
+    assert juntos['PU'].tolist()[:2] == [110.0, 220.5] and juntos['PU Anterior'].tolist()[:2] == [110.0, 210.0]
+    assert juntos[['PU', 'PU Anterior']].iloc[2].isna().all()
+    assert np.isnan(painel.join_events(eventos, fill=False)['PU'].iloc[0])
+    mascara = painel.event_mask(eventos)
+    assert mascara.sum() == 2 and mascara[1, 3] and mascara[0, 2]
+
+
+def test_memmap(tmp_path):
+    painel = PUPanel.from_frame(_longo(), path=str(tmp_path / 'painel'))
+    assert isinstance(painel.valores, np.memmap)
+    aberto = PUPanel.open(str(tmp_path / 'painel'))
+    assert aberto.ativos.tolist() == painel.ativos.tolist() and (aberto.datas == painel.datas).all()
+    assert np.array_equal(aberto.valores, painel.valores, equal_nan=True)
+    copia = PUPanel.from_frame(_longo()).save(str(tmp_path / 'copia'))
+    assert np.array_equal(PUPanel.open(str(tmp_path / 'copia')).valores, painel.valores, equal_nan=True)
+
+
+def test_from_pu_historico_lote(clients):
+    df, status = clients[0].pu_historico_lote(['ABCD10', 'ABCD11', 'ABCD12'])
+    painel = PUPanel.from_frame(df, business_days=False)
+    assert painel.shape == (3, df['Data do PU'].nunique()) and status['Sucesso'].all()
+    assert painel.to_frame(long=True)['Preço Unitário'].sum() == pytest.approx(df['Preço Unitário'].sum())
+
+
+def test_raw_text_dates_and_holidays():
+    texto = _longo().assign(**{'Data do PU': lambda d: d['Data do PU'].dt.strftime('%d/%m/%Y'),
+                               'Preço Unitário': lambda d: d['Preço Unitário'].map(lambda v: f'{v:.2f}'.replace('.', ','))})
+    painel = PUPanel.from_frame(texto)
+    assert [str(d) for d in painel.datas] == ['2024-03-04', '2024-03-05', '2024-03-06', '2024-03-07']
+    assert np.array_equal(painel.valores, PUPanel.from_frame(_longo()).valores, equal_nan=True)
+    eventos = pd.DataFrame({'Ativo': ['AAAA11'], 'Data do Evento': ['05/03/2024']})
+    assert painel.join_events(eventos)['PU'].tolist() == [110.0]
+    # Good Friday (29/03/2024) is a national holiday, left off the axis unless holidays are given
+    feriado = pd.concat([_longo(), pd.DataFrame({'Ativo': ['AAAA11'], 'Data do PU': pd.to_datetime(['2024-03-29']),
+                                                 'Preço Unitário': [130.0]})])
+    assert PUPanel.from_frame(feriado).shape == (2, 4)
+    assert PUPanel.from_frame(feriado, holidays=[]).shape == (2, 5)
+
+
+def test_from_raw_pu_historico_lote(standin):
+    ed = standin.clients(errors='raise', raw=True)[0]
+    cru, _ = ed.pu_historico_lote(['ABCD10', 'ABCD11', 'ABCD12'])
+    assert cru['Preço Unitário'].map(type).eq(str).all()
+    tipado, _ = standin.clients(errors='raise')[0].pu_historico_lote(['ABCD10', 'ABCD11', 'ABCD12'])
+    painel = PUPanel.from_frame(cru, business_days=False, dtype='float64')
+    assert not np.isnan(painel.valores).all()
+    assert np.array_equal(painel.valores, PUPanel.from_frame(tipado, business_days=False, dtype='float64').valores, equal_nan=True)
+    with pytest.raises(ValueError):
+        PUPanel.from_frame(cru.assign(**{'Preço Unitário': 'sem preço'}))
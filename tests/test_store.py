@@ -0,0 +1,57 @@
+"""
+The incremental local store of per-ticker series (SeriesStore).
+"""
+import pytest
+from debentures_dot_com import SeriesStore, Transport
+
+# serie -> (attribute of the client's root URL, path on the stand-in, rows of the fixture)
+_SERIES = {
+    'pu_historico': ('root_url', 'emissoesdedebentures', 15),
+    'estoque_por_ativo': ('root_url', 'estoque', 10),
+    'preco_negociacao': ('root_url_', 'mercadosecundario', 25),
+}
+
+
+def _store(standin, path) -> SeriesStore:
+    store = SeriesStore(str(path), transport=Transport(rate_limiter=False))
+    for serie, (atributo, caminho, _) in _SERIES.items():
+        setattr(store._client(serie), atributo, f'{standin.url}/{caminho}')
+    return store
+
+
+@pytest.mark.parametrize('serie', list(_SERIES))
+def test_sync_resume_and_reopen(standin, tmp_path, serie):
+    linhas = _SERIES[serie][2]
+    store = _store(standin, tmp_path / 'series.sqlite')
+    status = store.sync(serie, ['ABCD11', 'ABCD12'])
+    assert status['Sucesso'].all() and status['Linhas'].tolist() == [linhas, linhas]
+    ultima = store.last_date(serie, 'ABCD11')
+    # The stand-in answers the whole fixture again: only the last stored day is replaced
+    assert store.sync(serie, 'ABCD11')['Linhas'].tolist() == [0]
+    assert len(store.load(serie, 'ABCD11')) == linhas
+    store.close()
+
+    store = _store(standin, tmp_path / 'series.sqlite')
+    assert store.last_date(serie, 'ABCD11') == ultima
+    df = store.load(serie)
+    assert len(df) == 2 * linhas and df['Ativo'].tolist() == ['ABCD11'] * linhas + ['ABCD12'] * linhas
+    assert store.sync(serie, ['ABCD12'], timeout=5)['Linhas'].tolist() == [0]
+    store.close()
+
+
+def test_identical_rows_are_kept(standin, tmp_path):
+    store = _store(standin, tmp_path / 'series.sqlite')
+    cliente = store._client('preco_negociacao')
+    original = cliente._query_preco_negociacao
+
+    def repetida(*args, **kwargs):
+        # Every trade of the export answered twice, as two equal trades of a day would be
+        query = original(*args, **kwargs)
+        query.post = lambda df: df.loc[df.index.repeat(2)].reset_index(drop=True)
+        return query
+
+    cliente._query_preco_negociacao = repetida
+    assert store.sync('preco_negociacao', 'ABCD11')['Linhas'].tolist() == [50]
+    assert store.sync('preco_negociacao', 'ABCD11')['Linhas'].tolist() == [0]
+    assert len(store.load('preco_negociacao')) == 50
+    store.close()
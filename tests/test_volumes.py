@@ -0,0 +1,59 @@
+"""
+VolumesNegociados against the stand-in server: month partitions, merging and typing.
+"""
+import pandas as pd
+import pytest
+from debentures_dot_com import VolumesNegociados, Transport, ResponseCache
+
+
+@pytest.fixture
+def vn(standin):
+    cliente = VolumesNegociados(transport=Transport(rate_limiter=False), errors='raise')
+    cliente.root_url = f'{standin.url}/volume'
+    return cliente
+
+
+def test_periodo_month_partitions(vn, standin):
+    antes = standin.requests
+    df = vn.volume_por_periodo('15/01/2024', '10/03/2024', max_workers=3)
+    assert standin.requests - antes == 3
+    assert len(df) == 56 and df['Data'].is_monotonic_increasing
+    assert df['Data'].iloc[0] == pd.Timestamp(2024, 1, 15) and df['Data'].iloc[-1] == pd.Timestamp(2024, 3, 10)
+    assert df['Volume (R$ mil)'].dtype == 'float64'
+    pd.testing.assert_frame_equal(df, vn.volume_por_periodo('15/01/2024', '10/03/2024', chunk=None))
+
+
+def test_garantia_especie_months(vn, standin):
+    antes = standin.requests
+    df = vn.volume_por_garantia_especie('20/11/2023', '05/02/2024')
+    assert standin.requests - antes == 4
+    assert list(df.columns[:3]) == ['Mês', 'Espécie', 'Garantia']
+    assert df['Mês'].drop_duplicates().tolist() == list(pd.to_datetime(['2023-11-01', '2023-12-01', '2024-01-01', '2024-02-01']))
+    assert len(df) == 24 and df['Espécie'].dtype == 'category'
+    consolidado = vn.volume_por_garantia_especie('20/11/2023', '05/02/2024', consolidado=True)
+    assert 'Mês' not in consolidado.columns and len(consolidado) == 6
+
+
+def test_urls(vn):
+    url = vn._query_volume_por_garantia_especie(pd.Timestamp(2025, 5, 1).date(), pd.Timestamp(2025, 7, 1).date(), True).url
+    assert url.endswith('volumeporgarantia-especie_de.asp?pMes_Ini=05&pAno_Ini=2025&pMes_Fim=07&pAno_Fim=2025'
+                        '&moeda=1&pConsol=1&op_exc=Nada&ICVM=%20NULL')
+    url = vn._query_volume_por_periodo(pd.Timestamp(2025, 7, 1).date(), pd.Timestamp(2025, 7, 23).date()).url
+    assert url.endswith('volumeporperiodo_e.asp?op_exc=Nada&emissao=0&dt_ini=01%2F07%2F2025&dt_fim=23%2F07%2F2025&ICVM=&moeda=1')
+
+
+def test_closed_months_cached(standin, tmp_path):
+    vn = VolumesNegociados(transport=Transport(rate_limiter=False, cache=ResponseCache(str(tmp_path), ttls={'volume_por_periodo': 0})),
+                           errors='raise')
+    vn.root_url = f'{standin.url}/volume'
+    inicio = pd.Timestamp.today().normalize() - pd.DateOffset(months=2)
+    vn.volume_por_periodo(inicio.strftime('%d/%m/%Y'))
+    antes = standin.requests
+    vn.volume_por_periodo(inicio.strftime('%d/%m/%Y'))
+    # Closed months never expire; only the current one is asked again
+    assert standin.requests - antes == 1
+
+
+def test_invalid_range(vn):
+    with pytest.raises(ValueError):
+        vn.volume_por_periodo('10/03/2024', '01/03/2024')